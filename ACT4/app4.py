@@ -1,18 +1,565 @@
+import io
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from itertools import chain
+from collections import OrderedDict
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import pandas as pd
+import pyarrow as pa
 import matplotlib.pyplot as plt
 import plotly.express as px
 import seaborn as sns
 
-@st.cache_data
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ----------------------------
+# PSGC HTTP cache
+# ----------------------------
+# Responses are kept on disk with their ETag/Last-Modified. A fresh snapshot is served as is,
+# a stale one is served immediately while a background thread revalidates it, and the last
+# good snapshot stays the fallback while the API cannot be reached.
+# Point PSGC_API_URL at psgc_stub_server.py to run without the network.
+PSGC_API_URL = os.environ.get("PSGC_API_URL", "https://psgc.cloud/api").rstrip("/")
+PSGC_CACHE_DIR = os.environ.get("PSGC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "psgc_cache"))
+PSGC_TTL_SECONDS = float(os.environ.get("PSGC_TTL_SECONDS", 24 * 60 * 60))
+PSGC_TIMEOUT_SECONDS = float(os.environ.get("PSGC_TIMEOUT_SECONDS", 10))
+PSGC_MAX_WORKERS = int(os.environ.get("PSGC_MAX_WORKERS", 8))
+PSGC_RETRIES = int(os.environ.get("PSGC_RETRIES", 3))
+
+
+def endpoint_name(endpoint):
+    # "regions/0100000000/provinces?page=2" -> "regions_0100000000_provinces", safe as a file name
+    return endpoint.split("?")[0].replace("/", "_")
+
+
+def snapshot_paths(endpoint):
+    name = f"{endpoint_name(endpoint)}-{hashlib.sha1(f'{PSGC_API_URL}/{endpoint}'.encode()).hexdigest()[:8]}"
+    return os.path.join(PSGC_CACHE_DIR, f"{name}.json"), os.path.join(PSGC_CACHE_DIR, f"{name}.meta.json")
+
+
+def replace_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_meta(endpoint):
+    body_path, meta_path = snapshot_paths(endpoint)
+    if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as saved:
+        return json.load(saved)
+
+
+def page_records(payload):
+    # Endpoints answer either a plain list or a paginated {"data": [...], "meta": {"last_page": n}}
+    return payload["data"] if isinstance(payload, dict) else payload
+
+
+def page_count(payload):
+    return payload.get("meta", {}).get("last_page", 1) if isinstance(payload, dict) else 1
+
+
+@st.cache_resource
+def psgc_session():
+    # One keep-alive pool for every PSGC request; transient failures are retried with backoff
+    retry = Retry(total=PSGC_RETRIES, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=PSGC_MAX_WORKERS, pool_maxsize=PSGC_MAX_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request_snapshot(session, endpoint, meta=None):
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    response = session.get(f"{PSGC_API_URL}/{endpoint}", headers=headers, timeout=PSGC_TIMEOUT_SECONDS)
+    body_path, meta_path = snapshot_paths(endpoint)
+    os.makedirs(PSGC_CACHE_DIR, exist_ok=True)
+    if response.status_code == 304 and meta:
+        meta = dict(meta)  # unchanged: only the freshness moves forward
+    else:
+        response.raise_for_status()
+        payload = response.json()  # never replace the last good snapshot with a body that does not parse
+        replace_file(body_path, response.content)
+        meta = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                "pages": page_count(payload)}
+    meta["fetched_at"] = time.time()
+    replace_file(meta_path, json.dumps(meta).encode())
+    return meta
+
+
+@st.cache_resource
+def revalidation_state():
+    # endpoints with a revalidation in flight, and the error of the last failed attempt
+    return {"lock": threading.Lock(), "running": set(), "errors": {}}
+
+
+def revalidate_in_background(session, state, endpoint, meta):
+    with state["lock"]:
+        if endpoint in state["running"]:
+            return
+        state["running"].add(endpoint)
+
+    def revalidate():
+        try:
+            request_snapshot(session, endpoint, meta)
+            state["errors"].pop(endpoint, None)
+        except (requests.RequestException, ValueError) as error:
+            state["errors"][endpoint] = str(error)
+        finally:
+            with state["lock"]:
+                state["running"].discard(endpoint)
+
+    threading.Thread(target=revalidate, name=f"psgc-revalidate-{endpoint}", daemon=True).start()
+
+
+def ensure_snapshot(session, state, endpoint):
+    # Runs on the loader's worker threads, so the Streamlit resources are passed in
+    meta = read_snapshot_meta(endpoint)
+    if meta is None:
+        try:
+            return request_snapshot(session, endpoint)
+        except (requests.RequestException, ValueError) as error:
+            state["errors"][endpoint] = str(error)
+            return None
+    if time.time() - meta["fetched_at"] > PSGC_TTL_SECONDS:
+        revalidate_in_background(session, state, endpoint, meta)
+    return meta
+
+
+def format_age(seconds):
+    if seconds < 60 * 60:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 2 * 24 * 60 * 60:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.0f} days"
+
+
+def snapshot_status(state, metas):
+    # metas: endpoint -> snapshot meta (None when it could not be fetched at all)
+    missing = [endpoint for endpoint, meta in metas.items() if meta is None]
+    if missing:
+        return f"📴 PSGC API unreachable and no saved snapshot for {', '.join(missing)} ({state['errors'].get(missing[0])})"
+    age = time.time() - min(meta["fetched_at"] for meta in metas.values())
+    if any(endpoint in state["errors"] for endpoint in metas):
+        return f"📴 PSGC API unreachable, showing the snapshot from {format_age(age)} ago"
+    if age > PSGC_TTL_SECONDS:
+        return f"🔄 Showing the snapshot from {format_age(age)} ago while it is refreshed"
+    return f"🌐 PSGC data cached {format_age(age)} ago"
+
+
+# ----------------------------
+# PSGC hierarchy
+# ----------------------------
+# Every level (and every page of it) is fetched on a bounded pool, so a cold load takes about
+# as long as the slowest level. Places are linked to their ancestors by PSGC code prefix:
+# a 10-digit code reads region (2) + province (3) + city/municipality (2) + barangay (3).
+PSGC_LEVELS = {
+    "regions": ("region", 2),
+    "provinces": ("province", 5),
+    "cities-municipalities": ("city_municipality", 7),
+    "barangays": ("barangay", 10),
+}
+
+
+def page_endpoint(level, page):
+    return level if page == 1 else f"{level}?page={page}"
+
+
+def fetch_snapshots(session, state, levels):
+    # -> ({level: ((body path, mtime), ...) per page, or None}, {endpoint: meta}); no Streamlit calls
+    metas, pages = {}, {level: {} for level in levels}
+    with ThreadPoolExecutor(max_workers=PSGC_MAX_WORKERS) as pool:
+        pending = {pool.submit(ensure_snapshot, session, state, level): (level, 1) for level in levels}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                level, page = pending.pop(future)
+                endpoint = page_endpoint(level, page)
+                metas[endpoint] = meta = future.result()
+                if meta is None:
+                    continue
+                body_path = snapshot_paths(endpoint)[0]
+                pages[level][page] = (body_path, os.path.getmtime(body_path))
+                if page == 1:
+                    # Follow-up pages start as soon as the first one says how many there are
+                    for later in range(2, meta.get("pages", 1) + 1):
+                        pending[pool.submit(ensure_snapshot, session, state, page_endpoint(level, later))] = (level, later)
+    snapshots = {}
+    for level, found in pages.items():
+        complete = metas.get(level) is not None and len(found) == metas[level].get("pages", 1)
+        snapshots[level] = tuple(found[page] for page in sorted(found)) if complete else None
+    return snapshots, metas
+
+
+def fetch_psgc_levels(levels):
+    # -> ({level: ((body path, mtime), ...) per page, or None}, status line, seconds)
+    session, state = psgc_session(), revalidation_state()
+    started = time.perf_counter()
+    snapshots, metas = fetch_snapshots(session, state, levels)
+    return snapshots, snapshot_status(state, metas), time.perf_counter() - started
+
+
+# ----------------------------
+# Compact PSGC decode
+# ----------------------------
+# Pages are parsed whole (orjson when it is installed, json otherwise) and built into an Arrow
+# table a column at a time: type, district and every region/province/city ID become
+# dictionary columns (categoricals in pandas), small integer codes over one copy of each label. The typed level is saved as Arrow per snapshot version, so warm starts
+# memory-map it and never parse JSON.
+CATEGORICAL_FIELDS = {"type", "district"}
+
+
+def read_records(body_path):
+    with open(body_path, "rb") as saved:
+        data = saved.read()
+    return page_records(orjson.loads(data) if orjson is not None else json.loads(data))
+
+
+def decode_level(pages):
+    # -> Arrow table; a field missing from some records (or a whole page) is null there
+    records = list(chain.from_iterable(read_records(body_path) for body_path, _ in pages))
+    keys = dict.fromkeys(chain.from_iterable(records))
+    table = pa.table({key: [record.get(key) for record in records] for key in keys})
+    for index, key in enumerate(table.column_names):
+        if key in CATEGORICAL_FIELDS or key.endswith(("_id", "_code")):
+            column = table[key] if not pa.types.is_null(table[key].type) else table[key].cast(pa.string())
+            table = table.set_column(index, key, column.dictionary_encode())
+    return table
+
+
+def load_compact_level(level, pages):
+    name = endpoint_name(level)
+    compact_path = os.path.join(PSGC_CACHE_DIR, f"{name}-{hashlib.sha1(repr(pages).encode()).hexdigest()[:12]}.arrow")
+    try:
+        return pa.ipc.open_file(pa.memory_map(compact_path)).read_all().to_pandas()
+    except FileNotFoundError:
+        pass  # not decoded yet, or just replaced by a newer version in another thread
+    table = decode_level(pages)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    # Sessions and the prefetch thread may decode the same level at once: each writes its own temp
+    # file and whichever rename lands last wins, with identical contents
+    replace_file(compact_path, sink.getvalue())
+    for stale in os.listdir(PSGC_CACHE_DIR):
+        if stale.startswith(f"{name}-") and stale.endswith(".arrow") and stale != os.path.basename(compact_path):
+            try:
+                os.remove(os.path.join(PSGC_CACHE_DIR, stale))
+            except FileNotFoundError:
+                pass  # already removed by a concurrent load
+    return table.to_pandas()
+
+
+@st.cache_data(show_spinner="Joining the PSGC hierarchy...")
+def build_psgc_hierarchy(snapshots):
+    levels = {level: load_compact_level(level, pages) if pages else pd.DataFrame() for level, pages in snapshots}
+    for level, frame in levels.items():
+        if "code" not in frame:
+            continue
+        codes = frame["code"].astype(str)
+        for parent, (label, digits) in PSGC_LEVELS.items():
+            if digits >= PSGC_LEVELS[level][1]:
+                break
+            frame[f"{label}_code"] = codes.str[:digits].str.ljust(10, "0").astype("category")
+            if "code" in levels.get(parent, ()):
+                names = levels[parent].set_index(levels[parent]["code"].astype(str))["name"]
+                frame[f"{label}_name"] = frame[f"{label}_code"].map(names)
+    return levels
+
+
 def fetch_psgc_data():
-    url = "https://psgc.cloud/api/cities-municipalities"
-    response = requests.get(url)
-    return response.json()
+    # -> (hierarchy, version key of the snapshots it was built from, status line, seconds)
+    snapshots, status, seconds = fetch_psgc_levels(PSGC_LEVELS)
+    version = tuple(snapshots.items())
+    return build_psgc_hierarchy(version), version, status, seconds
 
-psgc_data = fetch_psgc_data()
-df_psgc = pd.DataFrame(psgc_data)
+
+# ----------------------------
+# Drill-down mode
+# ----------------------------
+# Regions load first; a region's provinces and cities load when it is picked and a city's
+# barangays when it is opened, each slice through the snapshot and Arrow caches above.
+# Loaded slices are shared by every session in an LRU bounded by PSGC_SLICE_CACHE_MB, and
+# the slices next to the current choice are prefetched on a background thread.
+PSGC_DRILL_DOWN = os.environ.get("PSGC_DRILL_DOWN", "") == "1"
+PSGC_SLICE_CACHE_MB = float(os.environ.get("PSGC_SLICE_CACHE_MB", 64))
+PSGC_PREFETCH = int(os.environ.get("PSGC_PREFETCH", 2))
+
+
+@st.cache_resource
+def slice_cache():
+    # endpoint -> (pages, frame, bytes), least recently used first
+    return {"lock": threading.Lock(), "slices": OrderedDict(), "bytes": 0, "prefetching": set()}
+
+
+def load_slice(session, state, cache, endpoint):
+    # -> (frame or None, pages, metas); runs on the script thread or a prefetch thread
+    snapshots, metas = fetch_snapshots(session, state, [endpoint])
+    pages = snapshots[endpoint]
+    if pages is None:
+        return None, None, metas
+    with cache["lock"]:
+        cached = cache["slices"].get(endpoint)
+        if cached and cached[0] == pages:
+            cache["slices"].move_to_end(endpoint)
+            return cached[1], pages, metas
+    frame = load_compact_level(endpoint, pages)
+    size = int(frame.memory_usage(deep=True).sum())
+    with cache["lock"]:
+        replaced = cache["slices"].pop(endpoint, None)
+        cache["bytes"] += size - (replaced[2] if replaced else 0)
+        cache["slices"][endpoint] = (pages, frame, size)
+        while cache["bytes"] > PSGC_SLICE_CACHE_MB * 2 ** 20 and len(cache["slices"]) > 1:
+            _, (_, _, evicted) = cache["slices"].popitem(last=False)
+            cache["bytes"] -= evicted
+    return frame, pages, metas
+
+
+def prefetch_slices(session, state, cache, endpoints):
+    with cache["lock"]:
+        pending = [endpoint for endpoint in endpoints
+                   if endpoint not in cache["slices"] and endpoint not in cache["prefetching"]]
+        cache["prefetching"].update(pending)
+    if not pending:
+        return
+
+    def prefetch():
+        for endpoint in pending:
+            try:
+                load_slice(session, state, cache, endpoint)
+            finally:
+                with cache["lock"]:
+                    cache["prefetching"].discard(endpoint)
+
+    threading.Thread(target=prefetch, name="psgc-prefetch", daemon=True).start()
+
+
+def next_options(options, selected, count=PSGC_PREFETCH):
+    # Users tend to step through a list in order: the options right after the current one
+    start = options.index(selected) + 1 if selected in options else 0
+    return options[start:start + count]
+
+
+def drill_down_cities():
+    # -> (cities of the chosen region/province, version key, status line)
+    session, state, cache = psgc_session(), revalidation_state(), slice_cache()
+    metas = {}
+
+    def open_slice(endpoint):
+        frame, pages, slice_metas = load_slice(session, state, cache, endpoint)
+        metas.update(slice_metas)
+        return frame, pages
+
+    regions, _ = open_slice("regions")
+    if regions is None or regions.empty:
+        return pd.DataFrame(), None, snapshot_status(state, metas)
+    region_names = dict(zip(regions["code"], regions["name"]))
+    region = st.sidebar.selectbox("🗺️ Region:", list(region_names), format_func=region_names.get)
+    prefetch_slices(session, state, cache, [
+        f"regions/{code}/{child}" for code in next_options(list(region_names), region)
+        for child in ("provinces", "cities-municipalities")
+    ])
+
+    provinces, _ = open_slice(f"regions/{region}/provinces")
+    province_names = dict(zip(provinces["code"], provinces["name"])) if provinces is not None and not provinces.empty else {}
+    province = st.sidebar.selectbox("🏞️ Province:", ["All"] + list(province_names),
+                                    format_func=lambda code: province_names.get(code, "All provinces"))
+    cities_endpoint = (f"regions/{region}/cities-municipalities" if province == "All"
+                       else f"provinces/{province}/cities-municipalities")
+    cities, pages = open_slice(cities_endpoint)
+    if cities is None or cities.empty:
+        return pd.DataFrame(), None, snapshot_status(state, metas)
+
+    city_names = dict(zip(cities["code"], cities["name"]))
+    city = st.sidebar.selectbox("🏙️ City/Municipality:", ["None"] + list(city_names),
+                                format_func=lambda code: city_names.get(code, "Choose to list its barangays"))
+    prefetch_slices(session, state, cache, [
+        f"cities-municipalities/{code}/barangays" for code in next_options(list(city_names), city)
+    ])
+    if city != "None":
+        barangays, _ = open_slice(f"cities-municipalities/{city}/barangays")
+        with st.expander(f"🏘️ Barangays of {city_names[city]}", expanded=True):
+            if barangays is None:
+                st.warning("Barangays for this city could not be loaded.")
+            else:
+                st.dataframe(barangays)
+
+    with cache["lock"]:
+        slices, used = len(cache["slices"]), cache["bytes"]
+    st.sidebar.caption(f"🧺 {slices} slices cached, {used / 2 ** 20:.2f} of {PSGC_SLICE_CACHE_MB:g} MB")
+    # Shallow copy: the dashboard renames columns in place, the shared slice must not change
+    return cities.copy(deep=False), (cities_endpoint, pages), snapshot_status(state, metas)
+
+
+# ----------------------------
+# Aggregate cube
+# ----------------------------
+# Row counts per region × type × district × province × ZIP prefix, built once per dataset
+# version. The region filter and the five charts slice it instead of recounting every rerun.
+CUBE_DIMENSIONS = ["Region ID", "Type", "District", "Province ID", "ZIP Prefix"]
+
+
+@st.cache_data(show_spinner="Aggregating...")
+def build_psgc_cube(_df, version):
+    # -> (cube, region id -> row positions in _df)
+    keys = pd.DataFrame({
+        "Region ID": _df["Region ID"].astype("string"),
+        "Type": _df["Type"],
+        "District": _df["District"],
+        "Province ID": _df["Province ID"],
+        "ZIP Prefix": _df["ZIP Code"].astype("string").str[:2],
+    })
+    cube = keys.groupby(CUBE_DIMENSIONS, dropna=False).size().rename("Count").reset_index()
+    return cube, keys.groupby("Region ID").indices
+
+
+def cube_counts(cube, dimension):
+    # Same as value_counts() on the rows: missing labels are left out, largest first
+    return cube.groupby(dimension)["Count"].sum().sort_values(ascending=False, kind="stable")
+
+
+# ----------------------------
+# Chart backends
+# ----------------------------
+# Each chart is a small spec (kind, data, encodings) that either backend can draw:
+# "server" renders matplotlib/seaborn PNGs here, "client" ships the data to the browser
+# (Vega-Lite for bars, plotly for the rest). PSGC_CHART_BACKEND picks one for the whole
+# deployment; unset, every chart keeps the renderer it always had.
+CHART_BACKEND = os.environ.get("PSGC_CHART_BACKEND", "")
+CHART_BACKENDS = ["server", "client"]
+CHART_CACHE_ENTRIES = int(os.environ.get("CHART_CACHE_ENTRIES", 64))
+BENCHMARK_MBPS = float(os.environ.get("BENCHMARK_MBPS", 10))
+
+
+def figure_png(spec):
+    # The figure is closed on every path, also when drawing fails (e.g. a heatmap of an empty pivot)
+    fig, ax = plt.subplots(figsize=spec.get("figsize", (6.4, 4.8)))
+    try:
+        draw_server_figure(ax, spec)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)  # same output as st.pyplot
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def draw_server_figure(ax, spec):
+    kind, data = spec["kind"], spec["data"]
+    if kind == "bar":
+        ax.bar(data[spec["x"]].astype(str), data[spec["y"]])
+    elif kind == "pie":
+        ax.pie(data[spec["y"]], labels=data[spec["x"]], autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')
+    elif kind == "line":
+        for label, group in data.groupby(spec["color"], sort=False):
+            ax.plot(group[spec["x"]], group[spec["y"]], marker="o", label=label)
+        ax.legend(title=spec["color"])
+    elif kind == "heatmap":
+        sns.heatmap(data, annot=True, fmt='d', cmap=spec.get("cmap"), ax=ax)
+    elif kind == "scatter":
+        sizes = data[spec["size"]] / max(data[spec["size"]].max(), 1) * 300
+        ax.scatter(data[spec["x"]].astype(str), data[spec["y"]], s=sizes, c=range(len(data)), cmap="tab20")
+        ax.tick_params(axis="x", labelrotation=90, labelsize=6)
+    ax.set_title(spec.get("title", ""))
+
+
+def client_figure(spec):
+    kind, data = spec["kind"], spec["data"]
+    if kind == "pie":
+        return px.pie(data, names=spec["x"], values=spec["y"], title=spec.get("title"))
+    if kind == "line":
+        return px.line(data, x=spec["x"], y=spec["y"], color=spec["color"], markers=True, title=spec.get("title"))
+    if kind == "heatmap":
+        return px.imshow(data, text_auto=True, aspect="auto", color_continuous_scale=spec.get("cmap"),
+                         title=spec.get("title"))
+    if kind == "scatter":
+        return px.scatter(data, x=spec["x"], y=spec["y"], size=spec["size"], color=spec["color"], title=spec.get("title"))
+    return px.bar(data, x=spec["x"], y=spec["y"], title=spec.get("title"))
+
+
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def render_png(spec):
+    # Keyed by the hash of the aggregate in the spec and its parameters, least recently used dropped first
+    return figure_png(spec)
+
+
+def show_chart(spec, default):
+    backend = CHART_BACKEND or default
+    if backend == "server":
+        st.image(render_png(spec))
+    elif spec["kind"] == "bar":
+        st.bar_chart(spec["data"].set_index(spec["x"])[spec["y"]])
+    else:
+        st.plotly_chart(client_figure(spec))
+
+
+def arrow_bytes(df):
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def benchmark_chart(spec, backend, repeats=3):
+    # -> (server CPU ms, payload bytes) of an uncached render, as sent to the browser
+    started = time.thread_time()
+    for _ in range(repeats):
+        if backend == "server":
+            payload = len(figure_png(spec))
+        elif spec["kind"] == "bar":
+            payload = arrow_bytes(spec["data"])  # st.bar_chart sends the data as Arrow
+        else:
+            payload = len(client_figure(spec).to_json())
+    return (time.thread_time() - started) / repeats * 1000, payload
+
+
+def benchmark_charts(specs):
+    rows = []
+    for name, spec in specs.items():
+        for backend in CHART_BACKENDS:
+            cpu_ms, payload = benchmark_chart(spec, backend)
+            rows.append({
+                "Chart": name,
+                "Backend": backend,
+                "Server CPU (ms)": round(cpu_ms, 1),
+                "Payload (KB)": round(payload / 1024, 1),
+                "Est. first paint (ms)": round(cpu_ms + payload * 8 / (BENCHMARK_MBPS * 1e6) * 1000, 1),
+            })
+    return pd.DataFrame(rows)
+
+
+drill_down = st.sidebar.checkbox("🔽 Drill-down mode", value=PSGC_DRILL_DOWN,
+                                 help="Load provinces, cities and barangays only when you open them")
+if drill_down:
+    df_psgc, psgc_version, psgc_status = drill_down_cities()
+    st.sidebar.caption(psgc_status)
+else:
+    psgc_hierarchy, psgc_version, psgc_status, psgc_seconds = fetch_psgc_data()
+    st.sidebar.caption(psgc_status)
+    st.sidebar.caption("🗂️ " + " · ".join(
+        f"{len(psgc_hierarchy[level]):,} {level.replace('-', '/')}" for level in PSGC_LEVELS
+    ) + f" in {psgc_seconds:.2f} s")
+    df_psgc = psgc_hierarchy["cities-municipalities"].drop(columns=["region_code", "province_code"], errors="ignore")
 
 if not df_psgc.empty:
     # Rename columns for clarity
@@ -22,36 +569,45 @@ if not df_psgc.empty:
         'district': 'District',
         'type': 'Type',
         'region_id': 'Region ID',
-        'province_id': 'Province ID'
+        'province_id': 'Province ID',
+        'region_name': 'Region',
+        'province_name': 'Province'
     }, inplace=True)
 
-    # Sidebar filter
-    region_ids = sorted(df_psgc['Region ID'].dropna().unique().astype(str))
-    selected_region = st.sidebar.selectbox("📍 Filter by Region ID:", ["All"] + region_ids)
+    psgc_cube, region_rows = build_psgc_cube(df_psgc, psgc_version)
+
+    # Sidebar filter (in drill-down mode the region is already chosen)
+    region_ids = sorted(region_rows)
+    selected_region = "All" if drill_down else st.sidebar.selectbox("📍 Filter by Region ID:", ["All"] + region_ids)
 
     if selected_region != "All":
-        df_psgc = df_psgc[df_psgc['Region ID'].astype(str) == selected_region]
+        df_psgc = df_psgc.iloc[region_rows[selected_region]]
+        psgc_cube = psgc_cube[psgc_cube["Region ID"] == selected_region]
 
     # Display filtered data
     st.subheader("📋 Filtered Cities/Municipalities")
     st.dataframe(df_psgc)
 
+    chart_specs = {}
+
     # Chart 1: Bar Chart - Count by Type
     st.subheader("1. Bar Chart: Count by Type")
-    st.bar_chart(df_psgc['Type'].value_counts())
+    chart_specs["Count by Type"] = {
+        "kind": "bar", "data": cube_counts(psgc_cube, 'Type').reset_index(), "x": "Type", "y": "Count",
+    }
+    show_chart(chart_specs["Count by Type"], default="client")
 
     # Chart 2: Pie Chart - Distribution by District
     st.subheader("2. Pie Chart: Distribution by District")
-    district_counts = df_psgc['District'].value_counts()
-    fig1, ax1 = plt.subplots()
-    ax1.pie(district_counts, labels=district_counts.index, autopct='%1.1f%%', startangle=90)
-    ax1.axis('equal')
-    st.pyplot(fig1)
+    district_counts = cube_counts(psgc_cube, 'District')
+    chart_specs["Distribution by District"] = {
+        "kind": "pie", "data": district_counts.reset_index(), "x": "District", "y": "Count",
+    }
+    show_chart(chart_specs["Distribution by District"], default="server")
 
     # Chart 3: Line Chart - Simulated ZIP Growth
     st.subheader("3. Line Chart: Simulated ZIP Growth")
-    zip_prefix = df_psgc['ZIP Code'].dropna().astype(str).str[:2]
-    zip_counts = zip_prefix.value_counts().head(5)
+    zip_counts = cube_counts(psgc_cube, 'ZIP Prefix').head(5)
     growth_df = pd.DataFrame({
         'ZIP Prefix': zip_counts.index,
         '2020': zip_counts.values * 0.8,
@@ -61,23 +617,35 @@ if not df_psgc.empty:
 
     # Reshape and plot
     growth_df_reset = growth_df.reset_index().melt(id_vars='ZIP Prefix', var_name='Year', value_name='Count')
-    fig_line = px.line(growth_df_reset, x='Year', y='Count', color='ZIP Prefix', markers=True,
-                       title="Simulated ZIP Growth Over Years")
-    st.plotly_chart(fig_line)
+    chart_specs["Simulated ZIP Growth"] = {
+        "kind": "line", "data": growth_df_reset, "x": "Year", "y": "Count", "color": "ZIP Prefix",
+        "title": "Simulated ZIP Growth Over Years",
+    }
+    show_chart(chart_specs["Simulated ZIP Growth"], default="client")
 
     # Chart 4: Heatmap - Region ID vs Type
     st.subheader("4. Heatmap: Region ID vs Type")
-    pivot = pd.crosstab(df_psgc['Region ID'], df_psgc['Type'])
-    fig2, ax2 = plt.subplots(figsize=(10, 5))
-    sns.heatmap(pivot, annot=True, fmt='d', cmap='YlOrBr', ax=ax2)
-    st.pyplot(fig2)
+    pivot = psgc_cube.pivot_table(index='Region ID', columns='Type', values='Count', aggfunc='sum', fill_value=0)
+    chart_specs["Region ID vs Type"] = {"kind": "heatmap", "data": pivot, "cmap": "YlOrBr", "figsize": (10, 5)}
+    show_chart(chart_specs["Region ID vs Type"], default="server")
 
     # Chart 5: Scatter Plot - Count per Province ID
     st.subheader("5. Scatter Plot: Count per Province ID")
-    province_counts = df_psgc['Province ID'].value_counts().reset_index()
+    province_counts = cube_counts(psgc_cube, 'Province ID').reset_index()
     province_counts.columns = ['Province ID', 'Count']
-    fig3 = px.scatter(province_counts, x='Province ID', y='Count', size='Count', color='Province ID')
-    st.plotly_chart(fig3)
+    chart_specs["Count per Province ID"] = {
+        "kind": "scatter", "data": province_counts, "x": "Province ID", "y": "Count", "size": "Count",
+        "color": "Province ID",
+    }
+    show_chart(chart_specs["Count per Province ID"], default="client")
+
+    # Render benchmark
+    if st.sidebar.checkbox("⏱️ Benchmark chart backends"):
+        st.subheader("⏱️ Chart Backend Benchmark")
+        st.dataframe(benchmark_charts(chart_specs), hide_index=True)
+        st.caption(f"Server CPU per uncached render; first paint estimated as CPU + payload transfer at "
+                   f"{BENCHMARK_MBPS:g} Mbit/s (browser-side drawing not included). "
+                   f"Deployment backend: {CHART_BACKEND or 'per chart'}.")
 
 else:
     st.error("❌ Failed to load PSGC API data.")
@@ -1,14 +1,652 @@
+import io
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import time
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 
+# ----------------------------
+# Columnar cache for the CSV
+# ----------------------------
+# The CSV is parsed once into an Arrow IPC file keyed by path + mtime + size.
+# Later reruns (and other app processes) memory-map that file instead of re-parsing text.
+# When the CSV only grew, just the new tail is parsed and written as its own segment; a version
+# is the list of segments in its sidecar, so an append never rewrites the rows before it. Every
+# MAX_CACHE_SEGMENTS appends the segments are compacted into one file (one full rewrite).
+CACHE_DIR = os.environ.get("CSV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "streamlit_csv_cache"))
+SAMPLE_ROWS = 10_000
+CHUNK_ROWS = 250_000
+FINGERPRINT_BLOCK_BYTES = 1024 * 1024
+MAX_CACHE_SEGMENTS = int(os.environ.get("CSV_MAX_CACHE_SEGMENTS", 16))
+# Files above this size open in out-of-core mode by default
+OUT_OF_CORE_BYTES = int(os.environ.get("CSV_OUT_OF_CORE_BYTES", 2 * 1024 ** 3))
+
+
+def columnar_cache_path(path):
+    stat = os.stat(path)
+    path_key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    version_key = hashlib.sha1(f"{stat.st_mtime_ns}|{stat.st_size}".encode("utf-8")).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{path_key}-{version_key}.arrow")
+
+
+def cache_prefix(cache_path):
+    # Shared by every version of the same CSV
+    return os.path.basename(cache_path).rsplit("-", 1)[0] + "-"
+
+
+def temporary_path(path):
+    # Unique per process and thread, so concurrent writers never share a partial file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+@st.cache_resource
+def ingest_locks():
+    # CSV path -> lock, so one session ingests a new version while the others wait for it
+    return {}
+
+
+def ingest_lock(path):
+    return ingest_locks().setdefault(os.path.abspath(path), threading.Lock())
+
+
+def read_cache_meta(cache_path):
+    with open(f"{cache_path}.json", encoding="utf-8") as sidecar:
+        return json.load(sidecar)
+
+
+def infer_csv_schema(path):
+    sample = pd.read_csv(path, nrows=SAMPLE_ROWS)
+    fields = []
+    for name, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            fields.append(pa.field(name, pa.bool_()))
+        elif pd.api.types.is_integer_dtype(dtype):
+            fields.append(pa.field(name, pa.int64()))
+        elif pd.api.types.is_float_dtype(dtype):
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def csv_dtypes(schema):
+    # Nullable pandas dtypes, so a missing value in a later chunk does not break the sampled types
+    pandas_dtypes = {pa.bool_(): "boolean", pa.int64(): "Int64", pa.float64(): "float64", pa.string(): str}
+    return {field.name: pandas_dtypes[field.type] for field in schema}
+
+
+def stream_csv_to_ipc(path, out_path, schema, progress=None):
+    # Returns the number of CSV bytes consumed
+    total_bytes = max(os.path.getsize(path), 1)
+    with open(path, "rb") as source, pa.OSFile(out_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for chunk in pd.read_csv(source, dtype=csv_dtypes(schema), chunksize=CHUNK_ROWS):
+            # A Table, since string columns of a chunk can be chunked arrays a RecordBatch cannot hold
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            if progress is not None:
+                progress(min(source.tell() / total_bytes, 1.0))
+        return source.tell()
+
+
+def source_fingerprint(path, size):
+    # Digest of every byte before `size`, so an in-place edit anywhere forces a full reload;
+    # hashing is bound by disk reads and far cheaper than parsing the same bytes again
+    digest = hashlib.sha1()
+    with open(path, "rb") as source:
+        remaining = size
+        while remaining > 0:
+            block = source.read(min(remaining, FINGERPRINT_BLOCK_BYTES))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def cache_segments(cache_path, meta=None):
+    # Segment files of a version, oldest first; a version written in one go is its own only segment
+    meta = read_cache_meta(cache_path) if meta is None else meta
+    return [os.path.join(CACHE_DIR, segment) for segment in meta.get("segments", [os.path.basename(cache_path)])]
+
+
+def publish_columnar_cache(path, tmp_path, cache_path, source_size, parent=None, parent_rows=0, segments=None):
+    # The sidecar records how much of the CSV the file covers, which version it extends and the
+    # segments it is made of
+    meta = {"source_size": source_size, "fingerprint": source_fingerprint(path, source_size),
+            "segments": [os.path.basename(segment) for segment in segments or [cache_path]]}
+    if parent is not None:
+        meta.update(parent=os.path.basename(parent), parent_rows=parent_rows)
+    with open(f"{cache_path}.json", "w", encoding="utf-8") as sidecar:
+        json.dump(meta, sidecar)
+    # Rename into place, so other processes never see a partial file
+    os.replace(tmp_path, cache_path)
+
+    # Drop cache files left over from older versions of the same CSV, except this version's segments
+    # and their sidecars; a column profile belongs to one version and goes with it
+    kept = cache_segments(cache_path, meta)
+    keep = {*kept, *(f"{segment}.json" for segment in kept), f"{cache_path}.profile.json"}
+    for entry in os.listdir(CACHE_DIR):
+        stale = os.path.join(CACHE_DIR, entry)
+        if entry.startswith(cache_prefix(cache_path)) and entry.endswith((".arrow", ".json")) and stale not in keep:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass  # still mapped by another process (Windows)
+
+
+def write_columnar_cache(path, cache_path, progress=None):
+    tmp_path = temporary_path(cache_path)
+    schema = infer_csv_schema(path)
+    try:
+        consumed = stream_csv_to_ipc(path, tmp_path, schema, progress)
+    except (ValueError, OverflowError):
+        # A later chunk did not parse as the sampled types: keep every column as text
+        schema = pa.schema([pa.field(field.name, pa.string()) for field in schema])
+        consumed = stream_csv_to_ipc(path, tmp_path, schema, progress)
+    publish_columnar_cache(path, tmp_path, cache_path, consumed)
+
+
+def previous_columnar_cache(cache_path):
+    candidates = [os.path.join(CACHE_DIR, entry) for entry in os.listdir(CACHE_DIR)
+                  if entry.startswith(cache_prefix(cache_path)) and entry.endswith(".arrow")]
+    candidates = [c for c in candidates if c != cache_path and os.path.exists(f"{c}.json")]
+    return max(candidates, key=os.path.getmtime, default=None)
+
+
+def append_columnar_cache(path, previous_path, cache_path):
+    # Parses only the bytes appended since `previous_path` was written and stores them as a new
+    # segment. Returns False when earlier bytes changed (or the new rows do not fit the schema),
+    # so the caller re-ingests everything.
+    meta = read_cache_meta(previous_path)
+    old_size, size = meta["source_size"], os.path.getsize(path)
+    if not 0 < old_size < size or source_fingerprint(path, old_size) != meta["fingerprint"]:
+        return False
+    with open(path, "rb") as source:
+        source.seek(old_size - 1)
+        tail = source.read(size - old_size + 1)
+    if not tail.startswith(b"\n"):
+        return False  # the previous version ended in the middle of a line
+    tail = tail[1:tail.rfind(b"\n") + 1]  # a half-written last line waits for the next reload
+
+    previous = read_columnar_table(previous_path)
+    segments = cache_segments(previous_path, meta) + [cache_path]
+    batches = []
+    if len(segments) > MAX_CACHE_SEGMENTS:
+        segments, batches = [cache_path], previous.to_batches()  # compact: one file holds every row again
+    if tail:
+        try:
+            rows = pd.read_csv(io.BytesIO(tail), header=None, names=previous.schema.names,
+                               dtype=csv_dtypes(previous.schema))
+            batches.extend(pa.Table.from_pandas(rows, schema=previous.schema, preserve_index=False).to_batches())
+        except (ValueError, OverflowError):
+            return False
+    tmp_path = temporary_path(cache_path)
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, previous.schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    publish_columnar_cache(path, tmp_path, cache_path, old_size + len(tail), previous_path, previous.num_rows,
+                           segments)
+    return True
+
+
+def ensure_columnar_cache(path):
+    cache_path = columnar_cache_path(path)
+    # Sessions that arrive during an ingest wait here and then find the published file
+    with ingest_lock(path):
+        if not os.path.exists(cache_path):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            previous_path = previous_columnar_cache(cache_path)
+            with st.spinner("Reading rows appended to the CSV..."):
+                appended = previous_path is not None and append_columnar_cache(path, previous_path, cache_path)
+            if not appended:
+                bar = st.progress(0.0, text="Ingesting CSV into the columnar cache (first run only)...")
+                write_columnar_cache(path, cache_path,
+                                     lambda done: bar.progress(done, text=f"Ingesting CSV... {done:.0%}"))
+                bar.empty()
+    return cache_path
+
+
+def read_columnar_table(cache_path):
+    # Zero-copy: the Arrow buffers point straight into the memory-mapped segment files
+    tables = [pa.ipc.open_file(pa.memory_map(segment, "r")).read_all() for segment in cache_segments(cache_path)]
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+
+@st.cache_resource(show_spinner=False)
+def open_columnar_table(cache_path):
+    return read_columnar_table(cache_path)
+
+
+# ----------------------------
+# Dtype compaction
+# ----------------------------
+# Integers are downcast to the smallest type that holds them, floats to float32 only when
+# every value survives the round trip, and low-cardinality text columns become categoricals.
+CATEGORY_MAX_RATIO = 0.5
+
+
+def downcast_float(values):
+    # float32 rounds most decimals (11.32 -> 11.319999694824219), which would show up in labels
+    # and filter bounds, so keep float64 unless the round trip is exact
+    compact = pd.to_numeric(values, downcast="float")
+    if np.array_equal(compact.to_numpy(dtype="float64"), values.to_numpy(dtype="float64"), equal_nan=True):
+        return compact
+    return values
+
+
+def compact_dtypes(df):
+    columns, report = {}, []
+    for column in df.columns:
+        values = compact = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(values):
+            pass
+        elif pd.api.types.is_integer_dtype(values):
+            compact = pd.to_numeric(values, downcast="integer")
+        elif pd.api.types.is_float_dtype(values):
+            compact = downcast_float(values)
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            if values.nunique() <= CATEGORY_MAX_RATIO * len(values):
+                compact = values.astype("category")
+        columns[column] = compact
+        report.append({
+            "Column": column,
+            "Before": str(values.dtype),
+            "After": str(compact.dtype),
+            "Before (MB)": values.memory_usage(index=False, deep=True) / 1024 ** 2,
+            "After (MB)": compact.memory_usage(index=False, deep=True) / 1024 ** 2,
+        })
+    return pd.DataFrame(columns), pd.DataFrame(report)
+
+
+def show_memory_report(report):
+    before, after = report["Before (MB)"].sum(), report["After (MB)"].sum()
+    with st.sidebar.expander(f"🧠 Memory: {before:,.1f} MB → {after:,.1f} MB"):
+        st.dataframe(report, hide_index=True, column_config={
+            "Before (MB)": st.column_config.NumberColumn(format="%.2f"),
+            "After (MB)": st.column_config.NumberColumn(format="%.2f"),
+        })
+
+
+def append_frame(df, report, tail):
+    # Cast the appended rows to the compacted dtypes, widening a column where a new value needs it
+    columns = {}
+    for column in df.columns:
+        old, new = df[column], tail[column]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            categories = old.cat.categories.union(pd.Index(new.dropna().unique()))
+            if len(categories) > len(old.cat.categories):
+                old = old.cat.set_categories(categories)
+            new = new.astype(old.dtype)
+        elif pd.api.types.is_integer_dtype(old) and pd.api.types.is_integer_dtype(new):
+            new = pd.to_numeric(new, downcast="integer")
+        elif pd.api.types.is_float_dtype(old) and pd.api.types.is_float_dtype(new):
+            new = downcast_float(new)
+        columns[column] = pd.concat([old, new], ignore_index=True)
+    df = pd.DataFrame(columns)
+
+    report = report.copy()
+    report["After"] = [str(df[column].dtype) for column in report["Column"]]
+    report["Before (MB)"] += tail.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2
+    report["After (MB)"] = df.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2
+    return df, report
+
+
+@st.cache_resource
+def loaded_frames():
+    # cache path -> (compacted DataFrame, memory report), shared read-only by every session
+    return {}
+
+
+# ----------------------------
+# Shared dataset leases
+# ----------------------------
+# Each session leases the version it reads on every rerun; a version nobody has touched
+# for DATASET_IDLE_SECONDS is evicted on the next load, whichever session triggers it.
+DATASET_IDLE_SECONDS = float(os.environ.get("DATASET_IDLE_SECONDS", 15 * 60))
+
+
+@st.cache_resource
+def dataset_leases():
+    # cache path -> {session id: last seen}
+    return {}
+
+
+@st.cache_resource
+def dataset_lock():
+    return threading.RLock()
+
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+def lease_dataset(cache_path):
+    now = time.time()
+    leases = dataset_leases()
+    leases.setdefault(cache_path, {})[current_session_id()] = now
+    for path, holders in list(leases.items()):
+        for session in [session for session, seen in holders.items() if now - seen > DATASET_IDLE_SECONDS]:
+            holders.pop(session)
+        if not holders:
+            leases.pop(path)
+    frames = loaded_frames()
+    for idle in [path for path in frames if path not in leases]:
+        frames.pop(idle)
+        drop_derived(idle)
+
+
+def dataset_sessions(cache_path):
+    return len(dataset_leases().get(cache_path, {}))
+
+
+def load_csv(path):
+    cache_path = ensure_columnar_cache(path)
+    with dataset_lock():
+        frames = loaded_frames()
+        if cache_path not in frames:
+            meta = read_cache_meta(cache_path)
+            parent_path = os.path.join(CACHE_DIR, meta["parent"]) if "parent" in meta else None
+            if parent_path in frames:
+                # Only rows were appended: extend the frame and its indexes instead of reloading
+                tail = read_columnar_table(cache_path).slice(meta["parent_rows"]).to_pandas()
+                frames[cache_path] = append_frame(*frames[parent_path], tail)
+                extend_derived(parent_path, cache_path, frames[cache_path][0], meta["parent_rows"])
+            else:
+                with st.spinner("Loading dataset..."):
+                    frames[cache_path] = compact_dtypes(read_columnar_table(cache_path).to_pandas(split_blocks=True))
+            for stale in [key for key in frames if key != cache_path and cache_prefix(key) == cache_prefix(cache_path)]:
+                frames.pop(stale)
+                dataset_leases().pop(stale, None)
+                drop_derived(stale)
+        lease_dataset(cache_path)
+        df, memory_report = frames[cache_path]
+    # A shallow copy shares the column buffers; copy-on-write keeps the shared frame untouched
+    return df.copy(deep=False), cache_path, memory_report
+
+
+def load_csv_out_of_core(path):
+    cache_path = ensure_columnar_cache(path)
+    meta = read_cache_meta(cache_path)
+    if "parent" in meta:
+        open_columnar_table.clear(os.path.join(CACHE_DIR, meta["parent"]))
+    return open_columnar_table(cache_path), cache_path
+
+
+# ----------------------------
+# Out-of-core scans
+# ----------------------------
+# The record batches of the cache file are the spilled partitions: each scan walks them
+# one at a time, so resident memory stays bounded by the OS page cache, not the file size.
+MAX_DISTINCT_VALUES = 10_000
+MAX_SCAN_MATCHES = 100_000
+
+
+@st.cache_data(show_spinner="Scanning distinct values...")
+def scan_distinct_values(_table, dataset_key, column):
+    values = set()
+    for batch in _table.to_batches():
+        values.update(str(v) for v in pc.unique(batch.column(column)).to_pylist() if v is not None)
+        if len(values) > MAX_DISTINCT_VALUES:
+            return None  # too many to list, the value is typed in instead
+    return sorted(values)
+
+
+@st.cache_data(show_spinner="Scanning partitions...", max_entries=32)
+def scan_filter(_table, dataset_key, column, label, limit=MAX_SCAN_MATCHES):
+    # Returns the first `limit` matching row ids and the total number of matches
+    arrow_type = _table.schema.field(column).type
+    value = label
+    if pa.types.is_boolean(arrow_type):
+        value = label == "True"
+    elif pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        try:
+            value = float(label)
+        except (TypeError, ValueError):
+            return np.empty(0, dtype=np.int64), 0
+
+    matches, total, offset = [], 0, 0
+    for batch in _table.to_batches():
+        mask = pc.fill_null(pc.equal(batch.column(column), value), False)
+        hits = np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+        total += len(hits)
+        kept = sum(len(m) for m in matches)
+        if kept < limit:
+            matches.append(hits[:limit - kept] + offset)
+        offset += batch.num_rows
+    rows = np.concatenate(matches) if matches else np.empty(0, dtype=np.int64)
+    return rows, total
+
+
+# ----------------------------
+# Inverted value index for the filter
+# ----------------------------
+# Built once per column and dataset version: value label -> row positions.
+# A filter becomes an O(matches) lookup instead of an astype(str) scan of the column.
+@st.cache_resource
+def derived_store():
+    # (dataset key, kind, column) -> index or aggregate derived from one dataset version
+    return {}
+
+
+# kind -> extend(previous value, new column, first appended row) carries a derived structure over
+# to an appended version of the dataset; kinds without an entry are rebuilt on demand
+DERIVED_EXTENDERS = {}
+
+
+def derived(dataset_key, kind, column, build):
+    # The store is shared by every session, so it is only touched under the dataset lock;
+    # the build itself runs outside it (a concurrent build of the same key keeps the first result)
+    store, key = derived_store(), (dataset_key, kind, column)
+    with dataset_lock():
+        if key in store:
+            return store[key]
+    value = build()
+    with dataset_lock():
+        return store.setdefault(key, value)
+
+
+def extend_derived(previous_key, dataset_key, df, offset):
+    store = derived_store()
+    with dataset_lock():
+        for previous, kind, column in [key for key in store if key[0] == previous_key]:
+            value = store.pop((previous, kind, column))
+            if kind in DERIVED_EXTENDERS:
+                store[(dataset_key, kind, column)] = DERIVED_EXTENDERS[kind](value, df[column], offset)
+
+
+def drop_derived(dataset_key):
+    store = derived_store()
+    with dataset_lock():
+        for key in [key for key in store if key[0] == dataset_key]:
+            store.pop(key, None)
+
+
+def build_value_index(values):
+    codes, uniques = pd.factorize(values)
+    # Distinct raw values can share a label (e.g. 1 and "1"), so factorize the labels too
+    labels = pd.Index(uniques).astype(str)
+    label_codes, labels = pd.factorize(labels)
+    codes = np.append(label_codes, -1)[codes]
+
+    order = np.argsort(codes, kind="stable")[np.count_nonzero(codes < 0):]
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    rows = dict(zip(labels, np.split(order, np.cumsum(counts)[:-1])))
+    return {
+        "values": sorted(rows),
+        "rows": rows,
+        # Per-row label codes, so a filter on an already narrowed row set is O(rows) too
+        "codes": codes.astype(np.int32),
+        "code_of": {label: code for code, label in enumerate(labels)},
+    }
+
+
+def extend_value_index(value_index, values, offset):
+    tail = build_value_index(values.iloc[offset:])
+    rows, code_of = dict(value_index["rows"]), dict(value_index["code_of"])
+    for label, positions in tail["rows"].items():
+        rows[label] = np.concatenate([rows[label], positions + offset]) if label in rows else positions + offset
+        code_of.setdefault(label, len(code_of))
+    tail_codes = np.array([code_of[label] for label in tail["code_of"]] + [-1], dtype=np.int32)[tail["codes"]]
+    return {
+        "values": sorted(rows),
+        "rows": rows,
+        "codes": np.concatenate([value_index["codes"], tail_codes]),
+        "code_of": code_of,
+    }
+
+
+DERIVED_EXTENDERS["value_index"] = extend_value_index
+
+
+def column_value_index(df, dataset_key, column):
+    return derived(dataset_key, "value_index", column, lambda: build_value_index(df[column]))
+
+
+def lookup_rows(value_index, value):
+    return value_index["rows"].get(value, np.empty(0, dtype=np.intp))
+
+
+# ----------------------------
+# Search anywhere
+# ----------------------------
+# Each text column gets a trigram index over its distinct values. A query intersects the
+# posting lists of its trigrams, checks the few candidate values, and maps them to rows
+# through the value index, so no row is scanned.
+def text_columns(df):
+    return [column for column in df.columns
+            if isinstance(df[column].dtype, pd.CategoricalDtype)
+            or pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column])]
+
+
+def build_trigram_index(labels, first_id=0):
+    postings = {}
+    for label_id, label in enumerate(labels, start=first_id):
+        text = label.lower()
+        for trigram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            postings.setdefault(trigram, []).append(label_id)
+    return {
+        "labels": list(labels),
+        "lower": [label.lower() for label in labels],
+        "postings": {trigram: np.array(ids, dtype=np.int32) for trigram, ids in postings.items()},
+    }
+
+
+def extend_trigram_index(trigram_index, values, offset):
+    known = set(trigram_index["labels"])
+    new_labels = [label for label in values.iloc[offset:].dropna().astype(str).unique() if label not in known]
+    tail = build_trigram_index(new_labels, first_id=len(trigram_index["labels"]))
+    postings = dict(trigram_index["postings"])
+    for trigram, ids in tail["postings"].items():
+        postings[trigram] = np.concatenate([postings[trigram], ids]) if trigram in postings else ids
+    return {
+        "labels": trigram_index["labels"] + tail["labels"],
+        "lower": trigram_index["lower"] + tail["lower"],
+        "postings": postings,
+    }
+
+
+DERIVED_EXTENDERS["trigram"] = extend_trigram_index
+
+
+def matching_labels(trigram_index, query):
+    if len(query) < 3:
+        candidates = range(len(trigram_index["labels"]))  # too short for trigrams, check every value
+    else:
+        postings = [trigram_index["postings"].get(query[i:i + 3]) for i in range(len(query) - 2)]
+        if any(ids is None for ids in postings):
+            return []
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+    lower = trigram_index["lower"]
+    return [trigram_index["labels"][i] for i in candidates if query in lower[i]]
+
+
+def search_rows(df, dataset_key, query):
+    query = query.strip().lower()
+    hits = []
+    for column in text_columns(df):
+        value_index = column_value_index(df, dataset_key, column)
+        trigram_index = derived(dataset_key, "trigram", column, lambda: build_trigram_index(value_index["values"]))
+        hits.extend(lookup_rows(value_index, label) for label in matching_labels(trigram_index, query))
+    return np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.intp)
+
+
+# ----------------------------
+# Paginated tables
+# ----------------------------
+# Only the visible page is serialized to the browser. Sorting happens on the server.
+PAGE_SIZES = [25, 50, 100, 500]
+ORIGINAL_ORDER = "(original order)"
+
+
+@st.cache_resource(show_spinner="Sorting...", max_entries=8)
+def sort_ranks(_df, dataset_key, column, ascending):
+    # Full-column sort permutation plus each row's rank in it, shared by every page and filter
+    values = _df[column].reset_index(drop=True)
+    try:
+        perm = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+    except TypeError:
+        perm = values.astype(str).sort_values(ascending=ascending, kind="stable").index.to_numpy()
+    ranks = np.empty(len(perm), dtype=np.int64)
+    ranks[perm] = np.arange(len(perm))
+    return perm, ranks
+
+
+def paginated_table(data, dataset_key, rows=None, key="table"):
+    # `data` is a DataFrame or, in out-of-core mode, the memory-mapped Arrow table.
+    # `rows` optionally restricts the view to those row positions (a filter result).
+    in_memory = isinstance(data, pd.DataFrame)
+    total = (len(data) if in_memory else data.num_rows) if rows is None else len(rows)
+    sortable = in_memory or rows is not None
+
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
+    columns = list(data.columns) if in_memory else data.column_names
+    sort_col = col1.selectbox("Sort by", [ORIGINAL_ORDER] + columns if sortable else [ORIGINAL_ORDER],
+                              key=f"{key}_sort")
+    descending = col2.checkbox("Descending", key=f"{key}_desc", disabled=sort_col == ORIGINAL_ORDER)
+    page_size = col3.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, -(-total // page_size))
+    page = col4.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    start, stop = (page - 1) * page_size, min(page * page_size, total)
+
+    if sort_col == ORIGINAL_ORDER:
+        window = np.arange(start, stop) if rows is None else rows[start:stop]
+    elif in_memory:
+        perm, ranks = sort_ranks(data, dataset_key, sort_col, not descending)
+        window = perm[start:stop] if rows is None else rows[np.argsort(ranks[rows], kind="stable")][start:stop]
+    else:
+        order = pc.array_sort_indices(data.column(sort_col).take(rows),
+                                      order="descending" if descending else "ascending")
+        window = rows[order.to_numpy()][start:stop]
+
+    st.dataframe(data.iloc[window] if in_memory else data.take(window).to_pandas())
+    st.caption(f"Rows {min(start + 1, total):,}–{stop:,} of {total:,}")
+
 
 # Load CSV once for reuse
 csv_path = r"D:\synthetic_dataset_with_categoricals.csv"
+df_csv, table_csv, dataset_key = None, None, None
 try:
-    df_csv = pd.read_csv(csv_path)
+    out_of_core = st.sidebar.checkbox("🧱 Out-of-core mode", value=os.path.getsize(csv_path) > OUT_OF_CORE_BYTES,
+                                      help="Scan the file partition by partition instead of loading it into memory")
+    if out_of_core:
+        table_csv, dataset_key = load_csv_out_of_core(csv_path)
+    else:
+        df_csv, dataset_key, memory_report = load_csv(csv_path)
+        show_memory_report(memory_report)
+        st.sidebar.caption(f"👥 Shared in memory with {dataset_sessions(dataset_key)} active session(s)")
 except FileNotFoundError:
-    df_csv = None
     st.error(f"❌ CSV file not found at: {csv_path}")
 
 st.title("📄 Local CSV Viewer with Filtering")
@@ -20,12 +658,40 @@ if df_csv is not None:
     else:
         if st.checkbox("Show raw data"):
             st.subheader("📊 Raw Data:")
-            st.dataframe(df_csv)
+            paginated_table(df_csv, dataset_key, key="raw")
 
         column_to_filter = st.selectbox("Select a column to filter by:", df_csv.columns)
-        unique_values = df_csv[column_to_filter].dropna().unique()
-        selected_value = st.selectbox(f"Select a value from '{column_to_filter}':", sorted(unique_values.astype(str)))
+        value_index = column_value_index(df_csv, dataset_key, column_to_filter)
+        selected_value = st.selectbox(f"Select a value from '{column_to_filter}':", value_index["values"])
+
+        st.subheader("🔍 Filtered Data:")
+        paginated_table(df_csv, dataset_key, rows=lookup_rows(value_index, selected_value), key="filtered")
+
+        search_query = st.text_input("🔎 Search anywhere:", placeholder="Text to find in any column")
+        if search_query.strip():
+            with st.spinner("Searching..."):
+                search_hits = search_rows(df_csv, dataset_key, search_query)
+            st.subheader(f"🔎 Rows containing '{search_query.strip()}':")
+            paginated_table(df_csv, dataset_key, rows=search_hits, key="search")
+
+elif table_csv is not None:
+    if table_csv.num_columns < 5:
+        st.warning("⚠️ CSV file has less than 5 columns.")
+    else:
+        st.caption(f"🧱 Out-of-core mode: {table_csv.num_rows:,} rows in {len(table_csv.to_batches())} partitions")
+        if st.checkbox("Show raw data"):
+            st.subheader("📊 Raw Data:")
+            paginated_table(table_csv, dataset_key, key="raw")
+
+        column_to_filter = st.selectbox("Select a column to filter by:", table_csv.column_names)
+        distinct_values = scan_distinct_values(table_csv, dataset_key, column_to_filter)
+        if distinct_values is None:
+            selected_value = st.text_input(f"Enter a value for '{column_to_filter}':")
+        else:
+            selected_value = st.selectbox(f"Select a value from '{column_to_filter}':", distinct_values)
 
-        filtered_df = df_csv[df_csv[column_to_filter].astype(str) == selected_value]
+        rows, total = scan_filter(table_csv, dataset_key, column_to_filter, selected_value)
         st.subheader("🔍 Filtered Data:")
-        st.dataframe(filtered_df)
+        paginated_table(table_csv, dataset_key, rows=rows, key="filtered")
+        if total > len(rows):
+            st.caption(f"Only the first {len(rows):,} of {total:,} matching rows are kept for paging")
@@ -0,0 +1,122 @@
+import json
+import time
+import random
+import hashlib
+import argparse
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for https://psgc.cloud/api, serving synthetic PSGC data with ETag and
+# Last-Modified so app4.py can be run and tested without the network:
+#   python psgc_stub_server.py --port 8765
+#   PSGC_API_URL=http://localhost:8765/api streamlit run app4.py
+# --delay simulates a slow API, --fail an outage, --flaky intermittent 503s, --page-size a
+# paginated barangay endpoint and --version a changed dataset.
+
+DISTRICTS = ["1st District", "2nd District", "3rd District", "4th District", "Lone District", None]
+TYPES = ["City", "Mun", "SubMun"]
+
+
+def synthetic_psgc(version, regions=17, seed=7):
+    # -> {endpoint: records}, with 10-digit codes nesting region > province > city > barangay
+    rng = random.Random(seed + version)
+    levels = {"regions": [], "provinces": [], "cities-municipalities": [], "barangays": []}
+    for region in range(1, regions + 1):
+        region_id = f"{region:02d}00000000"
+        levels["regions"].append({"code": region_id, "name": f"Region {region}"})
+        for province in range(1, rng.randint(3, 7) + 1):
+            province_id = f"{region:02d}{province:03d}00000"
+            levels["provinces"].append({"code": province_id, "name": f"Province {region}-{province}",
+                                        "region_code": region_id})
+            for city in range(1, rng.randint(8, 30) + 1):
+                city_code = f"{region:02d}{province:03d}{city:02d}000"
+                levels["cities-municipalities"].append({
+                    "code": city_code,
+                    "name": f"City {region}-{province}-{city}",
+                    "type": rng.choices(TYPES, weights=[15, 84, 1])[0],
+                    "district": rng.choice(DISTRICTS),
+                    "zip_code": str(rng.randint(1000, 9811)) if rng.random() > 0.02 else None,
+                    "region_id": region_id,
+                    "province_id": province_id,
+                })
+                for barangay in range(1, rng.randint(10, 40) + 1):
+                    levels["barangays"].append({"code": f"{city_code[:7]}{barangay:03d}",
+                                                "name": f"Barangay {barangay}", "city_code": city_code})
+    return levels
+
+
+def paginate(records, page_size):
+    # Laravel-style pages, the shape page_records/page_count in app4.py understand
+    if not page_size:
+        return {1: records}
+    last_page = max(1, -(-len(records) // page_size))
+    return {page: {"data": records[(page - 1) * page_size:page * page_size],
+                   "meta": {"current_page": page, "last_page": last_page, "total": len(records)}}
+            for page in range(1, last_page + 1)}
+
+
+def nested_routes(levels):
+    # The per-parent listings, e.g. regions/<code>/provinces or cities-municipalities/<code>/barangays
+    nested = {}
+    for parent, child, key in [("regions", "provinces", "region_code"),
+                               ("regions", "cities-municipalities", "region_id"),
+                               ("provinces", "cities-municipalities", "province_id"),
+                               ("cities-municipalities", "barangays", "city_code")]:
+        for record in levels[child]:
+            nested.setdefault(f"{parent}/{record[key]}/{child}", []).append(record)
+    return nested
+
+
+def make_handler(args):
+    routes = {}
+    levels = synthetic_psgc(args.version)
+    for endpoint, records in {**levels, **nested_routes(levels)}.items():
+        for page, payload in paginate(records, args.page_size if endpoint == "barangays" else 0).items():
+            body = json.dumps(payload).encode()
+            routes[(f"/api/{endpoint}", page)] = (body, f'"{hashlib.sha1(body).hexdigest()[:16]}"')
+    last_modified = formatdate(time.time(), usegmt=True)
+    rng = random.Random(args.version)
+
+    class PsgcStubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(args.delay)
+            path, _, query = self.path.partition("?")
+            params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+            route = (path.rstrip("/"), int(params.get("page", 1)))
+            if args.fail or rng.random() < args.flaky:
+                self.send_response(503)
+                self.end_headers()
+                return
+            if route not in routes:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body, etag = routes[route]
+            if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == last_modified:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return PsgcStubHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic PSGC data locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before every response")
+    parser.add_argument("--fail", action="store_true", help="answer every request with 503")
+    parser.add_argument("--flaky", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--page-size", type=int, default=0, help="paginate barangays with this many per page")
+    parser.add_argument("--version", type=int, default=1, help="change to serve a different dataset (new ETag)")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args))
+    print(f"PSGC stub on http://127.0.0.1:{args.port}/api")
+    server.serve_forever()
@@ -1,22 +1,809 @@
+import os
+import json
+import time
+import decimal
+import datetime
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine, text
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from sqlalchemy import (JSON, Column, Float, Index, Integer, LargeBinary, MetaData, String, Table, Text, create_engine,
+                        event, exc, func, inspect, select, tuple_)
 
 
 st.title("🗃️ Streamlit + MySQL Integration")
 
-
-def get_connection():
+# ----------------------------
+# DB Connection
+# ----------------------------
+# One engine, and so one connection pool, per server process: every session and rerun
+# borrows from it instead of opening new MySQL connections. The pool is sized from the
+# environment and its checkout/wait numbers are shown in the sidebar.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
 
 
+def database_url():
+    # Replace with your own MySQL DB credentials, or set DATABASE_URL
     host = "localhost"
     user = "admin"
     password = "admin"
     database = "Project"
     port = 3306
-    engine = create_engine(f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}")
+    return os.environ.get("DATABASE_URL", f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}")
+
+
+@st.cache_resource
+def pool_metrics():
+    return {"lock": threading.Lock(), "checkouts": 0, "connects": 0, "peak": 0, "timeouts": 0,
+            "wait_total": 0.0, "wait_max": 0.0}
+
+
+@st.cache_resource
+def get_connection():
+    engine = create_engine(database_url(), pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                           pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE,
+                           pool_pre_ping=DB_POOL_PRE_PING)
+    metrics = pool_metrics()
+
+    @event.listens_for(engine, "connect")
+    def count_connect(dbapi_connection, connection_record):
+        with metrics["lock"]:
+            metrics["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        with metrics["lock"]:
+            metrics["checkouts"] += 1
+            metrics["peak"] = max(metrics["peak"], engine.pool.checkedout())
+
+    return engine
+
+
+@contextmanager
+def checkout(engine, begin=False, job=None):
+    # Connection (or transaction with begin=True) from the pool, timing how long the checkout waited.
+    # Only the MySQL pool's waits are recorded, the ones its checkout counts belong to (not the
+    # local replica's). With a background job the connection is registered so cancel_query can
+    # interrupt it.
+    metrics = pool_metrics() if engine is get_connection() else None
+    with ExitStack() as stack:
+        started = time.perf_counter()
+        try:
+            conn = stack.enter_context(engine.begin() if begin else engine.connect())
+        except exc.TimeoutError:
+            if metrics is not None:
+                with metrics["lock"]:
+                    metrics["timeouts"] += 1
+            raise
+        waited = time.perf_counter() - started
+        if metrics is not None:
+            with metrics["lock"]:
+                metrics["wait_total"] += waited
+                metrics["wait_max"] = max(metrics["wait_max"], waited)
+        if job is not None:
+            watch_connection(job, conn)
+            stack.callback(unwatch_connection, job, conn)
+        yield conn
+
+
+def show_pool_metrics(engine):
+    metrics, pool = pool_metrics(), engine.pool
+    with st.sidebar.expander("🔌 Connection pool"):
+        col1, col2 = st.columns(2)
+        col1.metric("Checked out", f"{pool.checkedout()} / {DB_POOL_SIZE + DB_MAX_OVERFLOW}")
+        col2.metric("Peak", metrics["peak"])
+        col1.metric("Checkouts", metrics["checkouts"])
+        col2.metric("New connections", metrics["connects"])
+        col1.metric("Avg wait", f"{metrics['wait_total'] / max(metrics['checkouts'], 1) * 1000:.1f} ms")
+        col2.metric("Max wait", f"{metrics['wait_max'] * 1000:.1f} ms")
+        st.caption(f"Pool size {DB_POOL_SIZE} + overflow {DB_MAX_OVERFLOW}, timeout {DB_POOL_TIMEOUT:g} s, "
+                   f"recycle {DB_POOL_RECYCLE} s, pre-ping {'on' if DB_POOL_PRE_PING else 'off'}, "
+                   f"{metrics['timeouts']} checkout timeouts")
+
+# ----------------------------
+# Query result cache
+# ----------------------------
+# Results are keyed by database and table, the table's version, the compiled SQL
+# (whitespace-normalised) and its bound parameters. Every write the app makes bumps the table's
+# version in that database and drops its entries, so refreshing the replica of a table leaves
+# the MySQL table's results alone; QUERY_CACHE_TTL (seconds, 0 = off) catches changes
+# made outside the app.
+QUERY_CACHE_ENTRIES = int(os.environ.get("QUERY_CACHE_ENTRIES", 256))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", 300))
+FETCHES = {
+    "scalar": lambda result: result.scalar_one(),
+    "scalars": lambda result: result.scalars().all(),
+    "rows": lambda result: [dict(row) for row in result.mappings()],
+}
+
+
+@st.cache_resource
+def query_cache():
+    # ((database, table), version, sql, params, fetch) -> (stored at, result), least recently used first
+    return {"lock": threading.Lock(), "entries": OrderedDict(), "versions": {}, "hits": 0, "misses": 0}
+
+
+def table_version(engine, table_name):
+    cache = query_cache()
+    with cache["lock"]:
+        return cache["versions"].get((engine.url, table_name), 0)
+
+
+def cached_query(engine, table, query, fetch, job=None):
+    cache = query_cache()
+    compiled = query.compile(dialect=engine.dialect)
+    versioned = (engine.url, table.name)
+    with cache["lock"]:
+        version = cache["versions"].get(versioned, 0)
+    key = (versioned, version, " ".join(str(compiled).split()), tuple(sorted(compiled.params.items())), fetch)
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry and (not QUERY_CACHE_TTL or time.time() - entry[0] < QUERY_CACHE_TTL):
+            cache["entries"].move_to_end(key)
+            cache["hits"] += 1
+            return entry[1]
+        cache["misses"] += 1
+    with checkout(engine, job=job) as conn:
+        value = FETCHES[fetch](conn.execute(query))
+    with cache["lock"]:
+        if cache["versions"].get(versioned, 0) == version:  # a write during the query makes it stale
+            cache["entries"][key] = (time.time(), value)
+            while len(cache["entries"]) > QUERY_CACHE_ENTRIES:
+                cache["entries"].popitem(last=False)
+    return value
+
+
+def bump_table_version(engine, table_name):
+    cache = query_cache()
+    versioned = (engine.url, table_name)
+    with cache["lock"]:
+        cache["versions"][versioned] = cache["versions"].get(versioned, 0) + 1
+        for key in [key for key in cache["entries"] if key[0] == versioned]:
+            del cache["entries"][key]
+
+
+def show_query_cache():
+    cache = query_cache()
+    lookups = cache["hits"] + cache["misses"]
+    with st.sidebar.expander("🗄️ Query cache"):
+        col1, col2 = st.columns(2)
+        col1.metric("Hits", cache["hits"])
+        col2.metric("Misses", cache["misses"])
+        col1.metric("Hit rate", f"{cache['hits'] / lookups:.0%}" if lookups else "–")
+        col2.metric("Entries", f"{len(cache['entries'])} / {QUERY_CACHE_ENTRIES}")
+        st.caption(f"TTL {f'{QUERY_CACHE_TTL:g} s' if QUERY_CACHE_TTL else 'off'}; table versions: "
+                   + (", ".join(f"{name} ({os.path.basename(url.database or '')}) v{version}"
+                           for (url, name), version in cache["versions"].items()) or "none bumped"))
+
+
+# ----------------------------
+# Background queries
+# ----------------------------
+# Viewer queries run on a shared worker pool so the page stays responsive. Each one is a job in
+# the session's slot ("total", "values", "page"); a new key for a slot cancels the job it replaces,
+# the Cancel button and the QUERY_TIMEOUT_SECONDS watchdog stop the statement on the server
+# (KILL QUERY on MySQL, interrupt() on SQLite). Jobs left behind by a closed tab end at the timeout.
+# The watchdog starts when a worker picks the job up, so time spent queued does not count.
+# A finished viewer query is not reused: the next rerun asks cached_query again, so the query
+# cache (and QUERY_CACHE_TTL) decides how fresh it is. One-shot jobs keep their result.
+# Exports, replica refreshes and index builds run on their own smaller pool, so a few of them
+# cannot hold every worker and starve the viewer's count / values / page queries.
+QUERY_WORKERS = int(os.environ.get("QUERY_WORKERS", 4))
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", 2))
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", 30))
+QUERY_POLL_SECONDS = 0.5
+
+
+@st.cache_resource
+def query_workers():
+    return ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
+
+
+@st.cache_resource
+def background_workers():
+    return ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+
+
+def watch_connection(job, conn):
+    with job["lock"]:
+        if job["reason"]:
+            raise RuntimeError(f"Query {job['reason']}")
+        job["connections"].append(conn)
+
+
+def unwatch_connection(job, conn):
+    # Under the job lock, so a cancel never interrupts a connection that is back in the pool
+    with job["lock"]:
+        job["connections"].remove(conn)
+
+
+def interrupt(conn):
+    dbapi_connection = conn.connection.dbapi_connection
+    if conn.engine.dialect.name == "mysql":
+        with checkout(conn.engine) as killer:
+            killer.exec_driver_sql(f"KILL QUERY {int(dbapi_connection.thread_id())}")
+    elif hasattr(dbapi_connection, "interrupt"):
+        dbapi_connection.interrupt()
+
+
+def cancel_query(job, reason):
+    with job["lock"]:
+        if job["reason"] or job["done"]:
+            return
+        job["reason"] = reason
+        for conn in job["connections"]:
+            try:
+                interrupt(conn)
+            except Exception:
+                pass  # the statement finished in the meantime
+
+
+def run_query(job, run):
+    timeout = job["timeout"]
+    timer = threading.Timer(timeout, cancel_query, (job, f"timed out after {timeout:g} s"))
+    timer.daemon = True
+    with job["lock"]:
+        if job["reason"]:  # cancelled or superseded while it waited for a worker
+            job["done"] = True
+            raise RuntimeError(f"Query {job['reason']}")
+        job["started"] = time.perf_counter()
+        timer.start()
+    try:
+        return run(job)
+    except Exception:
+        if job["reason"]:
+            raise RuntimeError(f"Query {job['reason']}") from None
+        raise
+    finally:
+        timer.cancel()
+        with job["lock"]:
+            job["done"] = True
+
+
+def submit_query(slot, key, run, timeout=QUERY_TIMEOUT_SECONDS, workers=query_workers):
+    jobs = st.session_state.setdefault("queries", {})
+    job = jobs.get(slot)
+    if job and job["key"] == key:
+        return job
+    if job:
+        cancel_query(job, "superseded")
+    job = {"key": key, "lock": threading.Lock(), "connections": [], "reason": None, "done": False,
+           "started": None, "timeout": timeout}
+    job["future"] = workers().submit(run_query, job, run)
+    jobs[slot] = job
+    return job
+
+
+def forget_query(slot):
+    st.session_state.get("queries", {}).pop(slot, None)
+
+
+@st.fragment(run_every=QUERY_POLL_SECONDS)
+def query_progress(slot, job, label):
+    # Reruns on its own while the job runs, then hands back to the whole page
+    if job["future"].done():
+        st.rerun()
+    col1, col2 = st.columns([4, 1])
+    col2.button("✖ Cancel", key=f"cancel_{slot}", on_click=cancel_query, args=(job, "cancelled"))
+    if job["started"] is None:
+        col1.info(f"⏳ {label}… waiting for a free worker")
+        return
+    elapsed = time.perf_counter() - job["started"]
+    rows = f", {job['rows']:,} rows at {job['rows'] / elapsed:,.0f} rows/s" if "rows" in job else ""
+    col1.info(f"⏳ {label}… {elapsed:.1f} s{rows} (timeout {job['timeout']:g} s)")
+
+
+def query_result(slot, key, run, label, timeout=QUERY_TIMEOUT_SECONDS, workers=query_workers, one_shot=False):
+    # The job's result, or None while it runs or after it failed (shown in place). A failed job stays
+    # until "Run again"; one-shot jobs (export, refresh, index build) also keep their result.
+    job = submit_query(slot, key, run, timeout, workers)
+    wait([job["future"]], timeout=QUERY_POLL_SECONDS)  # fast and cached queries skip the progress row
+    if not job["future"].done():
+        query_progress(slot, job, label)
+        return None
+    error = job["future"].exception()
+    if error is not None:
+        col1, col2 = st.columns([4, 1])
+        col1.warning(f"🛑 {label}: {error}")
+        col2.button("🔁 Run again", key=f"retry_{slot}", on_click=forget_query, args=(slot,))
+        return None
+    if not one_shot:
+        forget_query(slot)
+    return job["future"].result()
+
+
+# ----------------------------
+# SQL pushdown
+# ----------------------------
+# Filtering, counting and paging run in the database through SQLAlchemy Core. Table and column
+# names are checked against the reflected schema and values are bound parameters, so nothing
+# typed into the page is pasted into SQL. Pages are read by keyset on the primary key.
+DISTINCT_VALUE_LIMIT = 1000
+PAGE_SIZES = [25, 50, 100, 500]
+
+
+def reflect_table(engine, table_name):
+    return describe_table(engine, table_name)[0]
+
+
+def count_query(table, condition=None):
+    query = select(func.count()).select_from(table)
+    return query if condition is None else query.where(condition)
+
+
+def count_rows(engine, table, condition=None, job=None):
+    return cached_query(engine, table, count_query(table, condition), "scalar", job)
+
+
+def distinct_values(engine, table, column, job=None):
+    query = select(column).distinct().where(column.is_not(None)).order_by(column).limit(DISTINCT_VALUE_LIMIT)
+    return cached_query(engine, table, query, "scalars", job)
+
+
+def page_query(table, condition, after, page_size, offset):
+    # Keyset: rows after the last key of the previous page, so deep pages cost as much as the first.
+    # Tables without a primary key fall back to OFFSET.
+    key = list(table.primary_key.columns)
+    query = select(table)
+    if condition is not None:
+        query = query.where(condition)
+    if key:
+        if after is not None:
+            query = query.where(tuple_(*key) > tuple_(*after) if len(key) > 1 else key[0] > after[0])
+        query = query.order_by(*key)
+    else:
+        query = query.order_by(*table.columns).offset(offset)
+    return query.limit(page_size)
+
+
+def read_page(engine, table, condition, after, page_size, offset, job=None):
+    key = list(table.primary_key.columns)
+    rows = cached_query(engine, table, page_query(table, condition, after, page_size, offset), "rows", job)
+    last_key = tuple(rows[-1][column.name] for column in key) if key and rows else None
+    return pd.DataFrame(rows, columns=[column.name for column in table.columns]), last_key
+
+
+def keyset_cursors(scope):
+    # Start key of every page visited so far; reset whenever the table, filter or page size changes
+    state = st.session_state.setdefault("keyset", {"scope": None, "cursors": [None], "next": None})
+    if state["scope"] != scope:
+        state.update(scope=scope, cursors=[None], next=None)
+    return state
+
+
+def next_page():
+    state = st.session_state["keyset"]
+    state["cursors"].append(state["next"])
+
+
+def previous_page():
+    st.session_state["keyset"]["cursors"].pop()
+
+# ----------------------------
+# Indexes and query plans
+# ----------------------------
+# Reflected tables and their indexes are cached per database for SCHEMA_CACHE_SECONDS instead of
+# being read again on every rerun. The columns users filter on are counted per table; filtered
+# columns that no index starts with are suggested for an index (an index on the column turns the
+# viewer's "WHERE column = value ORDER BY key" scans into lookups), which admins can create here.
+# JSON columns are never suggested; TEXT/BLOB columns on MySQL get a key prefix of
+# INDEX_PREFIX_LENGTH characters, since MySQL cannot index them whole.
+SCHEMA_CACHE_SECONDS = float(os.environ.get("SCHEMA_CACHE_SECONDS", 300))
+INDEX_TIMEOUT_SECONDS = float(os.environ.get("INDEX_TIMEOUT_SECONDS", 3600))
+INDEX_PREFIX_LENGTH = int(os.environ.get("INDEX_PREFIX_LENGTH", 255))
+ADMIN_USERS = ("admin",)
+
+
+@st.cache_resource
+def schema_cache():
+    # (database, table) -> (reflected at, Table, indexes)
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+@st.cache_resource
+def filter_usage():
+    # (database, table) -> {column: times filtered on}
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+def describe_table(engine, table_name):
+    # -> (Table, indexes with the primary key first), or (None, []) for an unknown table (not cached)
+    cache, key = schema_cache(), (str(engine.url), table_name)
+    with cache["lock"]:
+        entry = cache["tables"].get(key)
+    if entry and time.time() - entry[0] < SCHEMA_CACHE_SECONDS:
+        return entry[1], entry[2]
+    inspector = inspect(engine)
+    if table_name not in inspector.get_table_names():
+        return None, []
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    primary_key = [column.name for column in table.primary_key.columns]
+    indexes = [{"name": "PRIMARY", "columns": primary_key, "unique": True}] if primary_key else []
+    indexes += [{"name": index["name"], "columns": index["column_names"], "unique": bool(index["unique"])}
+                for index in inspector.get_indexes(table_name)]
+    with cache["lock"]:
+        cache["tables"][key] = (time.time(), table, indexes)
+    return table, indexes
+
+
+def record_filter(engine, table, column, value):
+    # Each new filter choice of a session counts once, not every rerun that shows it
+    choice = (str(engine.url), table.name, column, value)
+    if st.session_state.get("last_filter") == choice:
+        return
+    st.session_state["last_filter"] = choice
+    usage = filter_usage()
+    with usage["lock"]:
+        counts = usage["tables"].setdefault(choice[:2], {})
+        counts[column] = counts.get(column, 0) + 1
+
+
+def explain(engine, query):
+    compiled = query.compile(dialect=engine.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with checkout(engine) as conn:
+        return pd.DataFrame(conn.exec_driver_sql(prefix + str(compiled), params).mappings().all())
+
+
+def full_scan(plan):
+    # MySQL reports access type ALL (or index, a full index scan); SQLite says SCAN rather than SEARCH
+    if "type" in plan:
+        return bool(plan["type"].isin(["ALL", "index"]).any())
+    if "detail" in plan:
+        return bool(plan["detail"].str.startswith("SCAN").any())
+    return None
+
+
+def index_key(engine, column):
+    # -> the column as an index key, or None when it cannot be indexed directly
+    try:
+        generic = column.type.as_generic()
+    except NotImplementedError:
+        generic = column.type
+    if isinstance(generic, JSON):
+        return None
+    quoted = engine.dialect.identifier_preparer.quote(column.name)
+    if engine.dialect.name == "mysql" and isinstance(generic, (String, LargeBinary)) and not generic.length:
+        return f"{quoted}({INDEX_PREFIX_LENGTH})"  # TEXT/BLOB: without a key length MySQL fails (error 1170)
+    return quoted
+
+
+def index_advice(engine, table, indexes):
+    # Filtered columns with no index starting with them, most filtered first
+    usage = filter_usage()
+    with usage["lock"]:
+        counts = dict(usage["tables"].get((str(engine.url), table.name), {}))
+    leading = {index["columns"][0] for index in indexes if index["columns"]}
+    quote = engine.dialect.identifier_preparer.quote
+    advice = []
+    for column, filters in sorted(counts.items(), key=lambda item: -item[1]):
+        key = index_key(engine, table.c[column]) if column in table.c and column not in leading else None
+        if key is not None:
+            name = f"ix_{table.name}_{column}"[:64]
+            advice.append({"Column": column, "Filters": filters, "Index": name,
+                           "Statement": f"CREATE INDEX {quote(name)} ON {quote(table.name)} ({key})"})
+    return advice
+
+
+def create_index(engine, schema, table_name, statement, job):
+    with checkout(engine, begin=True, job=job) as conn:
+        conn.exec_driver_sql(statement)
+    with schema["lock"]:
+        schema["tables"].pop((str(engine.url), table_name), None)
+    return statement
+
+
+def start_index(table_name, advice):
+    runs = st.session_state.get("index_request", {}).get("run", 0) + 1
+    st.session_state["index_request"] = {"run": runs, "table": table_name, **advice}
+
+
+# ----------------------------
+# Streaming export
+# ----------------------------
+# Whole tables (or the filtered rows) are read through a server-side cursor (stream_results) in
+# partitions of EXPORT_BATCH_ROWS, each turned straight into an Arrow record batch and appended
+# to a Parquet or CSV file, so memory holds one batch no matter how large the table is.
+EXPORT_BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", 50_000))
+EXPORT_TIMEOUT_SECONDS = float(os.environ.get("EXPORT_TIMEOUT_SECONDS", 600))
+EXPORT_PREVIEW_ROWS = 100
+EXPORT_FORMATS = {"Parquet": ("parquet", pq.ParquetWriter), "CSV": ("csv", pacsv.CSVWriter)}
+ARROW_TYPES = {int: pa.int64(), float: pa.float64(), str: pa.string(), bool: pa.bool_(),
+               bytes: pa.binary(), datetime.datetime: pa.timestamp("us"), datetime.date: pa.date32(),
+               datetime.time: pa.time64("us"), datetime.timedelta: pa.duration("us")}
+
+
+def arrow_field(column):
+    # Types Arrow has no match for (JSON, SET, unbounded NUMERIC, ...) are written as text
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = str
+    if python_type is decimal.Decimal:
+        precision, scale = getattr(column.type, "precision", None), getattr(column.type, "scale", None)
+        scale = scale if scale is not None else 0
+        if precision is not None and precision <= 38:
+            return pa.field(column.name, pa.decimal128(precision, scale))
+        if precision is not None and precision <= 76:
+            return pa.field(column.name, pa.decimal256(precision, scale))
+    return pa.field(column.name, ARROW_TYPES.get(python_type, pa.string()))
+
+
+def to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple, set, frozenset)):
+        return json.dumps(sorted(value) if isinstance(value, (set, frozenset)) else value, default=str)
+    return str(value)
+
+
+def arrow_array(values, field):
+    try:
+        return pa.array(values, type=field.type)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        if field.type != pa.string():
+            raise
+        return pa.array([to_text(value) for value in values], type=field.type)
+
+
+def stream_batches(engine, table, condition=None, job=None):
+    schema = pa.schema([arrow_field(column) for column in table.columns])
+    query = select(table) if condition is None else select(table).where(condition)
+    with checkout(engine, job=job) as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_BATCH_ROWS).execute(query)
+        for rows in result.partitions(EXPORT_BATCH_ROWS):
+            columns = zip(*rows)
+            yield pa.record_batch([arrow_array(values, field) for values, field in zip(columns, schema)],
+                                  schema=schema)
+
+
+def export_table(engine, table, condition, fmt, path, job):
+    # -> summary with the first EXPORT_PREVIEW_ROWS rows; job["rows"] tracks progress for the page
+    extension, writer_class = EXPORT_FORMATS[fmt]
+    started, preview, writer = time.perf_counter(), [], None
+    job["rows"] = 0
+    try:
+        for batch in stream_batches(engine, table, condition, job):
+            if writer is None:
+                writer = writer_class(path, batch.schema)
+            writer.write_batch(batch)
+            if job["rows"] < EXPORT_PREVIEW_ROWS:
+                preview.append(batch.slice(0, EXPORT_PREVIEW_ROWS - job["rows"]))
+            job["rows"] += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    seconds = time.perf_counter() - started
+    return {"path": path if writer is not None else None, "file_name": f"{table.name}.{extension}",
+            "rows": job["rows"], "seconds": seconds,
+            "preview": pa.Table.from_batches(preview).to_pandas() if preview else pd.DataFrame()}
+
+
+def read_export(path):
+    # Deferred download: Streamlit calls this when the button is clicked, so the file is not read
+    # into server memory on every rerun while the export stays on the page
+    with open(path, "rb") as exported:
+        return exported.read()
+
+
+def start_export(table_name, scope, fmt):
+    # One export file per session: the previous one is removed when a new export starts
+    export_dir = st.session_state.setdefault("export_dir", tempfile.mkdtemp(prefix="act5-export-"))
+    for name in os.listdir(export_dir):
+        os.remove(os.path.join(export_dir, name))
+    runs = st.session_state.get("export", {}).get("run", 0) + 1
+    st.session_state["export"] = {"run": runs, "table": table_name, "scope": scope, "fmt": fmt,
+                                  "path": os.path.join(export_dir, f"{runs}.{EXPORT_FORMATS[fmt][0]}")}
+
+
+# ----------------------------
+# Local replica
+# ----------------------------
+# Filtering can be served from a copy of the table in a local SQLite file instead of MySQL.
+# A refresh copies only what changed: rows whose updated-at column is at or past the replica's
+# latest value (upserted by primary key), otherwise rows past the replica's highest key. Tables
+# without a primary key, and deletes, need a full reload.
+REPLICA_PATH = os.environ.get("REPLICA_PATH", os.path.join(tempfile.gettempdir(), "act5-replica.sqlite"))
+REPLICA_TIMEOUT_SECONDS = float(os.environ.get("REPLICA_TIMEOUT_SECONDS", 1800))
+REPLICA_UPDATED_COLUMNS = ("updated_at", "modified_at", "last_modified", "last_update")
+REPLICA_OVERLAP_SECONDS = float(os.environ.get("REPLICA_OVERLAP_SECONDS", 60))  # for late-committing writes
+replica_metadata = MetaData()
+replica_status = Table("_replica_status", replica_metadata,
+                       Column("table_name", String(255), primary_key=True),
+                       Column("mode", String(20)),
+                       Column("row_count", Integer),
+                       Column("refreshed_at", Float))
+
+
+@st.cache_resource
+def replica_engine():
+    engine = create_engine(f"sqlite:///{REPLICA_PATH}")
+
+    @event.listens_for(engine, "connect")
+    def use_wal(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")  # readers keep going during a refresh
+
+    replica_metadata.create_all(engine)
     return engine
 
+
+@st.cache_resource
+def replica_lock():
+    return threading.Lock()
+
+
+def replica_mode(table):
+    # -> ("updated_at" | "key" | "full", updated-at column or None)
+    updated = next((column for column in table.columns if column.name.lower() in REPLICA_UPDATED_COLUMNS), None)
+    if table.primary_key.columns and updated is not None:
+        return "updated_at", updated
+    return ("key" if table.primary_key.columns else "full"), None
+
+
+def replica_table(table):
+    # Same columns with generic types, so MySQL-specific types can be created in SQLite
+    columns = []
+    for column in table.columns:
+        try:
+            column_type = column.type.as_generic()
+        except NotImplementedError:
+            column_type = Text()
+        columns.append(Column(column.name, column_type, primary_key=column.primary_key))
+    replica = Table(table.name, MetaData(), *columns)
+    for column in replica.columns:
+        if not column.primary_key:
+            Index(f"ix_{table.name}_{column.name}", column)
+    return replica
+
+
+def refresh_replica(source, replica, lock, table, full, job):
+    mode, updated = replica_mode(table)
+    target = replica_table(table)
+    key = [target.c[column.name] for column in table.primary_key.columns]
+    started, job["rows"] = time.perf_counter(), 0
+    with lock, ExitStack() as stack:
+        conn = stack.enter_context(replica.begin())
+        watch_connection(job, conn)
+        stack.callback(unwatch_connection, job, conn)
+        status = conn.execute(select(replica_status).where(replica_status.c.table_name == table.name)).first()
+        if full or status is None or status.mode != mode or mode == "full":
+            target.drop(conn, checkfirst=True)
+            target.create(conn)
+        query = select(table)
+        if mode == "updated_at":
+            latest = conn.execute(select(func.max(target.c[updated.name]))).scalar()
+            if isinstance(latest, datetime.datetime):
+                latest -= datetime.timedelta(seconds=REPLICA_OVERLAP_SECONDS)
+            if latest is not None:
+                query = query.where(updated >= latest)
+        elif mode == "key":
+            latest = conn.execute(select(*key).order_by(*[column.desc() for column in key]).limit(1)).first()
+            if latest is not None:
+                source_key = list(table.primary_key.columns)
+                query = query.where(tuple_(*source_key) > tuple_(*latest) if len(key) > 1 else source_key[0] > latest[0])
+        insert = target.insert().prefix_with("OR REPLACE")
+        with checkout(source, job=job) as source_conn:
+            result = source_conn.execution_options(stream_results=True, max_row_buffer=EXPORT_BATCH_ROWS).execute(query)
+            for rows in result.mappings().partitions(EXPORT_BATCH_ROWS):
+                conn.execute(insert, [dict(row) for row in rows])
+                job["rows"] += len(rows)
+        row_count = conn.execute(select(func.count()).select_from(target)).scalar_one()
+        conn.execute(replica_status.delete().where(replica_status.c.table_name == table.name))
+        conn.execute(replica_status.insert(), {"table_name": table.name, "mode": mode, "row_count": row_count,
+                                               "refreshed_at": time.time()})
+    bump_table_version(replica, table.name)
+    return {"mode": mode, "copied": job["rows"], "rows": row_count, "seconds": time.perf_counter() - started}
+
+
+def start_replica_refresh(table_name, full):
+    runs = st.session_state.get("replica_refresh", {}).get("run", 0) + 1
+    st.session_state["replica_refresh"] = {"run": runs, "table": table_name, "full": full}
+
+
+def replica_panel(source, table):
+    # Refresh buttons, the running refresh and the replica's status;
+    # -> the replica's table, None before the first refresh
+    col1, col2, col3 = st.columns([3, 1, 1])
+    col2.button("🔄 Refresh", on_click=start_replica_refresh, args=(table.name, False))
+    col3.button("Full reload", on_click=start_replica_refresh, args=(table.name, True))
+    replica, lock = replica_engine(), replica_lock()
+    request = st.session_state.get("replica_refresh")
+    if request and request["table"] == table.name:
+        refreshed = query_result("replica", (table.name, request["run"]),
+                                 lambda job: refresh_replica(source, replica, lock, table, request["full"], job),
+                                 f"Refreshing the replica of {table.name}", REPLICA_TIMEOUT_SECONDS, background_workers,
+                                 one_shot=True)
+        if refreshed is not None:
+            st.caption(f"Copied {refreshed['copied']:,} rows in {refreshed['seconds']:.1f} s "
+                       f"({refreshed['mode'].replace('_', '-')} refresh).")
+    with checkout(replica) as conn:
+        status = conn.execute(select(replica_status).where(replica_status.c.table_name == table.name)).first()
+    if status is None:
+        col1.caption(f"🧊 No replica of {table.name} yet.")
+        return None
+    col1.caption(f"🧊 Replica of {table.name}: {status.row_count:,} rows, refreshed "
+                 f"{time.time() - status.refreshed_at:,.0f} s ago (by {status.mode.replace('_', '-')})")
+    return reflect_table(replica, table.name)
+
+
+# ----------------------------
+# Bulk import
+# ----------------------------
+# Uploaded files are streamed in chunks; each chunk is one executemany inside its own SAVEPOINT
+# (a bad chunk is rolled back and reported, the rest still load) and the transaction commits
+# every few chunks, so an import holds a bounded number of open transactions.
+SKIP_COLUMN = "(skip)"
+
+
+def upload_columns(upload):
+    upload.seek(0)
+    if upload.name.lower().endswith(".parquet"):
+        return pq.ParquetFile(upload).schema_arrow.names
+    return list(pd.read_csv(upload, nrows=0).columns)
+
+
+def upload_chunks(upload, batch_rows):
+    # -> (chunk DataFrame, fraction of the file read so far)
+    upload.seek(0)
+    if upload.name.lower().endswith(".parquet"):
+        parquet = pq.ParquetFile(upload)
+        done = 0
+        for batch in parquet.iter_batches(batch_size=batch_rows):
+            done += batch.num_rows
+            yield batch.to_pandas(), done / max(parquet.metadata.num_rows, 1)
+    else:
+        size = max(upload.size, 1)
+        for chunk in pd.read_csv(upload, chunksize=batch_rows):
+            yield chunk, min(upload.tell() / size, 1.0)
+
+
+def bulk_import(engine, table, upload, mapping, batch_rows, batches_per_commit):
+    # mapping: file column -> table column; -> (per-batch report, rows inserted, seconds)
+    report, inserted, started = [], 0, time.perf_counter()
+    progress = st.progress(0.0, text="Starting import...")
+    with checkout(engine) as conn:
+        transaction = conn.begin()
+        try:
+            for number, (chunk, fraction) in enumerate(upload_chunks(upload, batch_rows), start=1):
+                chunk = chunk[list(mapping)].rename(columns=mapping)
+                records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+                first_row = (number - 1) * batch_rows + 1
+                try:
+                    with conn.begin_nested():
+                        conn.execute(table.insert(), records)
+                    inserted += len(records)
+                    report.append({"Batch": number, "First row": first_row, "Rows": len(records), "Status": "✅", "Error": ""})
+                except exc.DBAPIError as error:
+                    report.append({"Batch": number, "First row": first_row, "Rows": len(records), "Status": "❌",
+                                   "Error": str(error.orig)})
+                if number % batches_per_commit == 0:
+                    transaction.commit()
+                    bump_table_version(engine, table.name)
+                    transaction = conn.begin()
+                elapsed = time.perf_counter() - started
+                progress.progress(fraction, text=f"{inserted:,} rows inserted · {inserted / max(elapsed, 1e-9):,.0f} rows/s")
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+        finally:
+            bump_table_version(engine, table.name)
+    return pd.DataFrame(report), inserted, time.perf_counter() - started
+
 engine = get_connection()
 
 # ----------------------------
@@ -43,19 +830,109 @@ if logged_in:
     # ----------------------------
     st.subheader("📋 View Data From Table")
     table_name = st.text_input("Enter table name to query:", "your_table")
+    use_replica = st.toggle("🧊 Serve from a local replica", help="Filter, count and page a local copy of the table "
+                                                                  "instead of querying MySQL.")
 
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-            st.write(f"Total rows: {df.shape[0]}")
-            if not df.empty:
-                selected_col = st.selectbox("Filter by column", df.columns)
-                unique_vals = df[selected_col].dropna().unique()
-                selected_val = st.selectbox("Select value", unique_vals.astype(str))
-                filtered = df[df[selected_col].astype(str) == selected_val]
-                st.dataframe(filtered)
-            else:
-                st.warning("Table is empty.")
+        source_table = reflect_table(engine, table_name)
+        view_engine, table = engine, source_table
+        if source_table is not None and use_replica:
+            view_engine, table = replica_engine(), replica_panel(engine, source_table)
+        if source_table is None:
+            st.error(f"❌ No table named '{table_name}'.")
+        elif table is not None:
+            origin = ("replica" if use_replica else "source", table.name, table_version(view_engine, table.name))
+            total = query_result("total", origin, lambda job: count_rows(view_engine, table, job=job),
+                                 "Counting rows")
+            if total is not None:
+                st.write(f"Total rows: {total}")
+            selected_col = st.selectbox("Filter by column", [column.name for column in table.columns])
+            unique_vals = query_result("values", (*origin, selected_col),
+                                       lambda job: distinct_values(view_engine, table, table.c[selected_col], job=job),
+                                       f"Listing values of '{selected_col}'")
+            if unique_vals:
+                selected_val = st.selectbox("Select value", unique_vals)
+                record_filter(engine, source_table, selected_col, selected_val)
+                if len(unique_vals) == DISTINCT_VALUE_LIMIT:
+                    st.caption(f"Showing the first {DISTINCT_VALUE_LIMIT} values.")
+                condition = table.c[selected_col] == selected_val
+                page_size = st.selectbox("Rows per page", PAGE_SIZES)
+                state = keyset_cursors((table_name, selected_col, selected_val, page_size))
+                start = (len(state["cursors"]) - 1) * page_size
+                after = state["cursors"][-1]
+                page = query_result("page", (*origin, selected_col, selected_val, page_size, after, start),
+                                    lambda job: (count_rows(view_engine, table, condition, job=job),
+                                                 read_page(view_engine, table, condition, after, page_size, start,
+                                                           job=job)),
+                                    "Reading page")
+                if page is not None:
+                    matched, (filtered, state["next"]) = page
+                    st.dataframe(filtered)
+                    col1, col2, col3 = st.columns([1, 1, 4])
+                    col1.button("◀ Previous", on_click=previous_page, disabled=len(state["cursors"]) == 1)
+                    col2.button("Next ▶", on_click=next_page, disabled=start + len(filtered) >= matched)
+                    col3.caption(f"Rows {start + 1 if len(filtered) else 0}–{start + len(filtered)} of {matched:,}")
+            elif unique_vals is not None:
+                st.warning("Table is empty." if total == 0 else f"'{selected_col}' has no values.")
+
+            with st.expander("📤 Export table"):
+                scopes = ["Whole table"] + (["Rows matching the filter"] if unique_vals else [])
+                scope = st.radio("Rows", scopes, horizontal=True)
+                fmt = st.selectbox("Format", list(EXPORT_FORMATS))
+                st.button("Stream export", on_click=start_export, args=(table.name, scope, fmt))
+                request = st.session_state.get("export")
+                if request and request["table"] == table.name:
+                    export_condition = condition if unique_vals and request["scope"] != "Whole table" else None
+                    export = query_result("export", (table.name, request["run"]),
+                                          lambda job: export_table(view_engine, table, export_condition,
+                                                                   request["fmt"], request["path"], job),
+                                          f"Exporting {table.name}", EXPORT_TIMEOUT_SECONDS, background_workers,
+                                          one_shot=True)
+                    if export is not None:
+                        st.caption(f"{export['rows']:,} rows in {export['seconds']:.1f} s "
+                                   f"({export['rows'] / max(export['seconds'], 1e-9):,.0f} rows/s)")
+                        st.dataframe(export["preview"])
+                        if export["path"]:
+                            st.download_button(f"⬇️ Download {export['file_name']}",
+                                               lambda path=export["path"]: read_export(path),
+                                               file_name=export["file_name"])
+
+            with st.expander("🔍 Indexes and query plans"):
+                source_indexes = describe_table(engine, source_table.name)[1]
+                if source_indexes:
+                    st.dataframe(pd.DataFrame([{"Index": index["name"], "Unique": index["unique"],
+                                                "Columns": ", ".join(map(str, index["columns"]))}
+                                               for index in source_indexes]))
+                else:
+                    st.caption(f"{source_table.name} has no indexes, so every filter reads the whole table.")
+                if unique_vals and st.toggle("EXPLAIN the current filter"):
+                    source_condition = source_table.c[selected_col] == selected_val
+                    for label, query in [("Count", count_query(source_table, source_condition)),
+                                         ("Page", page_query(source_table, source_condition, None, page_size, 0))]:
+                        plan = explain(engine, query)
+                        scan = full_scan(plan)
+                        st.caption(f"{label}: " + ("⚠️ full scan" if scan else "✅ index lookup" if scan is False
+                                                   else "plan not recognised"))
+                        st.dataframe(plan)
+                advice = index_advice(engine, source_table, source_indexes)
+                if advice:
+                    st.write("💡 Suggested indexes for the most filtered unindexed columns:")
+                    st.dataframe(pd.DataFrame(advice))
+                    if username in ADMIN_USERS:
+                        suggestion = st.selectbox("Index to create", advice, format_func=lambda item: item["Statement"])
+                        st.button("Create index", on_click=start_index, args=(source_table.name, suggestion))
+                else:
+                    st.caption("No unindexed column has been filtered on yet.")
+                request = st.session_state.get("index_request")
+                if request and request["table"] == source_table.name and username in ADMIN_USERS:
+                    schema = schema_cache()
+                    created = query_result("index", (source_table.name, request["run"]),
+                                           lambda job: create_index(engine, schema, source_table.name,
+                                                                    request["Statement"], job),
+                                           f"Creating {request['Index']}", INDEX_TIMEOUT_SECONDS, background_workers,
+                                           one_shot=True)
+                    if created is not None:
+                        st.success(f"✅ {created}")
     except Exception as e:
         st.error(f"Error: {e}")
 
@@ -71,12 +948,55 @@ if logged_in:
 
         if submitted:
             try:
-                with engine.begin() as conn:
-                    query = text(f"INSERT INTO {table_name} (name, age, city) VALUES (:name, :age, :city)")
-                    conn.execute(query, {"name": name, "age": age, "city": city})
+                table = reflect_table(engine, table_name)
+                if table is None:
+                    st.error(f"❌ No table named '{table_name}'.")
+                else:
+                    with checkout(engine, begin=True) as conn:
+                        conn.execute(table.insert(), {"name": name, "age": age, "city": city})
+                    bump_table_version(engine, table.name)
                     st.success("✅ Row inserted successfully!")
             except Exception as e:
                 st.error(f"❌ Error inserting data: {e}")
 
+    # ----------------------------
+    # Bulk Import
+    # ----------------------------
+    st.subheader("📥 Bulk Import")
+    upload = st.file_uploader("Upload a CSV or Parquet file", type=["csv", "parquet"])
+    if upload is not None:
+        try:
+            table = reflect_table(engine, table_name)
+            if table is None:
+                st.error(f"❌ No table named '{table_name}'.")
+            else:
+                file_columns = upload_columns(upload)
+                by_name = {column.lower(): column for column in file_columns}
+                st.caption("Map the file's columns to the table's columns:")
+                mapping = {}
+                grid = st.columns(3)
+                for position, column in enumerate(table.columns):
+                    options = [SKIP_COLUMN] + file_columns
+                    default = options.index(by_name[column.name.lower()]) if column.name.lower() in by_name else 0
+                    source = grid[position % 3].selectbox(column.name, options, index=default, key=f"map_{column.name}")
+                    if source != SKIP_COLUMN:
+                        mapping[source] = column.name
+                col1, col2 = st.columns(2)
+                batch_rows = col1.number_input("Rows per batch", min_value=100, max_value=100_000, value=5_000, step=100)
+                batches_per_commit = col2.number_input("Batches per commit", min_value=1, max_value=100, value=10)
+                if st.button("Import", disabled=not mapping):
+                    report, inserted, seconds = bulk_import(engine, table, upload, mapping, int(batch_rows),
+                                                            int(batches_per_commit))
+                    failed = report[report["Status"] == "❌"] if not report.empty else report
+                    message = (f"{inserted:,} rows imported in {seconds:.1f} s "
+                               f"({inserted / max(seconds, 1e-9):,.0f} rows/s), {len(failed)} failed batches")
+                    (st.warning if len(failed) else st.success)(("⚠️ " if len(failed) else "✅ ") + message)
+                    st.dataframe(report, hide_index=True)
+        except Exception as e:
+            st.error(f"❌ Error importing data: {e}")
+
 else:
     st.warning("🔒 Please login to access the dashboard.")
+
+show_pool_metrics(engine)
+show_query_cache()
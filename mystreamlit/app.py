@@ -1,25 +1,858 @@
+import io
+import os
+import json
+import decimal
+import datetime
+import hashlib
+import tempfile
+import threading
+from itertools import chain
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
-from sqlalchemy import create_engine, text
+from sqlalchemy import (JSON, Column, Float, Index, Integer, LargeBinary, MetaData, String, Table, Text, create_engine,
+                        event, exc, func, inspect, select, tuple_)
 import cv2
 import numpy as np
 from PIL import Image
 import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Set page configuration (only once!)
 # Set page configuration (only once!)
 st.set_page_config(page_title="Streamlit Multi-Problem App", layout="wide")
 
-# # Load CSV once for reuse
-# csv_path = r"D:\sir_paulin\cleaned_synthetic.csv"
-# try:
-#     df_csv = pd.read_csv(csv_path)
-# except FileNotFoundError:
-#     df_csv = None
-#     st.error(f"❌ CSV file not found at: {csv_path}")
+# ----------------------------
+# Columnar cache for the CSV
+# ----------------------------
+# The CSV is parsed once into an Arrow IPC file keyed by path + mtime + size.
+# Later reruns (and other app processes) memory-map that file instead of re-parsing text.
+# When the CSV only grew, just the new tail is parsed and written as its own segment; a version
+# is the list of segments in its sidecar, so an append never rewrites the rows before it. Every
+# MAX_CACHE_SEGMENTS appends the segments are compacted into one file (one full rewrite).
+CACHE_DIR = os.environ.get("CSV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "streamlit_csv_cache"))
+SAMPLE_ROWS = 10_000
+CHUNK_ROWS = 250_000
+FINGERPRINT_BLOCK_BYTES = 1024 * 1024
+MAX_CACHE_SEGMENTS = int(os.environ.get("CSV_MAX_CACHE_SEGMENTS", 16))
+# Files above this size open in out-of-core mode by default
+OUT_OF_CORE_BYTES = int(os.environ.get("CSV_OUT_OF_CORE_BYTES", 2 * 1024 ** 3))
+
+
+def columnar_cache_path(path):
+    stat = os.stat(path)
+    path_key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    version_key = hashlib.sha1(f"{stat.st_mtime_ns}|{stat.st_size}".encode("utf-8")).hexdigest()[:8]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{path_key}-{version_key}.arrow")
+
+
+def cache_prefix(cache_path):
+    # Shared by every version of the same CSV
+    return os.path.basename(cache_path).rsplit("-", 1)[0] + "-"
+
+
+def temporary_path(path):
+    # Unique per process and thread, so concurrent writers never share a partial file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+@st.cache_resource
+def ingest_locks():
+    # CSV path -> lock, so one session ingests a new version while the others wait for it
+    return {}
+
+
+def ingest_lock(path):
+    return ingest_locks().setdefault(os.path.abspath(path), threading.Lock())
+
+
+def read_cache_meta(cache_path):
+    with open(f"{cache_path}.json", encoding="utf-8") as sidecar:
+        return json.load(sidecar)
+
+
+def infer_csv_schema(path):
+    sample = pd.read_csv(path, nrows=SAMPLE_ROWS)
+    fields = []
+    for name, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            fields.append(pa.field(name, pa.bool_()))
+        elif pd.api.types.is_integer_dtype(dtype):
+            fields.append(pa.field(name, pa.int64()))
+        elif pd.api.types.is_float_dtype(dtype):
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def csv_dtypes(schema):
+    # Nullable pandas dtypes, so a missing value in a later chunk does not break the sampled types
+    pandas_dtypes = {pa.bool_(): "boolean", pa.int64(): "Int64", pa.float64(): "float64", pa.string(): str}
+    return {field.name: pandas_dtypes[field.type] for field in schema}
+
+
+def stream_csv_to_ipc(path, out_path, schema, progress=None):
+    # Returns the number of CSV bytes consumed
+    total_bytes = max(os.path.getsize(path), 1)
+    with open(path, "rb") as source, pa.OSFile(out_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for chunk in pd.read_csv(source, dtype=csv_dtypes(schema), chunksize=CHUNK_ROWS):
+            # A Table, since string columns of a chunk can be chunked arrays a RecordBatch cannot hold
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            if progress is not None:
+                progress(min(source.tell() / total_bytes, 1.0))
+        return source.tell()
+
+
+def source_fingerprint(path, size):
+    # Digest of every byte before `size`, so an in-place edit anywhere forces a full reload;
+    # hashing is bound by disk reads and far cheaper than parsing the same bytes again
+    digest = hashlib.sha1()
+    with open(path, "rb") as source:
+        remaining = size
+        while remaining > 0:
+            block = source.read(min(remaining, FINGERPRINT_BLOCK_BYTES))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def cache_segments(cache_path, meta=None):
+    # Segment files of a version, oldest first; a version written in one go is its own only segment
+    meta = read_cache_meta(cache_path) if meta is None else meta
+    return [os.path.join(CACHE_DIR, segment) for segment in meta.get("segments", [os.path.basename(cache_path)])]
+
+
+def publish_columnar_cache(path, tmp_path, cache_path, source_size, parent=None, parent_rows=0, segments=None):
+    # The sidecar records how much of the CSV the file covers, which version it extends and the
+    # segments it is made of
+    meta = {"source_size": source_size, "fingerprint": source_fingerprint(path, source_size),
+            "segments": [os.path.basename(segment) for segment in segments or [cache_path]]}
+    if parent is not None:
+        meta.update(parent=os.path.basename(parent), parent_rows=parent_rows)
+    with open(f"{cache_path}.json", "w", encoding="utf-8") as sidecar:
+        json.dump(meta, sidecar)
+    # Rename into place, so other processes never see a partial file
+    os.replace(tmp_path, cache_path)
+
+    # Drop cache files left over from older versions of the same CSV, except this version's segments
+    # and their sidecars; a column profile belongs to one version and goes with it
+    kept = cache_segments(cache_path, meta)
+    keep = {*kept, *(f"{segment}.json" for segment in kept), f"{cache_path}.profile.json"}
+    for entry in os.listdir(CACHE_DIR):
+        stale = os.path.join(CACHE_DIR, entry)
+        if entry.startswith(cache_prefix(cache_path)) and entry.endswith((".arrow", ".json")) and stale not in keep:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass  # still mapped by another process (Windows)
+
+
+def write_columnar_cache(path, cache_path, progress=None):
+    tmp_path = temporary_path(cache_path)
+    schema = infer_csv_schema(path)
+    try:
+        consumed = stream_csv_to_ipc(path, tmp_path, schema, progress)
+    except (ValueError, OverflowError):
+        # A later chunk did not parse as the sampled types: keep every column as text
+        schema = pa.schema([pa.field(field.name, pa.string()) for field in schema])
+        consumed = stream_csv_to_ipc(path, tmp_path, schema, progress)
+    publish_columnar_cache(path, tmp_path, cache_path, consumed)
+
+
+def previous_columnar_cache(cache_path):
+    candidates = [os.path.join(CACHE_DIR, entry) for entry in os.listdir(CACHE_DIR)
+                  if entry.startswith(cache_prefix(cache_path)) and entry.endswith(".arrow")]
+    candidates = [c for c in candidates if c != cache_path and os.path.exists(f"{c}.json")]
+    return max(candidates, key=os.path.getmtime, default=None)
+
+
+def append_columnar_cache(path, previous_path, cache_path):
+    # Parses only the bytes appended since `previous_path` was written and stores them as a new
+    # segment. Returns False when earlier bytes changed (or the new rows do not fit the schema),
+    # so the caller re-ingests everything.
+    meta = read_cache_meta(previous_path)
+    old_size, size = meta["source_size"], os.path.getsize(path)
+    if not 0 < old_size < size or source_fingerprint(path, old_size) != meta["fingerprint"]:
+        return False
+    with open(path, "rb") as source:
+        source.seek(old_size - 1)
+        tail = source.read(size - old_size + 1)
+    if not tail.startswith(b"\n"):
+        return False  # the previous version ended in the middle of a line
+    tail = tail[1:tail.rfind(b"\n") + 1]  # a half-written last line waits for the next reload
+
+    previous = read_columnar_table(previous_path)
+    segments = cache_segments(previous_path, meta) + [cache_path]
+    batches = []
+    if len(segments) > MAX_CACHE_SEGMENTS:
+        segments, batches = [cache_path], previous.to_batches()  # compact: one file holds every row again
+    if tail:
+        try:
+            rows = pd.read_csv(io.BytesIO(tail), header=None, names=previous.schema.names,
+                               dtype=csv_dtypes(previous.schema))
+            batches.extend(pa.Table.from_pandas(rows, schema=previous.schema, preserve_index=False).to_batches())
+        except (ValueError, OverflowError):
+            return False
+    tmp_path = temporary_path(cache_path)
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, previous.schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    publish_columnar_cache(path, tmp_path, cache_path, old_size + len(tail), previous_path, previous.num_rows,
+                           segments)
+    return True
+
+
+def ensure_columnar_cache(path):
+    cache_path = columnar_cache_path(path)
+    # Sessions that arrive during an ingest wait here and then find the published file
+    with ingest_lock(path):
+        if not os.path.exists(cache_path):
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            previous_path = previous_columnar_cache(cache_path)
+            with st.spinner("Reading rows appended to the CSV..."):
+                appended = previous_path is not None and append_columnar_cache(path, previous_path, cache_path)
+            if not appended:
+                bar = st.progress(0.0, text="Ingesting CSV into the columnar cache (first run only)...")
+                write_columnar_cache(path, cache_path,
+                                     lambda done: bar.progress(done, text=f"Ingesting CSV... {done:.0%}"))
+                bar.empty()
+    return cache_path
+
+
+def read_columnar_table(cache_path):
+    # Zero-copy: the Arrow buffers point straight into the memory-mapped segment files
+    tables = [pa.ipc.open_file(pa.memory_map(segment, "r")).read_all() for segment in cache_segments(cache_path)]
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+
+@st.cache_resource(show_spinner=False)
+def open_columnar_table(cache_path):
+    return read_columnar_table(cache_path)
+
+
+# ----------------------------
+# Dtype compaction
+# ----------------------------
+# Integers are downcast to the smallest type that holds them, floats to float32 only when
+# every value survives the round trip, and low-cardinality text columns become categoricals.
+CATEGORY_MAX_RATIO = 0.5
+
+
+def downcast_float(values):
+    # float32 rounds most decimals (11.32 -> 11.319999694824219), which would show up in labels
+    # and filter bounds, so keep float64 unless the round trip is exact
+    compact = pd.to_numeric(values, downcast="float")
+    if np.array_equal(compact.to_numpy(dtype="float64"), values.to_numpy(dtype="float64"), equal_nan=True):
+        return compact
+    return values
+
+
+def compact_dtypes(df):
+    columns, report = {}, []
+    for column in df.columns:
+        values = compact = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(values):
+            pass
+        elif pd.api.types.is_integer_dtype(values):
+            compact = pd.to_numeric(values, downcast="integer")
+        elif pd.api.types.is_float_dtype(values):
+            compact = downcast_float(values)
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            if values.nunique() <= CATEGORY_MAX_RATIO * len(values):
+                compact = values.astype("category")
+        columns[column] = compact
+        report.append({
+            "Column": column,
+            "Before": str(values.dtype),
+            "After": str(compact.dtype),
+            "Before (MB)": values.memory_usage(index=False, deep=True) / 1024 ** 2,
+            "After (MB)": compact.memory_usage(index=False, deep=True) / 1024 ** 2,
+        })
+    return pd.DataFrame(columns), pd.DataFrame(report)
+
+
+def show_memory_report(report):
+    before, after = report["Before (MB)"].sum(), report["After (MB)"].sum()
+    with st.sidebar.expander(f"🧠 Memory: {before:,.1f} MB → {after:,.1f} MB"):
+        st.dataframe(report, hide_index=True, column_config={
+            "Before (MB)": st.column_config.NumberColumn(format="%.2f"),
+            "After (MB)": st.column_config.NumberColumn(format="%.2f"),
+        })
+
+
+def append_frame(df, report, tail):
+    # Cast the appended rows to the compacted dtypes, widening a column where a new value needs it
+    columns = {}
+    for column in df.columns:
+        old, new = df[column], tail[column]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            categories = old.cat.categories.union(pd.Index(new.dropna().unique()))
+            if len(categories) > len(old.cat.categories):
+                old = old.cat.set_categories(categories)
+            new = new.astype(old.dtype)
+        elif pd.api.types.is_integer_dtype(old) and pd.api.types.is_integer_dtype(new):
+            new = pd.to_numeric(new, downcast="integer")
+        elif pd.api.types.is_float_dtype(old) and pd.api.types.is_float_dtype(new):
+            new = downcast_float(new)
+        columns[column] = pd.concat([old, new], ignore_index=True)
+    df = pd.DataFrame(columns)
+
+    report = report.copy()
+    report["After"] = [str(df[column].dtype) for column in report["Column"]]
+    report["Before (MB)"] += tail.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2
+    report["After (MB)"] = df.memory_usage(index=False, deep=True).to_numpy() / 1024 ** 2
+    return df, report
+
+
+@st.cache_resource
+def loaded_frames():
+    # cache path -> (compacted DataFrame, memory report), shared read-only by every session
+    return {}
+
+
+# ----------------------------
+# Shared dataset leases
+# ----------------------------
+# Each session leases the version it reads on every rerun; a version nobody has touched
+# for DATASET_IDLE_SECONDS is evicted on the next load, whichever session triggers it.
+DATASET_IDLE_SECONDS = float(os.environ.get("DATASET_IDLE_SECONDS", 15 * 60))
+
+
+@st.cache_resource
+def dataset_leases():
+    # cache path -> {session id: last seen}
+    return {}
+
+
+@st.cache_resource
+def dataset_lock():
+    return threading.RLock()
+
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+
+def lease_dataset(cache_path):
+    now = time.time()
+    leases = dataset_leases()
+    leases.setdefault(cache_path, {})[current_session_id()] = now
+    for path, holders in list(leases.items()):
+        for session in [session for session, seen in holders.items() if now - seen > DATASET_IDLE_SECONDS]:
+            holders.pop(session)
+        if not holders:
+            leases.pop(path)
+    frames = loaded_frames()
+    for idle in [path for path in frames if path not in leases]:
+        frames.pop(idle)
+        drop_derived(idle)
+
+
+def dataset_sessions(cache_path):
+    return len(dataset_leases().get(cache_path, {}))
+
+
+def load_csv(path):
+    cache_path = ensure_columnar_cache(path)
+    with dataset_lock():
+        frames = loaded_frames()
+        if cache_path not in frames:
+            meta = read_cache_meta(cache_path)
+            parent_path = os.path.join(CACHE_DIR, meta["parent"]) if "parent" in meta else None
+            if parent_path in frames:
+                # Only rows were appended: extend the frame and its indexes instead of reloading
+                tail = read_columnar_table(cache_path).slice(meta["parent_rows"]).to_pandas()
+                frames[cache_path] = append_frame(*frames[parent_path], tail)
+                extend_derived(parent_path, cache_path, frames[cache_path][0], meta["parent_rows"])
+            else:
+                with st.spinner("Loading dataset..."):
+                    frames[cache_path] = compact_dtypes(read_columnar_table(cache_path).to_pandas(split_blocks=True))
+            for stale in [key for key in frames if key != cache_path and cache_prefix(key) == cache_prefix(cache_path)]:
+                frames.pop(stale)
+                dataset_leases().pop(stale, None)
+                drop_derived(stale)
+        lease_dataset(cache_path)
+        df, memory_report = frames[cache_path]
+    # A shallow copy shares the column buffers; copy-on-write keeps the shared frame untouched
+    return df.copy(deep=False), cache_path, memory_report
+
+
+def load_csv_out_of_core(path):
+    cache_path = ensure_columnar_cache(path)
+    meta = read_cache_meta(cache_path)
+    if "parent" in meta:
+        open_columnar_table.clear(os.path.join(CACHE_DIR, meta["parent"]))
+    return open_columnar_table(cache_path), cache_path
+
+
+# ----------------------------
+# Out-of-core scans
+# ----------------------------
+# The record batches of the cache file are the spilled partitions: each scan walks them
+# one at a time, so resident memory stays bounded by the OS page cache, not the file size.
+MAX_DISTINCT_VALUES = 10_000
+MAX_SCAN_MATCHES = 100_000
+
+
+@st.cache_data(show_spinner="Scanning distinct values...")
+def scan_distinct_values(_table, dataset_key, column):
+    values = set()
+    for batch in _table.to_batches():
+        values.update(str(v) for v in pc.unique(batch.column(column)).to_pylist() if v is not None)
+        if len(values) > MAX_DISTINCT_VALUES:
+            return None  # too many to list, the value is typed in instead
+    return sorted(values)
+
+
+@st.cache_data(show_spinner="Scanning partitions...", max_entries=32)
+def scan_filter(_table, dataset_key, column, label, limit=MAX_SCAN_MATCHES):
+    # Returns the first `limit` matching row ids and the total number of matches
+    arrow_type = _table.schema.field(column).type
+    value = label
+    if pa.types.is_boolean(arrow_type):
+        value = label == "True"
+    elif pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+        try:
+            value = float(label)
+        except (TypeError, ValueError):
+            return np.empty(0, dtype=np.int64), 0
+
+    matches, total, offset = [], 0, 0
+    for batch in _table.to_batches():
+        mask = pc.fill_null(pc.equal(batch.column(column), value), False)
+        hits = np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+        total += len(hits)
+        kept = sum(len(m) for m in matches)
+        if kept < limit:
+            matches.append(hits[:limit - kept] + offset)
+        offset += batch.num_rows
+    rows = np.concatenate(matches) if matches else np.empty(0, dtype=np.int64)
+    return rows, total
+
+
+# ----------------------------
+# Inverted value index for the filter
+# ----------------------------
+# Built once per column and dataset version: value label -> row positions.
+# A filter becomes an O(matches) lookup instead of an astype(str) scan of the column.
+@st.cache_resource
+def derived_store():
+    # (dataset key, kind, column) -> index or aggregate derived from one dataset version
+    return {}
+
+
+# kind -> extend(previous value, new column, first appended row) carries a derived structure over
+# to an appended version of the dataset; kinds without an entry are rebuilt on demand
+DERIVED_EXTENDERS = {}
+
+
+def derived(dataset_key, kind, column, build):
+    # The store is shared by every session, so it is only touched under the dataset lock;
+    # the build itself runs outside it (a concurrent build of the same key keeps the first result)
+    store, key = derived_store(), (dataset_key, kind, column)
+    with dataset_lock():
+        if key in store:
+            return store[key]
+    value = build()
+    with dataset_lock():
+        return store.setdefault(key, value)
+
+
+def extend_derived(previous_key, dataset_key, df, offset):
+    store = derived_store()
+    with dataset_lock():
+        for previous, kind, column in [key for key in store if key[0] == previous_key]:
+            value = store.pop((previous, kind, column))
+            if kind in DERIVED_EXTENDERS:
+                store[(dataset_key, kind, column)] = DERIVED_EXTENDERS[kind](value, df[column], offset)
+
+
+def drop_derived(dataset_key):
+    store = derived_store()
+    with dataset_lock():
+        for key in [key for key in store if key[0] == dataset_key]:
+            store.pop(key, None)
+
+
+def build_value_index(values):
+    codes, uniques = pd.factorize(values)
+    # Distinct raw values can share a label (e.g. 1 and "1"), so factorize the labels too
+    labels = pd.Index(uniques).astype(str)
+    label_codes, labels = pd.factorize(labels)
+    codes = np.append(label_codes, -1)[codes]
+
+    order = np.argsort(codes, kind="stable")[np.count_nonzero(codes < 0):]
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+    rows = dict(zip(labels, np.split(order, np.cumsum(counts)[:-1])))
+    return {
+        "values": sorted(rows),
+        "rows": rows,
+        # Per-row label codes, so a filter on an already narrowed row set is O(rows) too
+        "codes": codes.astype(np.int32),
+        "code_of": {label: code for code, label in enumerate(labels)},
+    }
+
+
+def extend_value_index(value_index, values, offset):
+    tail = build_value_index(values.iloc[offset:])
+    rows, code_of = dict(value_index["rows"]), dict(value_index["code_of"])
+    for label, positions in tail["rows"].items():
+        rows[label] = np.concatenate([rows[label], positions + offset]) if label in rows else positions + offset
+        code_of.setdefault(label, len(code_of))
+    tail_codes = np.array([code_of[label] for label in tail["code_of"]] + [-1], dtype=np.int32)[tail["codes"]]
+    return {
+        "values": sorted(rows),
+        "rows": rows,
+        "codes": np.concatenate([value_index["codes"], tail_codes]),
+        "code_of": code_of,
+    }
+
+
+DERIVED_EXTENDERS["value_index"] = extend_value_index
+
+
+def column_value_index(df, dataset_key, column):
+    return derived(dataset_key, "value_index", column, lambda: build_value_index(df[column]))
+
+
+def lookup_rows(value_index, value):
+    return value_index["rows"].get(value, np.empty(0, dtype=np.intp))
+
+
+# ----------------------------
+# Search anywhere
+# ----------------------------
+# Each text column gets a trigram index over its distinct values. A query intersects the
+# posting lists of its trigrams, checks the few candidate values, and maps them to rows
+# through the value index, so no row is scanned.
+def text_columns(df):
+    return [column for column in df.columns
+            if isinstance(df[column].dtype, pd.CategoricalDtype)
+            or pd.api.types.is_object_dtype(df[column]) or pd.api.types.is_string_dtype(df[column])]
+
+
+def build_trigram_index(labels, first_id=0):
+    postings = {}
+    for label_id, label in enumerate(labels, start=first_id):
+        text = label.lower()
+        for trigram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            postings.setdefault(trigram, []).append(label_id)
+    return {
+        "labels": list(labels),
+        "lower": [label.lower() for label in labels],
+        "postings": {trigram: np.array(ids, dtype=np.int32) for trigram, ids in postings.items()},
+    }
+
+
+def extend_trigram_index(trigram_index, values, offset):
+    known = set(trigram_index["labels"])
+    new_labels = [label for label in values.iloc[offset:].dropna().astype(str).unique() if label not in known]
+    tail = build_trigram_index(new_labels, first_id=len(trigram_index["labels"]))
+    postings = dict(trigram_index["postings"])
+    for trigram, ids in tail["postings"].items():
+        postings[trigram] = np.concatenate([postings[trigram], ids]) if trigram in postings else ids
+    return {
+        "labels": trigram_index["labels"] + tail["labels"],
+        "lower": trigram_index["lower"] + tail["lower"],
+        "postings": postings,
+    }
+
+
+DERIVED_EXTENDERS["trigram"] = extend_trigram_index
+
+
+def matching_labels(trigram_index, query):
+    if len(query) < 3:
+        candidates = range(len(trigram_index["labels"]))  # too short for trigrams, check every value
+    else:
+        postings = [trigram_index["postings"].get(query[i:i + 3]) for i in range(len(query) - 2)]
+        if any(ids is None for ids in postings):
+            return []
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+    lower = trigram_index["lower"]
+    return [trigram_index["labels"][i] for i in candidates if query in lower[i]]
+
+
+def search_rows(df, dataset_key, query):
+    query = query.strip().lower()
+    hits = []
+    for column in text_columns(df):
+        value_index = column_value_index(df, dataset_key, column)
+        trigram_index = derived(dataset_key, "trigram", column, lambda: build_trigram_index(value_index["values"]))
+        hits.extend(lookup_rows(value_index, label) for label in matching_labels(trigram_index, query))
+    return np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.intp)
+
+
+# ----------------------------
+# Paginated tables
+# ----------------------------
+# Only the visible page is serialized to the browser. Sorting happens on the server.
+PAGE_SIZES = [25, 50, 100, 500]
+ORIGINAL_ORDER = "(original order)"
+
+
+@st.cache_resource(show_spinner="Sorting...", max_entries=8)
+def sort_ranks(_df, dataset_key, column, ascending):
+    # Full-column sort permutation plus each row's rank in it, shared by every page and filter
+    values = _df[column].reset_index(drop=True)
+    try:
+        perm = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+    except TypeError:
+        perm = values.astype(str).sort_values(ascending=ascending, kind="stable").index.to_numpy()
+    ranks = np.empty(len(perm), dtype=np.int64)
+    ranks[perm] = np.arange(len(perm))
+    return perm, ranks
+
+
+def paginated_table(data, dataset_key, rows=None, key="table"):
+    # `data` is a DataFrame or, in out-of-core mode, the memory-mapped Arrow table.
+    # `rows` optionally restricts the view to those row positions (a filter result).
+    in_memory = isinstance(data, pd.DataFrame)
+    total = (len(data) if in_memory else data.num_rows) if rows is None else len(rows)
+    sortable = in_memory or rows is not None
+
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
+    columns = list(data.columns) if in_memory else data.column_names
+    sort_col = col1.selectbox("Sort by", [ORIGINAL_ORDER] + columns if sortable else [ORIGINAL_ORDER],
+                              key=f"{key}_sort")
+    descending = col2.checkbox("Descending", key=f"{key}_desc", disabled=sort_col == ORIGINAL_ORDER)
+    page_size = col3.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, -(-total // page_size))
+    page = col4.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    start, stop = (page - 1) * page_size, min(page * page_size, total)
+
+    if sort_col == ORIGINAL_ORDER:
+        window = np.arange(start, stop) if rows is None else rows[start:stop]
+    elif in_memory:
+        perm, ranks = sort_ranks(data, dataset_key, sort_col, not descending)
+        window = perm[start:stop] if rows is None else rows[np.argsort(ranks[rows], kind="stable")][start:stop]
+    else:
+        order = pc.array_sort_indices(data.column(sort_col).take(rows),
+                                      order="descending" if descending else "ascending")
+        window = rows[order.to_numpy()][start:stop]
+
+    st.dataframe(data.iloc[window] if in_memory else data.take(window).to_pandas())
+    st.caption(f"Rows {min(start + 1, total):,}–{stop:,} of {total:,}")
+
+
+# ----------------------------
+# Compound filters
+# ----------------------------
+# A predicate is (column, "==", label) or (column, "between", (low, high)).
+# AND evaluates the most selective predicate first and narrows the row set from there.
+# Every intermediate result is memoized per session, so adding one more condition only
+# evaluates that condition on top of the previous result.
+MAX_FILTER_MEMO = 32
+
+
+HISTOGRAM_BINS = 64
+
+
+def build_histogram(values):
+    values = pd.to_numeric(values, errors="coerce").dropna().to_numpy(dtype=float)
+    if len(values) == 0:
+        return np.zeros(HISTOGRAM_BINS), np.linspace(0.0, 1.0, HISTOGRAM_BINS + 1)
+    return np.histogram(values, bins=HISTOGRAM_BINS)
+
+
+def extend_histogram(histogram, values, offset):
+    counts, edges = histogram
+    tail = pd.to_numeric(values.iloc[offset:], errors="coerce").dropna().to_numpy(dtype=float)
+    if len(tail) and (tail.min() < edges[0] or tail.max() > edges[-1] or not counts.any()):
+        return build_histogram(values)  # the new rows fall outside the old bins
+    return counts + np.histogram(tail, bins=edges)[0], edges
+
+
+DERIVED_EXTENDERS["histogram"] = extend_histogram
+
+
+def column_histogram(df, dataset_key, column):
+    return derived(dataset_key, "histogram", column, lambda: build_histogram(df[column]))
+
+
+def estimate_selectivity(df, dataset_key, predicate):
+    column, op, value = predicate
+    if op == "==":
+        return len(lookup_rows(column_value_index(df, dataset_key, column), value)) / max(len(df), 1)
+    # Fraction of the histogram mass inside [low, high], assuming values spread evenly within a bin
+    counts, edges = column_histogram(df, dataset_key, column)
+    low, high = value
+    overlap = np.clip(np.minimum(edges[1:], high) - np.maximum(edges[:-1], low), 0, None) / np.diff(edges)
+    return float((counts * np.minimum(overlap, 1)).sum()) / max(len(df), 1)
+
+
+def predicate_rows(df, dataset_key, predicate, rows=None):
+    column, op, value = predicate
+    if op == "==":
+        value_index = column_value_index(df, dataset_key, column)
+        if rows is None:
+            return lookup_rows(value_index, value)
+        return rows[value_index["codes"][rows] == value_index["code_of"].get(value, -2)]
+    low, high = value
+    values = df[column] if rows is None else df[column].iloc[rows]
+    mask = values.between(low, high).to_numpy(dtype=bool, na_value=False)
+    return np.flatnonzero(mask) if rows is None else rows[mask]
+
+
+def evaluate_filters(df, dataset_key, predicates, combine="AND"):
+    memo = st.session_state.setdefault("filter_memo", {})
+    wanted = frozenset(predicates)
+    if (dataset_key, combine, wanted) in memo:
+        return memo[(dataset_key, combine, wanted)]
+
+    # Resume from the largest earlier result computed over a subset of these predicates
+    rows, done = None, frozenset()
+    for (memo_key, memo_combine, memo_predicates), memo_rows in memo.items():
+        if ((memo_key, memo_combine) == (dataset_key, combine) and memo_predicates < wanted
+                and len(memo_predicates) > len(done)):
+            rows, done = memo_rows, memo_predicates
+
+    pending = sorted(wanted - done, key=lambda predicate: estimate_selectivity(df, dataset_key, predicate))
+    for predicate in pending:
+        if combine == "AND":
+            rows = predicate_rows(df, dataset_key, predicate, rows)
+        else:
+            hits = predicate_rows(df, dataset_key, predicate)
+            rows = hits if rows is None else np.union1d(rows, hits)
+        done = done | {predicate}
+        memo[(dataset_key, combine, done)] = rows
+
+    while len(memo) > MAX_FILTER_MEMO:
+        memo.pop(next(iter(memo)))
+    return rows
+
+
+def describe_predicate(predicate):
+    column, op, value = predicate
+    return f"{column} = {value}" if op == "==" else f"{value[0]} ≤ {column} ≤ {value[1]}"
+
+
+def condition_widget(df, dataset_key, number):
+    # Numeric columns filter on a range, everything else on a single value
+    column = st.sidebar.selectbox(f"Condition {number} column:", df.columns, key=f"condition_{number}_column")
+    values = df[column]
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) and values.notna().any():
+        low, high = values.min(), values.max()
+        if low < high:
+            if pd.api.types.is_integer_dtype(values):
+                low, high = int(low), int(high)
+            else:
+                low, high = float(low), float(high)
+            selected = st.sidebar.slider(f"Condition {number} range:", low, high, (low, high),
+                                         key=f"condition_{number}_range")
+            return (column, "between", tuple(selected))
+    value_index = column_value_index(df, dataset_key, column)
+    if not value_index["values"]:
+        return None
+    selected = st.sidebar.selectbox(f"Condition {number} value:", value_index["values"], key=f"condition_{number}_value")
+    return (column, "==", selected)
+
+
+# ----------------------------
+# Column profiles
+# ----------------------------
+# Counts, null rates, top values and histograms for every column, computed in one pass per
+# column (columns in parallel) and saved next to the columnar cache, so every process reuses it.
+PROFILE_TOP_K = 10
+PROFILE_BINS = 20
+
+
+def profile_column(values):
+    counts = values.value_counts()
+    profile = {
+        "dtype": str(values.dtype),
+        "count": int(counts.sum()),
+        "nulls": int(len(values) - counts.sum()),
+        "null_rate": float(1 - counts.sum() / len(values)) if len(values) else 0.0,
+        "unique": len(counts),
+        "top": [[str(label), int(n)] for label, n in zip(counts.index[:PROFILE_TOP_K], counts.iloc[:PROFILE_TOP_K])],
+    }
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) and profile["count"]:
+        numbers = values.dropna().to_numpy(dtype=float)
+        hist_counts, edges = np.histogram(numbers, bins=PROFILE_BINS)
+        profile.update(min=float(numbers.min()), max=float(numbers.max()), mean=float(numbers.mean()),
+                       histogram={"counts": hist_counts.tolist(), "edges": edges.tolist()})
+    return profile
+
+
+def build_profile(df, dataset_key):
+    profile_path = f"{dataset_key}.profile.json"
+    if os.path.exists(profile_path):
+        with open(profile_path, encoding="utf-8") as saved:
+            return json.load(saved)
+    with ThreadPoolExecutor() as pool:
+        profile = dict(zip(df.columns, pool.map(lambda column: profile_column(df[column]), df.columns)))
+    tmp_path = temporary_path(profile_path)
+    with open(tmp_path, "w", encoding="utf-8") as saved:
+        json.dump(profile, saved)
+    os.replace(tmp_path, profile_path)
+    return profile
+
+
+def dataset_profile(df, dataset_key):
+    return derived(dataset_key, "profile", None, lambda: build_profile(df, dataset_key))
+
+
+def show_column_profile(column, profile):
+    with st.expander(f"📈 Profile of {column}", expanded=True):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Values", f"{profile['count']:,}")
+        col2.metric("Null rate", f"{profile['null_rate']:.1%}")
+        col3.metric("Unique", f"{profile['unique']:,}")
+        col4.metric("Type", profile["dtype"])
+        left, right = st.columns(2)
+        with left:
+            st.caption(f"Top {len(profile['top'])} values")
+            st.bar_chart(pd.DataFrame(profile["top"], columns=["Value", "Count"]).set_index("Value"))
+        if "histogram" in profile:
+            with right:
+                edges = profile["histogram"]["edges"]
+                st.caption(f"Histogram (min {profile['min']:.4g}, mean {profile['mean']:.4g}, max {profile['max']:.4g})")
+                st.bar_chart(pd.DataFrame({
+                    "Bin": [f"{low:.4g} – {high:.4g}" for low, high in zip(edges[:-1], edges[1:])],
+                    "Count": profile["histogram"]["counts"],
+                }).set_index("Bin"), x_label="", y_label="Count")
+
+
+# Load CSV once for reuse
+csv_path = r"D:\sir_paulin\cleaned_synthetic.csv"
+df_csv, table_csv, dataset_key = None, None, None
+try:
+    out_of_core = st.sidebar.checkbox("🧱 Out-of-core mode", value=os.path.getsize(csv_path) > OUT_OF_CORE_BYTES,
+                                      help="Scan the file partition by partition instead of loading it into memory")
+    if out_of_core:
+        table_csv, dataset_key = load_csv_out_of_core(csv_path)
+    else:
+        df_csv, dataset_key, memory_report = load_csv(csv_path)
+        show_memory_report(memory_report)
+        st.sidebar.caption(f"👥 Shared in memory with {dataset_sessions(dataset_key)} active session(s)")
+except FileNotFoundError:
+    st.error(f"❌ CSV file not found at: {csv_path}")
 
 # ----------- Problem 1: User Input -------------
 st.title("👋 Welcome to My Streamlit App")
@@ -48,15 +881,44 @@ if df_csv is not None:
     else:
         if st.checkbox("Show raw data"):
             st.subheader("📊 Raw Data:")
-            st.dataframe(df_csv)
+            paginated_table(df_csv, dataset_key, key="p2_raw")
 
         column_to_filter = st.selectbox("Select a column to filter by:", df_csv.columns)
-        unique_values = df_csv[column_to_filter].dropna().unique()
-        selected_value = st.selectbox(f"Select a value from '{column_to_filter}':", sorted(unique_values.astype(str)))
+        value_index = column_value_index(df_csv, dataset_key, column_to_filter)
+        selected_value = st.selectbox(f"Select a value from '{column_to_filter}':", value_index["values"])
 
-        filtered_df = df_csv[df_csv[column_to_filter].astype(str) == selected_value]
         st.subheader("🔍 Filtered Data:")
-        st.dataframe(filtered_df)
+        paginated_table(df_csv, dataset_key, rows=lookup_rows(value_index, selected_value), key="p2_filtered")
+
+        search_query = st.text_input("🔎 Search anywhere:", placeholder="Text to find in any column",
+                                     key="p2_search_query")
+        if search_query.strip():
+            with st.spinner("Searching..."):
+                search_hits = search_rows(df_csv, dataset_key, search_query)
+            st.subheader(f"🔎 Rows containing '{search_query.strip()}':")
+            paginated_table(df_csv, dataset_key, rows=search_hits, key="p2_search")
+
+elif table_csv is not None:
+    if table_csv.num_columns < 5:
+        st.warning("⚠️ CSV file has less than 5 columns.")
+    else:
+        st.caption(f"🧱 Out-of-core mode: {table_csv.num_rows:,} rows in {len(table_csv.to_batches())} partitions")
+        if st.checkbox("Show raw data"):
+            st.subheader("📊 Raw Data:")
+            paginated_table(table_csv, dataset_key, key="p2_raw")
+
+        column_to_filter = st.selectbox("Select a column to filter by:", table_csv.column_names)
+        distinct_values = scan_distinct_values(table_csv, dataset_key, column_to_filter)
+        if distinct_values is None:
+            selected_value = st.text_input(f"Enter a value for '{column_to_filter}':")
+        else:
+            selected_value = st.selectbox(f"Select a value from '{column_to_filter}':", distinct_values)
+
+        rows, total = scan_filter(table_csv, dataset_key, column_to_filter, selected_value)
+        st.subheader("🔍 Filtered Data:")
+        paginated_table(table_csv, dataset_key, rows=rows, key="p2_filtered")
+        if total > len(rows):
+            st.caption(f"Only the first {len(rows):,} of {total:,} matching rows are kept for paging")
 
 # ----------- Problem 3: EDM & DW with Tabs -------------
 st.title("🏢 Data Warehousing & Enterprise Data Management")
@@ -95,32 +957,604 @@ with tab1:
 with tab2:
     st.subheader("📁 Sample Data Viewer")
     if df_csv is not None and df_csv.shape[1] >= 5:
+        search_query = st.text_input("🔎 Search anywhere:", placeholder="Text to find in any column",
+                                     key="p3_search_query")
+        if search_query.strip():
+            with st.spinner("Searching..."):
+                search_hits = search_rows(df_csv, dataset_key, search_query)
+            st.write(f"🔎 Rows containing **{search_query.strip()}**")
+            paginated_table(df_csv, dataset_key, rows=search_hits, key="p3_search")
+
         if show_raw:
             with st.expander("🔍 Raw Data Preview"):
-                st.dataframe(df_csv)
+                paginated_table(df_csv, dataset_key, key="p3_raw")
 
         filter_col = st.sidebar.selectbox("Filter by Column:", df_csv.columns)
-        if df_csv[filter_col].dropna().nunique() > 0:
-            unique_vals = df_csv[filter_col].dropna().unique()
-            selected_val = st.sidebar.selectbox("Select a Value:", sorted(unique_vals.astype(str)))
-            filtered_df = df_csv[df_csv[filter_col].astype(str) == selected_val]
-            st.write(f"🔎 Showing results for **{filter_col} = {selected_val}**")
-            st.dataframe(filtered_df)
+        column_profile = dataset_profile(df_csv, dataset_key)[filter_col]
+        show_column_profile(filter_col, column_profile)
+        if column_profile["unique"] > 0:
+            filter_index = column_value_index(df_csv, dataset_key, filter_col)
+            selected_val = st.sidebar.selectbox("Select a Value:", filter_index["values"])
+            predicates = [(filter_col, "==", selected_val)]
+            extra_conditions = st.sidebar.number_input("Additional conditions:", min_value=0, max_value=10, step=1)
+            combine = "AND"
+            if extra_conditions:
+                combine = st.sidebar.radio("Combine conditions with:", ["AND", "OR"], horizontal=True)
+            for number in range(2, extra_conditions + 2):
+                predicate = condition_widget(df_csv, dataset_key, number)
+                if predicate is not None and predicate not in predicates:
+                    predicates.append(predicate)
+
+            filter_rows = evaluate_filters(df_csv, dataset_key, predicates, combine)
+            description = f" {combine} ".join(describe_predicate(predicate) for predicate in predicates)
+            st.write(f"🔎 Showing results for **{description}**")
+            paginated_table(df_csv, dataset_key, rows=filter_rows, key="p3_filtered")
+        else:
+            st.info(f"No unique values found in {filter_col}")
+
+    elif table_csv is not None and table_csv.num_columns >= 5:
+        st.caption(f"🧱 Out-of-core mode: {table_csv.num_rows:,} rows in {len(table_csv.to_batches())} partitions")
+        if show_raw:
+            with st.expander("🔍 Raw Data Preview"):
+                paginated_table(table_csv, dataset_key, key="p3_raw")
+
+        filter_col = st.sidebar.selectbox("Filter by Column:", table_csv.column_names)
+        distinct_vals = scan_distinct_values(table_csv, dataset_key, filter_col)
+        if distinct_vals is None:
+            selected_val = st.sidebar.text_input("Enter a Value:")
+        elif distinct_vals:
+            selected_val = st.sidebar.selectbox("Select a Value:", distinct_vals)
         else:
+            selected_val = None
             st.info(f"No unique values found in {filter_col}")
+        if selected_val is not None:
+            rows, total = scan_filter(table_csv, dataset_key, filter_col, selected_val)
+            st.write(f"🔎 Showing results for **{filter_col} = {selected_val}**")
+            paginated_table(table_csv, dataset_key, rows=rows, key="p3_filtered")
+            if total > len(rows):
+                st.caption(f"Only the first {len(rows):,} of {total:,} matching rows are kept for paging")
 
 # ----------- Problem 4: PSGC Cities Dashboard -------------
 st.title("📍 PSGC Cities and Municipalities Dashboard")
 
 # Fetch data from PSGC API
-@st.cache_data
+# ----------------------------
+# PSGC HTTP cache
+# ----------------------------
+# Responses are kept on disk with their ETag/Last-Modified. A fresh snapshot is served as is,
+# a stale one is served immediately while a background thread revalidates it, and the last
+# good snapshot stays the fallback while the API cannot be reached.
+# Point PSGC_API_URL at psgc_stub_server.py to run without the network.
+PSGC_API_URL = os.environ.get("PSGC_API_URL", "https://psgc.cloud/api").rstrip("/")
+PSGC_CACHE_DIR = os.environ.get("PSGC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "psgc_cache"))
+PSGC_TTL_SECONDS = float(os.environ.get("PSGC_TTL_SECONDS", 24 * 60 * 60))
+PSGC_TIMEOUT_SECONDS = float(os.environ.get("PSGC_TIMEOUT_SECONDS", 10))
+PSGC_MAX_WORKERS = int(os.environ.get("PSGC_MAX_WORKERS", 8))
+PSGC_RETRIES = int(os.environ.get("PSGC_RETRIES", 3))
+
+
+def endpoint_name(endpoint):
+    # "regions/0100000000/provinces?page=2" -> "regions_0100000000_provinces", safe as a file name
+    return endpoint.split("?")[0].replace("/", "_")
+
+
+def snapshot_paths(endpoint):
+    name = f"{endpoint_name(endpoint)}-{hashlib.sha1(f'{PSGC_API_URL}/{endpoint}'.encode()).hexdigest()[:8]}"
+    return os.path.join(PSGC_CACHE_DIR, f"{name}.json"), os.path.join(PSGC_CACHE_DIR, f"{name}.meta.json")
+
+
+def replace_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_meta(endpoint):
+    body_path, meta_path = snapshot_paths(endpoint)
+    if not (os.path.exists(body_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as saved:
+        return json.load(saved)
+
+
+def page_records(payload):
+    # Endpoints answer either a plain list or a paginated {"data": [...], "meta": {"last_page": n}}
+    return payload["data"] if isinstance(payload, dict) else payload
+
+
+def page_count(payload):
+    return payload.get("meta", {}).get("last_page", 1) if isinstance(payload, dict) else 1
+
+
+@st.cache_resource
+def psgc_session():
+    # One keep-alive pool for every PSGC request; transient failures are retried with backoff
+    retry = Retry(total=PSGC_RETRIES, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=PSGC_MAX_WORKERS, pool_maxsize=PSGC_MAX_WORKERS, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request_snapshot(session, endpoint, meta=None):
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    response = session.get(f"{PSGC_API_URL}/{endpoint}", headers=headers, timeout=PSGC_TIMEOUT_SECONDS)
+    body_path, meta_path = snapshot_paths(endpoint)
+    os.makedirs(PSGC_CACHE_DIR, exist_ok=True)
+    if response.status_code == 304 and meta:
+        meta = dict(meta)  # unchanged: only the freshness moves forward
+    else:
+        response.raise_for_status()
+        payload = response.json()  # never replace the last good snapshot with a body that does not parse
+        replace_file(body_path, response.content)
+        meta = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"),
+                "pages": page_count(payload)}
+    meta["fetched_at"] = time.time()
+    replace_file(meta_path, json.dumps(meta).encode())
+    return meta
+
+
+@st.cache_resource
+def revalidation_state():
+    # endpoints with a revalidation in flight, and the error of the last failed attempt
+    return {"lock": threading.Lock(), "running": set(), "errors": {}}
+
+
+def revalidate_in_background(session, state, endpoint, meta):
+    with state["lock"]:
+        if endpoint in state["running"]:
+            return
+        state["running"].add(endpoint)
+
+    def revalidate():
+        try:
+            request_snapshot(session, endpoint, meta)
+            state["errors"].pop(endpoint, None)
+        except (requests.RequestException, ValueError) as error:
+            state["errors"][endpoint] = str(error)
+        finally:
+            with state["lock"]:
+                state["running"].discard(endpoint)
+
+    threading.Thread(target=revalidate, name=f"psgc-revalidate-{endpoint}", daemon=True).start()
+
+
+def ensure_snapshot(session, state, endpoint):
+    # Runs on the loader's worker threads, so the Streamlit resources are passed in
+    meta = read_snapshot_meta(endpoint)
+    if meta is None:
+        try:
+            return request_snapshot(session, endpoint)
+        except (requests.RequestException, ValueError) as error:
+            state["errors"][endpoint] = str(error)
+            return None
+    if time.time() - meta["fetched_at"] > PSGC_TTL_SECONDS:
+        revalidate_in_background(session, state, endpoint, meta)
+    return meta
+
+
+def format_age(seconds):
+    if seconds < 60 * 60:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 2 * 24 * 60 * 60:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.0f} days"
+
+
+def snapshot_status(state, metas):
+    # metas: endpoint -> snapshot meta (None when it could not be fetched at all)
+    missing = [endpoint for endpoint, meta in metas.items() if meta is None]
+    if missing:
+        return f"📴 PSGC API unreachable and no saved snapshot for {', '.join(missing)} ({state['errors'].get(missing[0])})"
+    age = time.time() - min(meta["fetched_at"] for meta in metas.values())
+    if any(endpoint in state["errors"] for endpoint in metas):
+        return f"📴 PSGC API unreachable, showing the snapshot from {format_age(age)} ago"
+    if age > PSGC_TTL_SECONDS:
+        return f"🔄 Showing the snapshot from {format_age(age)} ago while it is refreshed"
+    return f"🌐 PSGC data cached {format_age(age)} ago"
+
+
+# ----------------------------
+# PSGC hierarchy
+# ----------------------------
+# Every level (and every page of it) is fetched on a bounded pool, so a cold load takes about
+# as long as the slowest level. Places are linked to their ancestors by PSGC code prefix:
+# a 10-digit code reads region (2) + province (3) + city/municipality (2) + barangay (3).
+PSGC_LEVELS = {
+    "regions": ("region", 2),
+    "provinces": ("province", 5),
+    "cities-municipalities": ("city_municipality", 7),
+    "barangays": ("barangay", 10),
+}
+
+
+def page_endpoint(level, page):
+    return level if page == 1 else f"{level}?page={page}"
+
+
+def fetch_snapshots(session, state, levels):
+    # -> ({level: ((body path, mtime), ...) per page, or None}, {endpoint: meta}); no Streamlit calls
+    metas, pages = {}, {level: {} for level in levels}
+    with ThreadPoolExecutor(max_workers=PSGC_MAX_WORKERS) as pool:
+        pending = {pool.submit(ensure_snapshot, session, state, level): (level, 1) for level in levels}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                level, page = pending.pop(future)
+                endpoint = page_endpoint(level, page)
+                metas[endpoint] = meta = future.result()
+                if meta is None:
+                    continue
+                body_path = snapshot_paths(endpoint)[0]
+                pages[level][page] = (body_path, os.path.getmtime(body_path))
+                if page == 1:
+                    # Follow-up pages start as soon as the first one says how many there are
+                    for later in range(2, meta.get("pages", 1) + 1):
+                        pending[pool.submit(ensure_snapshot, session, state, page_endpoint(level, later))] = (level, later)
+    snapshots = {}
+    for level, found in pages.items():
+        complete = metas.get(level) is not None and len(found) == metas[level].get("pages", 1)
+        snapshots[level] = tuple(found[page] for page in sorted(found)) if complete else None
+    return snapshots, metas
+
+
+def fetch_psgc_levels(levels):
+    # -> ({level: ((body path, mtime), ...) per page, or None}, status line, seconds)
+    session, state = psgc_session(), revalidation_state()
+    started = time.perf_counter()
+    snapshots, metas = fetch_snapshots(session, state, levels)
+    return snapshots, snapshot_status(state, metas), time.perf_counter() - started
+
+
+# ----------------------------
+# Compact PSGC decode
+# ----------------------------
+# Pages are parsed whole (orjson when it is installed, json otherwise) and built into an Arrow
+# table a column at a time: type, district and every region/province/city ID become
+# dictionary columns (categoricals in pandas), small integer codes over one copy of each label. The typed level is saved as Arrow per snapshot version, so warm starts
+# memory-map it and never parse JSON.
+CATEGORICAL_FIELDS = {"type", "district"}
+
+
+def read_records(body_path):
+    with open(body_path, "rb") as saved:
+        data = saved.read()
+    return page_records(orjson.loads(data) if orjson is not None else json.loads(data))
+
+
+def decode_level(pages):
+    # -> Arrow table; a field missing from some records (or a whole page) is null there
+    records = list(chain.from_iterable(read_records(body_path) for body_path, _ in pages))
+    keys = dict.fromkeys(chain.from_iterable(records))
+    table = pa.table({key: [record.get(key) for record in records] for key in keys})
+    for index, key in enumerate(table.column_names):
+        if key in CATEGORICAL_FIELDS or key.endswith(("_id", "_code")):
+            column = table[key] if not pa.types.is_null(table[key].type) else table[key].cast(pa.string())
+            table = table.set_column(index, key, column.dictionary_encode())
+    return table
+
+
+def load_compact_level(level, pages):
+    name = endpoint_name(level)
+    compact_path = os.path.join(PSGC_CACHE_DIR, f"{name}-{hashlib.sha1(repr(pages).encode()).hexdigest()[:12]}.arrow")
+    try:
+        return pa.ipc.open_file(pa.memory_map(compact_path)).read_all().to_pandas()
+    except FileNotFoundError:
+        pass  # not decoded yet, or just replaced by a newer version in another thread
+    table = decode_level(pages)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    # Sessions and the prefetch thread may decode the same level at once: each writes its own temp
+    # file and whichever rename lands last wins, with identical contents
+    replace_file(compact_path, sink.getvalue())
+    for stale in os.listdir(PSGC_CACHE_DIR):
+        if stale.startswith(f"{name}-") and stale.endswith(".arrow") and stale != os.path.basename(compact_path):
+            try:
+                os.remove(os.path.join(PSGC_CACHE_DIR, stale))
+            except FileNotFoundError:
+                pass  # already removed by a concurrent load
+    return table.to_pandas()
+
+
+@st.cache_data(show_spinner="Joining the PSGC hierarchy...")
+def build_psgc_hierarchy(snapshots):
+    levels = {level: load_compact_level(level, pages) if pages else pd.DataFrame() for level, pages in snapshots}
+    for level, frame in levels.items():
+        if "code" not in frame:
+            continue
+        codes = frame["code"].astype(str)
+        for parent, (label, digits) in PSGC_LEVELS.items():
+            if digits >= PSGC_LEVELS[level][1]:
+                break
+            frame[f"{label}_code"] = codes.str[:digits].str.ljust(10, "0").astype("category")
+            if "code" in levels.get(parent, ()):
+                names = levels[parent].set_index(levels[parent]["code"].astype(str))["name"]
+                frame[f"{label}_name"] = frame[f"{label}_code"].map(names)
+    return levels
+
+
 def fetch_psgc_data():
-    url = "https://psgc.cloud/api/cities-municipalities"
-    response = requests.get(url)
-    return response.json()
+    # -> (hierarchy, version key of the snapshots it was built from, status line, seconds)
+    snapshots, status, seconds = fetch_psgc_levels(PSGC_LEVELS)
+    version = tuple(snapshots.items())
+    return build_psgc_hierarchy(version), version, status, seconds
+
+
+# ----------------------------
+# Drill-down mode
+# ----------------------------
+# Regions load first; a region's provinces and cities load when it is picked and a city's
+# barangays when it is opened, each slice through the snapshot and Arrow caches above.
+# Loaded slices are shared by every session in an LRU bounded by PSGC_SLICE_CACHE_MB, and
+# the slices next to the current choice are prefetched on a background thread.
+PSGC_DRILL_DOWN = os.environ.get("PSGC_DRILL_DOWN", "") == "1"
+PSGC_SLICE_CACHE_MB = float(os.environ.get("PSGC_SLICE_CACHE_MB", 64))
+PSGC_PREFETCH = int(os.environ.get("PSGC_PREFETCH", 2))
+
+
+@st.cache_resource
+def slice_cache():
+    # endpoint -> (pages, frame, bytes), least recently used first
+    return {"lock": threading.Lock(), "slices": OrderedDict(), "bytes": 0, "prefetching": set()}
+
+
+def load_slice(session, state, cache, endpoint):
+    # -> (frame or None, pages, metas); runs on the script thread or a prefetch thread
+    snapshots, metas = fetch_snapshots(session, state, [endpoint])
+    pages = snapshots[endpoint]
+    if pages is None:
+        return None, None, metas
+    with cache["lock"]:
+        cached = cache["slices"].get(endpoint)
+        if cached and cached[0] == pages:
+            cache["slices"].move_to_end(endpoint)
+            return cached[1], pages, metas
+    frame = load_compact_level(endpoint, pages)
+    size = int(frame.memory_usage(deep=True).sum())
+    with cache["lock"]:
+        replaced = cache["slices"].pop(endpoint, None)
+        cache["bytes"] += size - (replaced[2] if replaced else 0)
+        cache["slices"][endpoint] = (pages, frame, size)
+        while cache["bytes"] > PSGC_SLICE_CACHE_MB * 2 ** 20 and len(cache["slices"]) > 1:
+            _, (_, _, evicted) = cache["slices"].popitem(last=False)
+            cache["bytes"] -= evicted
+    return frame, pages, metas
+
+
+def prefetch_slices(session, state, cache, endpoints):
+    with cache["lock"]:
+        pending = [endpoint for endpoint in endpoints
+                   if endpoint not in cache["slices"] and endpoint not in cache["prefetching"]]
+        cache["prefetching"].update(pending)
+    if not pending:
+        return
+
+    def prefetch():
+        for endpoint in pending:
+            try:
+                load_slice(session, state, cache, endpoint)
+            finally:
+                with cache["lock"]:
+                    cache["prefetching"].discard(endpoint)
+
+    threading.Thread(target=prefetch, name="psgc-prefetch", daemon=True).start()
+
+
+def next_options(options, selected, count=PSGC_PREFETCH):
+    # Users tend to step through a list in order: the options right after the current one
+    start = options.index(selected) + 1 if selected in options else 0
+    return options[start:start + count]
+
+
+def drill_down_cities():
+    # -> (cities of the chosen region/province, version key, status line)
+    session, state, cache = psgc_session(), revalidation_state(), slice_cache()
+    metas = {}
+
+    def open_slice(endpoint):
+        frame, pages, slice_metas = load_slice(session, state, cache, endpoint)
+        metas.update(slice_metas)
+        return frame, pages
+
+    regions, _ = open_slice("regions")
+    if regions is None or regions.empty:
+        return pd.DataFrame(), None, snapshot_status(state, metas)
+    region_names = dict(zip(regions["code"], regions["name"]))
+    region = st.sidebar.selectbox("🗺️ Region:", list(region_names), format_func=region_names.get)
+    prefetch_slices(session, state, cache, [
+        f"regions/{code}/{child}" for code in next_options(list(region_names), region)
+        for child in ("provinces", "cities-municipalities")
+    ])
+
+    provinces, _ = open_slice(f"regions/{region}/provinces")
+    province_names = dict(zip(provinces["code"], provinces["name"])) if provinces is not None and not provinces.empty else {}
+    province = st.sidebar.selectbox("🏞️ Province:", ["All"] + list(province_names),
+                                    format_func=lambda code: province_names.get(code, "All provinces"))
+    cities_endpoint = (f"regions/{region}/cities-municipalities" if province == "All"
+                       else f"provinces/{province}/cities-municipalities")
+    cities, pages = open_slice(cities_endpoint)
+    if cities is None or cities.empty:
+        return pd.DataFrame(), None, snapshot_status(state, metas)
+
+    city_names = dict(zip(cities["code"], cities["name"]))
+    city = st.sidebar.selectbox("🏙️ City/Municipality:", ["None"] + list(city_names),
+                                format_func=lambda code: city_names.get(code, "Choose to list its barangays"))
+    prefetch_slices(session, state, cache, [
+        f"cities-municipalities/{code}/barangays" for code in next_options(list(city_names), city)
+    ])
+    if city != "None":
+        barangays, _ = open_slice(f"cities-municipalities/{city}/barangays")
+        with st.expander(f"🏘️ Barangays of {city_names[city]}", expanded=True):
+            if barangays is None:
+                st.warning("Barangays for this city could not be loaded.")
+            else:
+                st.dataframe(barangays)
+
+    with cache["lock"]:
+        slices, used = len(cache["slices"]), cache["bytes"]
+    st.sidebar.caption(f"🧺 {slices} slices cached, {used / 2 ** 20:.2f} of {PSGC_SLICE_CACHE_MB:g} MB")
+    # Shallow copy: the dashboard renames columns in place, the shared slice must not change
+    return cities.copy(deep=False), (cities_endpoint, pages), snapshot_status(state, metas)
+
+
+# ----------------------------
+# Aggregate cube
+# ----------------------------
+# Row counts per region × type × district × province × ZIP prefix, built once per dataset
+# version. The region filter and the five charts slice it instead of recounting every rerun.
+CUBE_DIMENSIONS = ["Region ID", "Type", "District", "Province ID", "ZIP Prefix"]
+
+
+@st.cache_data(show_spinner="Aggregating...")
+def build_psgc_cube(_df, version):
+    # -> (cube, region id -> row positions in _df)
+    keys = pd.DataFrame({
+        "Region ID": _df["Region ID"].astype("string"),
+        "Type": _df["Type"],
+        "District": _df["District"],
+        "Province ID": _df["Province ID"],
+        "ZIP Prefix": _df["ZIP Code"].astype("string").str[:2],
+    })
+    cube = keys.groupby(CUBE_DIMENSIONS, dropna=False).size().rename("Count").reset_index()
+    return cube, keys.groupby("Region ID").indices
+
+
+def cube_counts(cube, dimension):
+    # Same as value_counts() on the rows: missing labels are left out, largest first
+    return cube.groupby(dimension)["Count"].sum().sort_values(ascending=False, kind="stable")
+
+
+# ----------------------------
+# Chart backends
+# ----------------------------
+# Each chart is a small spec (kind, data, encodings) that either backend can draw:
+# "server" renders matplotlib/seaborn PNGs here, "client" ships the data to the browser
+# (Vega-Lite for bars, plotly for the rest). PSGC_CHART_BACKEND picks one for the whole
+# deployment; unset, every chart keeps the renderer it always had.
+CHART_BACKEND = os.environ.get("PSGC_CHART_BACKEND", "")
+CHART_BACKENDS = ["server", "client"]
+CHART_CACHE_ENTRIES = int(os.environ.get("CHART_CACHE_ENTRIES", 64))
+BENCHMARK_MBPS = float(os.environ.get("BENCHMARK_MBPS", 10))
+
+
+def figure_png(spec):
+    # The figure is closed on every path, also when drawing fails (e.g. a heatmap of an empty pivot)
+    fig, ax = plt.subplots(figsize=spec.get("figsize", (6.4, 4.8)))
+    try:
+        draw_server_figure(ax, spec)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)  # same output as st.pyplot
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def draw_server_figure(ax, spec):
+    kind, data = spec["kind"], spec["data"]
+    if kind == "bar":
+        ax.bar(data[spec["x"]].astype(str), data[spec["y"]])
+    elif kind == "pie":
+        ax.pie(data[spec["y"]], labels=data[spec["x"]], autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')
+    elif kind == "line":
+        for label, group in data.groupby(spec["color"], sort=False):
+            ax.plot(group[spec["x"]], group[spec["y"]], marker="o", label=label)
+        ax.legend(title=spec["color"])
+    elif kind == "heatmap":
+        sns.heatmap(data, annot=True, fmt='d', cmap=spec.get("cmap"), ax=ax)
+    elif kind == "scatter":
+        sizes = data[spec["size"]] / max(data[spec["size"]].max(), 1) * 300
+        ax.scatter(data[spec["x"]].astype(str), data[spec["y"]], s=sizes, c=range(len(data)), cmap="tab20")
+        ax.tick_params(axis="x", labelrotation=90, labelsize=6)
+    ax.set_title(spec.get("title", ""))
+
+
+def client_figure(spec):
+    kind, data = spec["kind"], spec["data"]
+    if kind == "pie":
+        return px.pie(data, names=spec["x"], values=spec["y"], title=spec.get("title"))
+    if kind == "line":
+        return px.line(data, x=spec["x"], y=spec["y"], color=spec["color"], markers=True, title=spec.get("title"))
+    if kind == "heatmap":
+        return px.imshow(data, text_auto=True, aspect="auto", color_continuous_scale=spec.get("cmap"),
+                         title=spec.get("title"))
+    if kind == "scatter":
+        return px.scatter(data, x=spec["x"], y=spec["y"], size=spec["size"], color=spec["color"], title=spec.get("title"))
+    return px.bar(data, x=spec["x"], y=spec["y"], title=spec.get("title"))
+
 
-psgc_data = fetch_psgc_data()
-df_psgc = pd.DataFrame(psgc_data)
+@st.cache_data(max_entries=CHART_CACHE_ENTRIES, show_spinner=False)
+def render_png(spec):
+    # Keyed by the hash of the aggregate in the spec and its parameters, least recently used dropped first
+    return figure_png(spec)
+
+
+def show_chart(spec, default):
+    backend = CHART_BACKEND or default
+    if backend == "server":
+        st.image(render_png(spec))
+    elif spec["kind"] == "bar":
+        st.bar_chart(spec["data"].set_index(spec["x"])[spec["y"]])
+    else:
+        st.plotly_chart(client_figure(spec))
+
+
+def arrow_bytes(df):
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def benchmark_chart(spec, backend, repeats=3):
+    # -> (server CPU ms, payload bytes) of an uncached render, as sent to the browser
+    started = time.thread_time()
+    for _ in range(repeats):
+        if backend == "server":
+            payload = len(figure_png(spec))
+        elif spec["kind"] == "bar":
+            payload = arrow_bytes(spec["data"])  # st.bar_chart sends the data as Arrow
+        else:
+            payload = len(client_figure(spec).to_json())
+    return (time.thread_time() - started) / repeats * 1000, payload
+
+
+def benchmark_charts(specs):
+    rows = []
+    for name, spec in specs.items():
+        for backend in CHART_BACKENDS:
+            cpu_ms, payload = benchmark_chart(spec, backend)
+            rows.append({
+                "Chart": name,
+                "Backend": backend,
+                "Server CPU (ms)": round(cpu_ms, 1),
+                "Payload (KB)": round(payload / 1024, 1),
+                "Est. first paint (ms)": round(cpu_ms + payload * 8 / (BENCHMARK_MBPS * 1e6) * 1000, 1),
+            })
+    return pd.DataFrame(rows)
+
+
+drill_down = st.sidebar.checkbox("🔽 Drill-down mode", value=PSGC_DRILL_DOWN,
+                                 help="Load provinces, cities and barangays only when you open them")
+if drill_down:
+    df_psgc, psgc_version, psgc_status = drill_down_cities()
+    st.sidebar.caption(psgc_status)
+else:
+    psgc_hierarchy, psgc_version, psgc_status, psgc_seconds = fetch_psgc_data()
+    st.sidebar.caption(psgc_status)
+    st.sidebar.caption("🗂️ " + " · ".join(
+        f"{len(psgc_hierarchy[level]):,} {level.replace('-', '/')}" for level in PSGC_LEVELS
+    ) + f" in {psgc_seconds:.2f} s")
+    df_psgc = psgc_hierarchy["cities-municipalities"].drop(columns=["region_code", "province_code"], errors="ignore")
 
 if not df_psgc.empty:
     # Rename columns for clarity
@@ -130,36 +1564,45 @@ if not df_psgc.empty:
         'district': 'District',
         'type': 'Type',
         'region_id': 'Region ID',
-        'province_id': 'Province ID'
+        'province_id': 'Province ID',
+        'region_name': 'Region',
+        'province_name': 'Province'
     }, inplace=True)
 
-    # Sidebar filter
-    region_ids = sorted(df_psgc['Region ID'].dropna().unique().astype(str))
-    selected_region = st.sidebar.selectbox("📍 Filter by Region ID:", ["All"] + region_ids)
+    psgc_cube, region_rows = build_psgc_cube(df_psgc, psgc_version)
+
+    # Sidebar filter (in drill-down mode the region is already chosen)
+    region_ids = sorted(region_rows)
+    selected_region = "All" if drill_down else st.sidebar.selectbox("📍 Filter by Region ID:", ["All"] + region_ids)
 
     if selected_region != "All":
-        df_psgc = df_psgc[df_psgc['Region ID'].astype(str) == selected_region]
+        df_psgc = df_psgc.iloc[region_rows[selected_region]]
+        psgc_cube = psgc_cube[psgc_cube["Region ID"] == selected_region]
 
     # Display filtered data
     st.subheader("📋 Filtered Cities/Municipalities")
     st.dataframe(df_psgc)
 
+    chart_specs = {}
+
     # Chart 1: Bar Chart - Count by Type
     st.subheader("1. Bar Chart: Count by Type")
-    st.bar_chart(df_psgc['Type'].value_counts())
+    chart_specs["Count by Type"] = {
+        "kind": "bar", "data": cube_counts(psgc_cube, 'Type').reset_index(), "x": "Type", "y": "Count",
+    }
+    show_chart(chart_specs["Count by Type"], default="client")
 
     # Chart 2: Pie Chart - Distribution by District
     st.subheader("2. Pie Chart: Distribution by District")
-    district_counts = df_psgc['District'].value_counts()
-    fig1, ax1 = plt.subplots()
-    ax1.pie(district_counts, labels=district_counts.index, autopct='%1.1f%%', startangle=90)
-    ax1.axis('equal')
-    st.pyplot(fig1)
+    district_counts = cube_counts(psgc_cube, 'District')
+    chart_specs["Distribution by District"] = {
+        "kind": "pie", "data": district_counts.reset_index(), "x": "District", "y": "Count",
+    }
+    show_chart(chart_specs["Distribution by District"], default="server")
 
     # Chart 3: Line Chart - Simulated ZIP Growth
     st.subheader("3. Line Chart: Simulated ZIP Growth")
-    zip_prefix = df_psgc['ZIP Code'].dropna().astype(str).str[:2]
-    zip_counts = zip_prefix.value_counts().head(5)
+    zip_counts = cube_counts(psgc_cube, 'ZIP Prefix').head(5)
     growth_df = pd.DataFrame({
         'ZIP Prefix': zip_counts.index,
         '2020': zip_counts.values * 0.8,
@@ -169,23 +1612,35 @@ if not df_psgc.empty:
 
     # Reshape and plot
     growth_df_reset = growth_df.reset_index().melt(id_vars='ZIP Prefix', var_name='Year', value_name='Count')
-    fig_line = px.line(growth_df_reset, x='Year', y='Count', color='ZIP Prefix', markers=True,
-                       title="Simulated ZIP Growth Over Years")
-    st.plotly_chart(fig_line)
+    chart_specs["Simulated ZIP Growth"] = {
+        "kind": "line", "data": growth_df_reset, "x": "Year", "y": "Count", "color": "ZIP Prefix",
+        "title": "Simulated ZIP Growth Over Years",
+    }
+    show_chart(chart_specs["Simulated ZIP Growth"], default="client")
 
     # Chart 4: Heatmap - Region ID vs Type
     st.subheader("4. Heatmap: Region ID vs Type")
-    pivot = pd.crosstab(df_psgc['Region ID'], df_psgc['Type'])
-    fig2, ax2 = plt.subplots(figsize=(10, 5))
-    sns.heatmap(pivot, annot=True, fmt='d', cmap='YlOrBr', ax=ax2)
-    st.pyplot(fig2)
+    pivot = psgc_cube.pivot_table(index='Region ID', columns='Type', values='Count', aggfunc='sum', fill_value=0)
+    chart_specs["Region ID vs Type"] = {"kind": "heatmap", "data": pivot, "cmap": "YlOrBr", "figsize": (10, 5)}
+    show_chart(chart_specs["Region ID vs Type"], default="server")
 
     # Chart 5: Scatter Plot - Count per Province ID
     st.subheader("5. Scatter Plot: Count per Province ID")
-    province_counts = df_psgc['Province ID'].value_counts().reset_index()
+    province_counts = cube_counts(psgc_cube, 'Province ID').reset_index()
     province_counts.columns = ['Province ID', 'Count']
-    fig3 = px.scatter(province_counts, x='Province ID', y='Count', size='Count', color='Province ID')
-    st.plotly_chart(fig3)
+    chart_specs["Count per Province ID"] = {
+        "kind": "scatter", "data": province_counts, "x": "Province ID", "y": "Count", "size": "Count",
+        "color": "Province ID",
+    }
+    show_chart(chart_specs["Count per Province ID"], default="client")
+
+    # Render benchmark
+    if st.sidebar.checkbox("⏱️ Benchmark chart backends"):
+        st.subheader("⏱️ Chart Backend Benchmark")
+        st.dataframe(benchmark_charts(chart_specs), hide_index=True)
+        st.caption(f"Server CPU per uncached render; first paint estimated as CPU + payload transfer at "
+                   f"{BENCHMARK_MBPS:g} Mbit/s (browser-side drawing not included). "
+                   f"Deployment backend: {CHART_BACKEND or 'per chart'}.")
 
 else:
     st.error("❌ Failed to load PSGC API data.")
@@ -199,16 +1654,788 @@ st.title("🗃️ Streamlit + MySQL Integration")
 # ----------------------------
 # DB Connection
 # ----------------------------
-def get_connection():
-    # Replace with your own MySQL DB credentials
+# One engine, and so one connection pool, per server process: every session and rerun
+# borrows from it instead of opening new MySQL connections. The pool is sized from the
+# environment and its checkout/wait numbers are shown in the sidebar.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+
+
+def database_url():
+    # Replace with your own MySQL DB credentials, or set DATABASE_URL
     host = "localhost"
     user = "admin"
     password = "admin"
     database = "Project"
     port = 3306
-    engine = create_engine(f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}")
+    return os.environ.get("DATABASE_URL", f"mysql+pymysql://{user}:{password}@{host}:{port}/{database}")
+
+
+@st.cache_resource
+def pool_metrics():
+    return {"lock": threading.Lock(), "checkouts": 0, "connects": 0, "peak": 0, "timeouts": 0,
+            "wait_total": 0.0, "wait_max": 0.0}
+
+
+@st.cache_resource
+def get_connection():
+    engine = create_engine(database_url(), pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                           pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE,
+                           pool_pre_ping=DB_POOL_PRE_PING)
+    metrics = pool_metrics()
+
+    @event.listens_for(engine, "connect")
+    def count_connect(dbapi_connection, connection_record):
+        with metrics["lock"]:
+            metrics["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        with metrics["lock"]:
+            metrics["checkouts"] += 1
+            metrics["peak"] = max(metrics["peak"], engine.pool.checkedout())
+
+    return engine
+
+
+@contextmanager
+def checkout(engine, begin=False, job=None):
+    # Connection (or transaction with begin=True) from the pool, timing how long the checkout waited.
+    # Only the MySQL pool's waits are recorded, the ones its checkout counts belong to (not the
+    # local replica's). With a background job the connection is registered so cancel_query can
+    # interrupt it.
+    metrics = pool_metrics() if engine is get_connection() else None
+    with ExitStack() as stack:
+        started = time.perf_counter()
+        try:
+            conn = stack.enter_context(engine.begin() if begin else engine.connect())
+        except exc.TimeoutError:
+            if metrics is not None:
+                with metrics["lock"]:
+                    metrics["timeouts"] += 1
+            raise
+        waited = time.perf_counter() - started
+        if metrics is not None:
+            with metrics["lock"]:
+                metrics["wait_total"] += waited
+                metrics["wait_max"] = max(metrics["wait_max"], waited)
+        if job is not None:
+            watch_connection(job, conn)
+            stack.callback(unwatch_connection, job, conn)
+        yield conn
+
+
+def show_pool_metrics(engine):
+    metrics, pool = pool_metrics(), engine.pool
+    with st.sidebar.expander("🔌 Connection pool"):
+        col1, col2 = st.columns(2)
+        col1.metric("Checked out", f"{pool.checkedout()} / {DB_POOL_SIZE + DB_MAX_OVERFLOW}")
+        col2.metric("Peak", metrics["peak"])
+        col1.metric("Checkouts", metrics["checkouts"])
+        col2.metric("New connections", metrics["connects"])
+        col1.metric("Avg wait", f"{metrics['wait_total'] / max(metrics['checkouts'], 1) * 1000:.1f} ms")
+        col2.metric("Max wait", f"{metrics['wait_max'] * 1000:.1f} ms")
+        st.caption(f"Pool size {DB_POOL_SIZE} + overflow {DB_MAX_OVERFLOW}, timeout {DB_POOL_TIMEOUT:g} s, "
+                   f"recycle {DB_POOL_RECYCLE} s, pre-ping {'on' if DB_POOL_PRE_PING else 'off'}, "
+                   f"{metrics['timeouts']} checkout timeouts")
+
+# ----------------------------
+# Query result cache
+# ----------------------------
+# Results are keyed by database and table, the table's version, the compiled SQL
+# (whitespace-normalised) and its bound parameters. Every write the app makes bumps the table's
+# version in that database and drops its entries, so refreshing the replica of a table leaves
+# the MySQL table's results alone; QUERY_CACHE_TTL (seconds, 0 = off) catches changes
+# made outside the app.
+QUERY_CACHE_ENTRIES = int(os.environ.get("QUERY_CACHE_ENTRIES", 256))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", 300))
+FETCHES = {
+    "scalar": lambda result: result.scalar_one(),
+    "scalars": lambda result: result.scalars().all(),
+    "rows": lambda result: [dict(row) for row in result.mappings()],
+}
+
+
+@st.cache_resource
+def query_cache():
+    # ((database, table), version, sql, params, fetch) -> (stored at, result), least recently used first
+    return {"lock": threading.Lock(), "entries": OrderedDict(), "versions": {}, "hits": 0, "misses": 0}
+
+
+def table_version(engine, table_name):
+    cache = query_cache()
+    with cache["lock"]:
+        return cache["versions"].get((engine.url, table_name), 0)
+
+
+def cached_query(engine, table, query, fetch, job=None):
+    cache = query_cache()
+    compiled = query.compile(dialect=engine.dialect)
+    versioned = (engine.url, table.name)
+    with cache["lock"]:
+        version = cache["versions"].get(versioned, 0)
+    key = (versioned, version, " ".join(str(compiled).split()), tuple(sorted(compiled.params.items())), fetch)
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if entry and (not QUERY_CACHE_TTL or time.time() - entry[0] < QUERY_CACHE_TTL):
+            cache["entries"].move_to_end(key)
+            cache["hits"] += 1
+            return entry[1]
+        cache["misses"] += 1
+    with checkout(engine, job=job) as conn:
+        value = FETCHES[fetch](conn.execute(query))
+    with cache["lock"]:
+        if cache["versions"].get(versioned, 0) == version:  # a write during the query makes it stale
+            cache["entries"][key] = (time.time(), value)
+            while len(cache["entries"]) > QUERY_CACHE_ENTRIES:
+                cache["entries"].popitem(last=False)
+    return value
+
+
+def bump_table_version(engine, table_name):
+    cache = query_cache()
+    versioned = (engine.url, table_name)
+    with cache["lock"]:
+        cache["versions"][versioned] = cache["versions"].get(versioned, 0) + 1
+        for key in [key for key in cache["entries"] if key[0] == versioned]:
+            del cache["entries"][key]
+
+
+def show_query_cache():
+    cache = query_cache()
+    lookups = cache["hits"] + cache["misses"]
+    with st.sidebar.expander("🗄️ Query cache"):
+        col1, col2 = st.columns(2)
+        col1.metric("Hits", cache["hits"])
+        col2.metric("Misses", cache["misses"])
+        col1.metric("Hit rate", f"{cache['hits'] / lookups:.0%}" if lookups else "–")
+        col2.metric("Entries", f"{len(cache['entries'])} / {QUERY_CACHE_ENTRIES}")
+        st.caption(f"TTL {f'{QUERY_CACHE_TTL:g} s' if QUERY_CACHE_TTL else 'off'}; table versions: "
+                   + (", ".join(f"{name} ({os.path.basename(url.database or '')}) v{version}"
+                           for (url, name), version in cache["versions"].items()) or "none bumped"))
+
+
+# ----------------------------
+# Background queries
+# ----------------------------
+# Viewer queries run on a shared worker pool so the page stays responsive. Each one is a job in
+# the session's slot ("total", "values", "page"); a new key for a slot cancels the job it replaces,
+# the Cancel button and the QUERY_TIMEOUT_SECONDS watchdog stop the statement on the server
+# (KILL QUERY on MySQL, interrupt() on SQLite). Jobs left behind by a closed tab end at the timeout.
+# The watchdog starts when a worker picks the job up, so time spent queued does not count.
+# A finished viewer query is not reused: the next rerun asks cached_query again, so the query
+# cache (and QUERY_CACHE_TTL) decides how fresh it is. One-shot jobs keep their result.
+# Exports, replica refreshes and index builds run on their own smaller pool, so a few of them
+# cannot hold every worker and starve the viewer's count / values / page queries.
+QUERY_WORKERS = int(os.environ.get("QUERY_WORKERS", 4))
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", 2))
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", 30))
+QUERY_POLL_SECONDS = 0.5
+
+
+@st.cache_resource
+def query_workers():
+    return ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
+
+
+@st.cache_resource
+def background_workers():
+    return ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="background")
+
+
+def watch_connection(job, conn):
+    with job["lock"]:
+        if job["reason"]:
+            raise RuntimeError(f"Query {job['reason']}")
+        job["connections"].append(conn)
+
+
+def unwatch_connection(job, conn):
+    # Under the job lock, so a cancel never interrupts a connection that is back in the pool
+    with job["lock"]:
+        job["connections"].remove(conn)
+
+
+def interrupt(conn):
+    dbapi_connection = conn.connection.dbapi_connection
+    if conn.engine.dialect.name == "mysql":
+        with checkout(conn.engine) as killer:
+            killer.exec_driver_sql(f"KILL QUERY {int(dbapi_connection.thread_id())}")
+    elif hasattr(dbapi_connection, "interrupt"):
+        dbapi_connection.interrupt()
+
+
+def cancel_query(job, reason):
+    with job["lock"]:
+        if job["reason"] or job["done"]:
+            return
+        job["reason"] = reason
+        for conn in job["connections"]:
+            try:
+                interrupt(conn)
+            except Exception:
+                pass  # the statement finished in the meantime
+
+
+def run_query(job, run):
+    timeout = job["timeout"]
+    timer = threading.Timer(timeout, cancel_query, (job, f"timed out after {timeout:g} s"))
+    timer.daemon = True
+    with job["lock"]:
+        if job["reason"]:  # cancelled or superseded while it waited for a worker
+            job["done"] = True
+            raise RuntimeError(f"Query {job['reason']}")
+        job["started"] = time.perf_counter()
+        timer.start()
+    try:
+        return run(job)
+    except Exception:
+        if job["reason"]:
+            raise RuntimeError(f"Query {job['reason']}") from None
+        raise
+    finally:
+        timer.cancel()
+        with job["lock"]:
+            job["done"] = True
+
+
+def submit_query(slot, key, run, timeout=QUERY_TIMEOUT_SECONDS, workers=query_workers):
+    jobs = st.session_state.setdefault("queries", {})
+    job = jobs.get(slot)
+    if job and job["key"] == key:
+        return job
+    if job:
+        cancel_query(job, "superseded")
+    job = {"key": key, "lock": threading.Lock(), "connections": [], "reason": None, "done": False,
+           "started": None, "timeout": timeout}
+    job["future"] = workers().submit(run_query, job, run)
+    jobs[slot] = job
+    return job
+
+
+def forget_query(slot):
+    st.session_state.get("queries", {}).pop(slot, None)
+
+
+@st.fragment(run_every=QUERY_POLL_SECONDS)
+def query_progress(slot, job, label):
+    # Reruns on its own while the job runs, then hands back to the whole page
+    if job["future"].done():
+        st.rerun()
+    col1, col2 = st.columns([4, 1])
+    col2.button("✖ Cancel", key=f"cancel_{slot}", on_click=cancel_query, args=(job, "cancelled"))
+    if job["started"] is None:
+        col1.info(f"⏳ {label}… waiting for a free worker")
+        return
+    elapsed = time.perf_counter() - job["started"]
+    rows = f", {job['rows']:,} rows at {job['rows'] / elapsed:,.0f} rows/s" if "rows" in job else ""
+    col1.info(f"⏳ {label}… {elapsed:.1f} s{rows} (timeout {job['timeout']:g} s)")
+
+
+def query_result(slot, key, run, label, timeout=QUERY_TIMEOUT_SECONDS, workers=query_workers, one_shot=False):
+    # The job's result, or None while it runs or after it failed (shown in place). A failed job stays
+    # until "Run again"; one-shot jobs (export, refresh, index build) also keep their result.
+    job = submit_query(slot, key, run, timeout, workers)
+    wait([job["future"]], timeout=QUERY_POLL_SECONDS)  # fast and cached queries skip the progress row
+    if not job["future"].done():
+        query_progress(slot, job, label)
+        return None
+    error = job["future"].exception()
+    if error is not None:
+        col1, col2 = st.columns([4, 1])
+        col1.warning(f"🛑 {label}: {error}")
+        col2.button("🔁 Run again", key=f"retry_{slot}", on_click=forget_query, args=(slot,))
+        return None
+    if not one_shot:
+        forget_query(slot)
+    return job["future"].result()
+
+
+# ----------------------------
+# SQL pushdown
+# ----------------------------
+# Filtering, counting and paging run in the database through SQLAlchemy Core. Table and column
+# names are checked against the reflected schema and values are bound parameters, so nothing
+# typed into the page is pasted into SQL. Pages are read by keyset on the primary key.
+DISTINCT_VALUE_LIMIT = 1000
+PAGE_SIZES = [25, 50, 100, 500]
+
+
+def reflect_table(engine, table_name):
+    return describe_table(engine, table_name)[0]
+
+
+def count_query(table, condition=None):
+    query = select(func.count()).select_from(table)
+    return query if condition is None else query.where(condition)
+
+
+def count_rows(engine, table, condition=None, job=None):
+    return cached_query(engine, table, count_query(table, condition), "scalar", job)
+
+
+def distinct_values(engine, table, column, job=None):
+    query = select(column).distinct().where(column.is_not(None)).order_by(column).limit(DISTINCT_VALUE_LIMIT)
+    return cached_query(engine, table, query, "scalars", job)
+
+
+def page_query(table, condition, after, page_size, offset):
+    # Keyset: rows after the last key of the previous page, so deep pages cost as much as the first.
+    # Tables without a primary key fall back to OFFSET.
+    key = list(table.primary_key.columns)
+    query = select(table)
+    if condition is not None:
+        query = query.where(condition)
+    if key:
+        if after is not None:
+            query = query.where(tuple_(*key) > tuple_(*after) if len(key) > 1 else key[0] > after[0])
+        query = query.order_by(*key)
+    else:
+        query = query.order_by(*table.columns).offset(offset)
+    return query.limit(page_size)
+
+
+def read_page(engine, table, condition, after, page_size, offset, job=None):
+    key = list(table.primary_key.columns)
+    rows = cached_query(engine, table, page_query(table, condition, after, page_size, offset), "rows", job)
+    last_key = tuple(rows[-1][column.name] for column in key) if key and rows else None
+    return pd.DataFrame(rows, columns=[column.name for column in table.columns]), last_key
+
+
+def keyset_cursors(scope):
+    # Start key of every page visited so far; reset whenever the table, filter or page size changes
+    state = st.session_state.setdefault("keyset", {"scope": None, "cursors": [None], "next": None})
+    if state["scope"] != scope:
+        state.update(scope=scope, cursors=[None], next=None)
+    return state
+
+
+def next_page():
+    state = st.session_state["keyset"]
+    state["cursors"].append(state["next"])
+
+
+def previous_page():
+    st.session_state["keyset"]["cursors"].pop()
+
+# ----------------------------
+# Indexes and query plans
+# ----------------------------
+# Reflected tables and their indexes are cached per database for SCHEMA_CACHE_SECONDS instead of
+# being read again on every rerun. The columns users filter on are counted per table; filtered
+# columns that no index starts with are suggested for an index (an index on the column turns the
+# viewer's "WHERE column = value ORDER BY key" scans into lookups), which admins can create here.
+# JSON columns are never suggested; TEXT/BLOB columns on MySQL get a key prefix of
+# INDEX_PREFIX_LENGTH characters, since MySQL cannot index them whole.
+SCHEMA_CACHE_SECONDS = float(os.environ.get("SCHEMA_CACHE_SECONDS", 300))
+INDEX_TIMEOUT_SECONDS = float(os.environ.get("INDEX_TIMEOUT_SECONDS", 3600))
+INDEX_PREFIX_LENGTH = int(os.environ.get("INDEX_PREFIX_LENGTH", 255))
+ADMIN_USERS = ("admin",)
+
+
+@st.cache_resource
+def schema_cache():
+    # (database, table) -> (reflected at, Table, indexes)
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+@st.cache_resource
+def filter_usage():
+    # (database, table) -> {column: times filtered on}
+    return {"lock": threading.Lock(), "tables": {}}
+
+
+def describe_table(engine, table_name):
+    # -> (Table, indexes with the primary key first), or (None, []) for an unknown table (not cached)
+    cache, key = schema_cache(), (str(engine.url), table_name)
+    with cache["lock"]:
+        entry = cache["tables"].get(key)
+    if entry and time.time() - entry[0] < SCHEMA_CACHE_SECONDS:
+        return entry[1], entry[2]
+    inspector = inspect(engine)
+    if table_name not in inspector.get_table_names():
+        return None, []
+    table = Table(table_name, MetaData(), autoload_with=engine)
+    primary_key = [column.name for column in table.primary_key.columns]
+    indexes = [{"name": "PRIMARY", "columns": primary_key, "unique": True}] if primary_key else []
+    indexes += [{"name": index["name"], "columns": index["column_names"], "unique": bool(index["unique"])}
+                for index in inspector.get_indexes(table_name)]
+    with cache["lock"]:
+        cache["tables"][key] = (time.time(), table, indexes)
+    return table, indexes
+
+
+def record_filter(engine, table, column, value):
+    # Each new filter choice of a session counts once, not every rerun that shows it
+    choice = (str(engine.url), table.name, column, value)
+    if st.session_state.get("last_filter") == choice:
+        return
+    st.session_state["last_filter"] = choice
+    usage = filter_usage()
+    with usage["lock"]:
+        counts = usage["tables"].setdefault(choice[:2], {})
+        counts[column] = counts.get(column, 0) + 1
+
+
+def explain(engine, query):
+    compiled = query.compile(dialect=engine.dialect)
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with checkout(engine) as conn:
+        return pd.DataFrame(conn.exec_driver_sql(prefix + str(compiled), params).mappings().all())
+
+
+def full_scan(plan):
+    # MySQL reports access type ALL (or index, a full index scan); SQLite says SCAN rather than SEARCH
+    if "type" in plan:
+        return bool(plan["type"].isin(["ALL", "index"]).any())
+    if "detail" in plan:
+        return bool(plan["detail"].str.startswith("SCAN").any())
+    return None
+
+
+def index_key(engine, column):
+    # -> the column as an index key, or None when it cannot be indexed directly
+    try:
+        generic = column.type.as_generic()
+    except NotImplementedError:
+        generic = column.type
+    if isinstance(generic, JSON):
+        return None
+    quoted = engine.dialect.identifier_preparer.quote(column.name)
+    if engine.dialect.name == "mysql" and isinstance(generic, (String, LargeBinary)) and not generic.length:
+        return f"{quoted}({INDEX_PREFIX_LENGTH})"  # TEXT/BLOB: without a key length MySQL fails (error 1170)
+    return quoted
+
+
+def index_advice(engine, table, indexes):
+    # Filtered columns with no index starting with them, most filtered first
+    usage = filter_usage()
+    with usage["lock"]:
+        counts = dict(usage["tables"].get((str(engine.url), table.name), {}))
+    leading = {index["columns"][0] for index in indexes if index["columns"]}
+    quote = engine.dialect.identifier_preparer.quote
+    advice = []
+    for column, filters in sorted(counts.items(), key=lambda item: -item[1]):
+        key = index_key(engine, table.c[column]) if column in table.c and column not in leading else None
+        if key is not None:
+            name = f"ix_{table.name}_{column}"[:64]
+            advice.append({"Column": column, "Filters": filters, "Index": name,
+                           "Statement": f"CREATE INDEX {quote(name)} ON {quote(table.name)} ({key})"})
+    return advice
+
+
+def create_index(engine, schema, table_name, statement, job):
+    with checkout(engine, begin=True, job=job) as conn:
+        conn.exec_driver_sql(statement)
+    with schema["lock"]:
+        schema["tables"].pop((str(engine.url), table_name), None)
+    return statement
+
+
+def start_index(table_name, advice):
+    runs = st.session_state.get("index_request", {}).get("run", 0) + 1
+    st.session_state["index_request"] = {"run": runs, "table": table_name, **advice}
+
+
+# ----------------------------
+# Streaming export
+# ----------------------------
+# Whole tables (or the filtered rows) are read through a server-side cursor (stream_results) in
+# partitions of EXPORT_BATCH_ROWS, each turned straight into an Arrow record batch and appended
+# to a Parquet or CSV file, so memory holds one batch no matter how large the table is.
+EXPORT_BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", 50_000))
+EXPORT_TIMEOUT_SECONDS = float(os.environ.get("EXPORT_TIMEOUT_SECONDS", 600))
+EXPORT_PREVIEW_ROWS = 100
+EXPORT_FORMATS = {"Parquet": ("parquet", pq.ParquetWriter), "CSV": ("csv", pacsv.CSVWriter)}
+ARROW_TYPES = {int: pa.int64(), float: pa.float64(), str: pa.string(), bool: pa.bool_(),
+               bytes: pa.binary(), datetime.datetime: pa.timestamp("us"), datetime.date: pa.date32(),
+               datetime.time: pa.time64("us"), datetime.timedelta: pa.duration("us")}
+
+
+def arrow_field(column):
+    # Types Arrow has no match for (JSON, SET, unbounded NUMERIC, ...) are written as text
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = str
+    if python_type is decimal.Decimal:
+        precision, scale = getattr(column.type, "precision", None), getattr(column.type, "scale", None)
+        scale = scale if scale is not None else 0
+        if precision is not None and precision <= 38:
+            return pa.field(column.name, pa.decimal128(precision, scale))
+        if precision is not None and precision <= 76:
+            return pa.field(column.name, pa.decimal256(precision, scale))
+    return pa.field(column.name, ARROW_TYPES.get(python_type, pa.string()))
+
+
+def to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple, set, frozenset)):
+        return json.dumps(sorted(value) if isinstance(value, (set, frozenset)) else value, default=str)
+    return str(value)
+
+
+def arrow_array(values, field):
+    try:
+        return pa.array(values, type=field.type)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        if field.type != pa.string():
+            raise
+        return pa.array([to_text(value) for value in values], type=field.type)
+
+
+def stream_batches(engine, table, condition=None, job=None):
+    schema = pa.schema([arrow_field(column) for column in table.columns])
+    query = select(table) if condition is None else select(table).where(condition)
+    with checkout(engine, job=job) as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_BATCH_ROWS).execute(query)
+        for rows in result.partitions(EXPORT_BATCH_ROWS):
+            columns = zip(*rows)
+            yield pa.record_batch([arrow_array(values, field) for values, field in zip(columns, schema)],
+                                  schema=schema)
+
+
+def export_table(engine, table, condition, fmt, path, job):
+    # -> summary with the first EXPORT_PREVIEW_ROWS rows; job["rows"] tracks progress for the page
+    extension, writer_class = EXPORT_FORMATS[fmt]
+    started, preview, writer = time.perf_counter(), [], None
+    job["rows"] = 0
+    try:
+        for batch in stream_batches(engine, table, condition, job):
+            if writer is None:
+                writer = writer_class(path, batch.schema)
+            writer.write_batch(batch)
+            if job["rows"] < EXPORT_PREVIEW_ROWS:
+                preview.append(batch.slice(0, EXPORT_PREVIEW_ROWS - job["rows"]))
+            job["rows"] += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    seconds = time.perf_counter() - started
+    return {"path": path if writer is not None else None, "file_name": f"{table.name}.{extension}",
+            "rows": job["rows"], "seconds": seconds,
+            "preview": pa.Table.from_batches(preview).to_pandas() if preview else pd.DataFrame()}
+
+
+def read_export(path):
+    # Deferred download: Streamlit calls this when the button is clicked, so the file is not read
+    # into server memory on every rerun while the export stays on the page
+    with open(path, "rb") as exported:
+        return exported.read()
+
+
+def start_export(table_name, scope, fmt):
+    # One export file per session: the previous one is removed when a new export starts
+    export_dir = st.session_state.setdefault("export_dir", tempfile.mkdtemp(prefix="act5-export-"))
+    for name in os.listdir(export_dir):
+        os.remove(os.path.join(export_dir, name))
+    runs = st.session_state.get("export", {}).get("run", 0) + 1
+    st.session_state["export"] = {"run": runs, "table": table_name, "scope": scope, "fmt": fmt,
+                                  "path": os.path.join(export_dir, f"{runs}.{EXPORT_FORMATS[fmt][0]}")}
+
+
+# ----------------------------
+# Local replica
+# ----------------------------
+# Filtering can be served from a copy of the table in a local SQLite file instead of MySQL.
+# A refresh copies only what changed: rows whose updated-at column is at or past the replica's
+# latest value (upserted by primary key), otherwise rows past the replica's highest key. Tables
+# without a primary key, and deletes, need a full reload.
+REPLICA_PATH = os.environ.get("REPLICA_PATH", os.path.join(tempfile.gettempdir(), "act5-replica.sqlite"))
+REPLICA_TIMEOUT_SECONDS = float(os.environ.get("REPLICA_TIMEOUT_SECONDS", 1800))
+REPLICA_UPDATED_COLUMNS = ("updated_at", "modified_at", "last_modified", "last_update")
+REPLICA_OVERLAP_SECONDS = float(os.environ.get("REPLICA_OVERLAP_SECONDS", 60))  # for late-committing writes
+replica_metadata = MetaData()
+replica_status = Table("_replica_status", replica_metadata,
+                       Column("table_name", String(255), primary_key=True),
+                       Column("mode", String(20)),
+                       Column("row_count", Integer),
+                       Column("refreshed_at", Float))
+
+
+@st.cache_resource
+def replica_engine():
+    engine = create_engine(f"sqlite:///{REPLICA_PATH}")
+
+    @event.listens_for(engine, "connect")
+    def use_wal(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")  # readers keep going during a refresh
+
+    replica_metadata.create_all(engine)
     return engine
 
+
+@st.cache_resource
+def replica_lock():
+    return threading.Lock()
+
+
+def replica_mode(table):
+    # -> ("updated_at" | "key" | "full", updated-at column or None)
+    updated = next((column for column in table.columns if column.name.lower() in REPLICA_UPDATED_COLUMNS), None)
+    if table.primary_key.columns and updated is not None:
+        return "updated_at", updated
+    return ("key" if table.primary_key.columns else "full"), None
+
+
+def replica_table(table):
+    # Same columns with generic types, so MySQL-specific types can be created in SQLite
+    columns = []
+    for column in table.columns:
+        try:
+            column_type = column.type.as_generic()
+        except NotImplementedError:
+            column_type = Text()
+        columns.append(Column(column.name, column_type, primary_key=column.primary_key))
+    replica = Table(table.name, MetaData(), *columns)
+    for column in replica.columns:
+        if not column.primary_key:
+            Index(f"ix_{table.name}_{column.name}", column)
+    return replica
+
+
+def refresh_replica(source, replica, lock, table, full, job):
+    mode, updated = replica_mode(table)
+    target = replica_table(table)
+    key = [target.c[column.name] for column in table.primary_key.columns]
+    started, job["rows"] = time.perf_counter(), 0
+    with lock, ExitStack() as stack:
+        conn = stack.enter_context(replica.begin())
+        watch_connection(job, conn)
+        stack.callback(unwatch_connection, job, conn)
+        status = conn.execute(select(replica_status).where(replica_status.c.table_name == table.name)).first()
+        if full or status is None or status.mode != mode or mode == "full":
+            target.drop(conn, checkfirst=True)
+            target.create(conn)
+        query = select(table)
+        if mode == "updated_at":
+            latest = conn.execute(select(func.max(target.c[updated.name]))).scalar()
+            if isinstance(latest, datetime.datetime):
+                latest -= datetime.timedelta(seconds=REPLICA_OVERLAP_SECONDS)
+            if latest is not None:
+                query = query.where(updated >= latest)
+        elif mode == "key":
+            latest = conn.execute(select(*key).order_by(*[column.desc() for column in key]).limit(1)).first()
+            if latest is not None:
+                source_key = list(table.primary_key.columns)
+                query = query.where(tuple_(*source_key) > tuple_(*latest) if len(key) > 1 else source_key[0] > latest[0])
+        insert = target.insert().prefix_with("OR REPLACE")
+        with checkout(source, job=job) as source_conn:
+            result = source_conn.execution_options(stream_results=True, max_row_buffer=EXPORT_BATCH_ROWS).execute(query)
+            for rows in result.mappings().partitions(EXPORT_BATCH_ROWS):
+                conn.execute(insert, [dict(row) for row in rows])
+                job["rows"] += len(rows)
+        row_count = conn.execute(select(func.count()).select_from(target)).scalar_one()
+        conn.execute(replica_status.delete().where(replica_status.c.table_name == table.name))
+        conn.execute(replica_status.insert(), {"table_name": table.name, "mode": mode, "row_count": row_count,
+                                               "refreshed_at": time.time()})
+    bump_table_version(replica, table.name)
+    return {"mode": mode, "copied": job["rows"], "rows": row_count, "seconds": time.perf_counter() - started}
+
+
+def start_replica_refresh(table_name, full):
+    runs = st.session_state.get("replica_refresh", {}).get("run", 0) + 1
+    st.session_state["replica_refresh"] = {"run": runs, "table": table_name, "full": full}
+
+
+def replica_panel(source, table):
+    # Refresh buttons, the running refresh and the replica's status;
+    # -> the replica's table, None before the first refresh
+    col1, col2, col3 = st.columns([3, 1, 1])
+    col2.button("🔄 Refresh", on_click=start_replica_refresh, args=(table.name, False))
+    col3.button("Full reload", on_click=start_replica_refresh, args=(table.name, True))
+    replica, lock = replica_engine(), replica_lock()
+    request = st.session_state.get("replica_refresh")
+    if request and request["table"] == table.name:
+        refreshed = query_result("replica", (table.name, request["run"]),
+                                 lambda job: refresh_replica(source, replica, lock, table, request["full"], job),
+                                 f"Refreshing the replica of {table.name}", REPLICA_TIMEOUT_SECONDS, background_workers,
+                                 one_shot=True)
+        if refreshed is not None:
+            st.caption(f"Copied {refreshed['copied']:,} rows in {refreshed['seconds']:.1f} s "
+                       f"({refreshed['mode'].replace('_', '-')} refresh).")
+    with checkout(replica) as conn:
+        status = conn.execute(select(replica_status).where(replica_status.c.table_name == table.name)).first()
+    if status is None:
+        col1.caption(f"🧊 No replica of {table.name} yet.")
+        return None
+    col1.caption(f"🧊 Replica of {table.name}: {status.row_count:,} rows, refreshed "
+                 f"{time.time() - status.refreshed_at:,.0f} s ago (by {status.mode.replace('_', '-')})")
+    return reflect_table(replica, table.name)
+
+
+# ----------------------------
+# Bulk import
+# ----------------------------
+# Uploaded files are streamed in chunks; each chunk is one executemany inside its own SAVEPOINT
+# (a bad chunk is rolled back and reported, the rest still load) and the transaction commits
+# every few chunks, so an import holds a bounded number of open transactions.
+SKIP_COLUMN = "(skip)"
+
+
+def upload_columns(upload):
+    upload.seek(0)
+    if upload.name.lower().endswith(".parquet"):
+        return pq.ParquetFile(upload).schema_arrow.names
+    return list(pd.read_csv(upload, nrows=0).columns)
+
+
+def upload_chunks(upload, batch_rows):
+    # -> (chunk DataFrame, fraction of the file read so far)
+    upload.seek(0)
+    if upload.name.lower().endswith(".parquet"):
+        parquet = pq.ParquetFile(upload)
+        done = 0
+        for batch in parquet.iter_batches(batch_size=batch_rows):
+            done += batch.num_rows
+            yield batch.to_pandas(), done / max(parquet.metadata.num_rows, 1)
+    else:
+        size = max(upload.size, 1)
+        for chunk in pd.read_csv(upload, chunksize=batch_rows):
+            yield chunk, min(upload.tell() / size, 1.0)
+
+
+def bulk_import(engine, table, upload, mapping, batch_rows, batches_per_commit):
+    # mapping: file column -> table column; -> (per-batch report, rows inserted, seconds)
+    report, inserted, started = [], 0, time.perf_counter()
+    progress = st.progress(0.0, text="Starting import...")
+    with checkout(engine) as conn:
+        transaction = conn.begin()
+        try:
+            for number, (chunk, fraction) in enumerate(upload_chunks(upload, batch_rows), start=1):
+                chunk = chunk[list(mapping)].rename(columns=mapping)
+                records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+                first_row = (number - 1) * batch_rows + 1
+                try:
+                    with conn.begin_nested():
+                        conn.execute(table.insert(), records)
+                    inserted += len(records)
+                    report.append({"Batch": number, "First row": first_row, "Rows": len(records), "Status": "✅", "Error": ""})
+                except exc.DBAPIError as error:
+                    report.append({"Batch": number, "First row": first_row, "Rows": len(records), "Status": "❌",
+                                   "Error": str(error.orig)})
+                if number % batches_per_commit == 0:
+                    transaction.commit()
+                    bump_table_version(engine, table.name)
+                    transaction = conn.begin()
+                elapsed = time.perf_counter() - started
+                progress.progress(fraction, text=f"{inserted:,} rows inserted · {inserted / max(elapsed, 1e-9):,.0f} rows/s")
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+        finally:
+            bump_table_version(engine, table.name)
+    return pd.DataFrame(report), inserted, time.perf_counter() - started
+
 engine = get_connection()
 
 # ----------------------------
@@ -235,19 +2462,109 @@ if logged_in:
     # ----------------------------
     st.subheader("📋 View Data From Table")
     table_name = st.text_input("Enter table name to query:", "your_table")
+    use_replica = st.toggle("🧊 Serve from a local replica", help="Filter, count and page a local copy of the table "
+                                                                  "instead of querying MySQL.")
 
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-            st.write(f"Total rows: {df.shape[0]}")
-            if not df.empty:
-                selected_col = st.selectbox("Filter by column", df.columns)
-                unique_vals = df[selected_col].dropna().unique()
-                selected_val = st.selectbox("Select value", unique_vals.astype(str))
-                filtered = df[df[selected_col].astype(str) == selected_val]
-                st.dataframe(filtered)
-            else:
-                st.warning("Table is empty.")
+        source_table = reflect_table(engine, table_name)
+        view_engine, table = engine, source_table
+        if source_table is not None and use_replica:
+            view_engine, table = replica_engine(), replica_panel(engine, source_table)
+        if source_table is None:
+            st.error(f"❌ No table named '{table_name}'.")
+        elif table is not None:
+            origin = ("replica" if use_replica else "source", table.name, table_version(view_engine, table.name))
+            total = query_result("total", origin, lambda job: count_rows(view_engine, table, job=job),
+                                 "Counting rows")
+            if total is not None:
+                st.write(f"Total rows: {total}")
+            selected_col = st.selectbox("Filter by column", [column.name for column in table.columns])
+            unique_vals = query_result("values", (*origin, selected_col),
+                                       lambda job: distinct_values(view_engine, table, table.c[selected_col], job=job),
+                                       f"Listing values of '{selected_col}'")
+            if unique_vals:
+                selected_val = st.selectbox("Select value", unique_vals)
+                record_filter(engine, source_table, selected_col, selected_val)
+                if len(unique_vals) == DISTINCT_VALUE_LIMIT:
+                    st.caption(f"Showing the first {DISTINCT_VALUE_LIMIT} values.")
+                condition = table.c[selected_col] == selected_val
+                page_size = st.selectbox("Rows per page", PAGE_SIZES)
+                state = keyset_cursors((table_name, selected_col, selected_val, page_size))
+                start = (len(state["cursors"]) - 1) * page_size
+                after = state["cursors"][-1]
+                page = query_result("page", (*origin, selected_col, selected_val, page_size, after, start),
+                                    lambda job: (count_rows(view_engine, table, condition, job=job),
+                                                 read_page(view_engine, table, condition, after, page_size, start,
+                                                           job=job)),
+                                    "Reading page")
+                if page is not None:
+                    matched, (filtered, state["next"]) = page
+                    st.dataframe(filtered)
+                    col1, col2, col3 = st.columns([1, 1, 4])
+                    col1.button("◀ Previous", on_click=previous_page, disabled=len(state["cursors"]) == 1)
+                    col2.button("Next ▶", on_click=next_page, disabled=start + len(filtered) >= matched)
+                    col3.caption(f"Rows {start + 1 if len(filtered) else 0}–{start + len(filtered)} of {matched:,}")
+            elif unique_vals is not None:
+                st.warning("Table is empty." if total == 0 else f"'{selected_col}' has no values.")
+
+            with st.expander("📤 Export table"):
+                scopes = ["Whole table"] + (["Rows matching the filter"] if unique_vals else [])
+                scope = st.radio("Rows", scopes, horizontal=True)
+                fmt = st.selectbox("Format", list(EXPORT_FORMATS))
+                st.button("Stream export", on_click=start_export, args=(table.name, scope, fmt))
+                request = st.session_state.get("export")
+                if request and request["table"] == table.name:
+                    export_condition = condition if unique_vals and request["scope"] != "Whole table" else None
+                    export = query_result("export", (table.name, request["run"]),
+                                          lambda job: export_table(view_engine, table, export_condition,
+                                                                   request["fmt"], request["path"], job),
+                                          f"Exporting {table.name}", EXPORT_TIMEOUT_SECONDS, background_workers,
+                                          one_shot=True)
+                    if export is not None:
+                        st.caption(f"{export['rows']:,} rows in {export['seconds']:.1f} s "
+                                   f"({export['rows'] / max(export['seconds'], 1e-9):,.0f} rows/s)")
+                        st.dataframe(export["preview"])
+                        if export["path"]:
+                            st.download_button(f"⬇️ Download {export['file_name']}",
+                                               lambda path=export["path"]: read_export(path),
+                                               file_name=export["file_name"])
+
+            with st.expander("🔍 Indexes and query plans"):
+                source_indexes = describe_table(engine, source_table.name)[1]
+                if source_indexes:
+                    st.dataframe(pd.DataFrame([{"Index": index["name"], "Unique": index["unique"],
+                                                "Columns": ", ".join(map(str, index["columns"]))}
+                                               for index in source_indexes]))
+                else:
+                    st.caption(f"{source_table.name} has no indexes, so every filter reads the whole table.")
+                if unique_vals and st.toggle("EXPLAIN the current filter"):
+                    source_condition = source_table.c[selected_col] == selected_val
+                    for label, query in [("Count", count_query(source_table, source_condition)),
+                                         ("Page", page_query(source_table, source_condition, None, page_size, 0))]:
+                        plan = explain(engine, query)
+                        scan = full_scan(plan)
+                        st.caption(f"{label}: " + ("⚠️ full scan" if scan else "✅ index lookup" if scan is False
+                                                   else "plan not recognised"))
+                        st.dataframe(plan)
+                advice = index_advice(engine, source_table, source_indexes)
+                if advice:
+                    st.write("💡 Suggested indexes for the most filtered unindexed columns:")
+                    st.dataframe(pd.DataFrame(advice))
+                    if username in ADMIN_USERS:
+                        suggestion = st.selectbox("Index to create", advice, format_func=lambda item: item["Statement"])
+                        st.button("Create index", on_click=start_index, args=(source_table.name, suggestion))
+                else:
+                    st.caption("No unindexed column has been filtered on yet.")
+                request = st.session_state.get("index_request")
+                if request and request["table"] == source_table.name and username in ADMIN_USERS:
+                    schema = schema_cache()
+                    created = query_result("index", (source_table.name, request["run"]),
+                                           lambda job: create_index(engine, schema, source_table.name,
+                                                                    request["Statement"], job),
+                                           f"Creating {request['Index']}", INDEX_TIMEOUT_SECONDS, background_workers,
+                                           one_shot=True)
+                    if created is not None:
+                        st.success(f"✅ {created}")
     except Exception as e:
         st.error(f"Error: {e}")
 
@@ -263,16 +2580,59 @@ if logged_in:
 
         if submitted:
             try:
-                with engine.begin() as conn:
-                    query = text(f"INSERT INTO {table_name} (name, age, city) VALUES (:name, :age, :city)")
-                    conn.execute(query, {"name": name, "age": age, "city": city})
+                table = reflect_table(engine, table_name)
+                if table is None:
+                    st.error(f"❌ No table named '{table_name}'.")
+                else:
+                    with checkout(engine, begin=True) as conn:
+                        conn.execute(table.insert(), {"name": name, "age": age, "city": city})
+                    bump_table_version(engine, table.name)
                     st.success("✅ Row inserted successfully!")
             except Exception as e:
                 st.error(f"❌ Error inserting data: {e}")
 
+    # ----------------------------
+    # Bulk Import
+    # ----------------------------
+    st.subheader("📥 Bulk Import")
+    upload = st.file_uploader("Upload a CSV or Parquet file", type=["csv", "parquet"])
+    if upload is not None:
+        try:
+            table = reflect_table(engine, table_name)
+            if table is None:
+                st.error(f"❌ No table named '{table_name}'.")
+            else:
+                file_columns = upload_columns(upload)
+                by_name = {column.lower(): column for column in file_columns}
+                st.caption("Map the file's columns to the table's columns:")
+                mapping = {}
+                grid = st.columns(3)
+                for position, column in enumerate(table.columns):
+                    options = [SKIP_COLUMN] + file_columns
+                    default = options.index(by_name[column.name.lower()]) if column.name.lower() in by_name else 0
+                    source = grid[position % 3].selectbox(column.name, options, index=default, key=f"map_{column.name}")
+                    if source != SKIP_COLUMN:
+                        mapping[source] = column.name
+                col1, col2 = st.columns(2)
+                batch_rows = col1.number_input("Rows per batch", min_value=100, max_value=100_000, value=5_000, step=100)
+                batches_per_commit = col2.number_input("Batches per commit", min_value=1, max_value=100, value=10)
+                if st.button("Import", disabled=not mapping):
+                    report, inserted, seconds = bulk_import(engine, table, upload, mapping, int(batch_rows),
+                                                            int(batches_per_commit))
+                    failed = report[report["Status"] == "❌"] if not report.empty else report
+                    message = (f"{inserted:,} rows imported in {seconds:.1f} s "
+                               f"({inserted / max(seconds, 1e-9):,.0f} rows/s), {len(failed)} failed batches")
+                    (st.warning if len(failed) else st.success)(("⚠️ " if len(failed) else "✅ ") + message)
+                    st.dataframe(report, hide_index=True)
+        except Exception as e:
+            st.error(f"❌ Error importing data: {e}")
+
 else:
     st.warning("🔒 Please login to access the dashboard.")
 
+show_pool_metrics(engine)
+show_query_cache()
+
 #problem 6
 st.title("🎥 OpenCV + Streamlit: Real-Time Video Processing")
 
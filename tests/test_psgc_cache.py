@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import socket
+import subprocess
+
+import pytest
+import requests
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ACT4 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ACT4")
+APP = os.path.join(ACT4, "app4.py")
+STUB = os.path.join(ACT4, "psgc_stub_server.py")
+LEVELS = ["regions", "provinces", "cities-municipalities", "barangays"]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    # start(*args) runs psgc_stub_server.py on one port for the whole test, restarting it with new args
+    port, servers = free_port(), []
+
+    def start(*args):
+        for server in servers:
+            server.terminate()
+            server.wait()
+        servers.append(subprocess.Popen([sys.executable, STUB, "--port", str(port), *args],
+                                        stdout=subprocess.DEVNULL))
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                return f"http://127.0.0.1:{port}/api"
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("PSGC stub did not start")
+
+    monkeypatch.setenv("PSGC_API_URL", f"http://127.0.0.1:{port}/api")
+    monkeypatch.setenv("PSGC_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("PSGC_RETRIES", "0")
+    monkeypatch.delenv("PSGC_DRILL_DOWN", raising=False)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    yield start
+    for server in servers:
+        server.terminate()
+        server.wait()
+
+
+def run_app():
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def psgc_status(at):
+    return at.sidebar.caption[0].value
+
+
+def snapshot(cache_dir, level):
+    # -> (body path, meta) of the saved snapshot of one level
+    name = next(entry for entry in os.listdir(cache_dir) if entry.startswith(f"{level}-") and entry.endswith(".meta.json"))
+    meta_path = os.path.join(cache_dir, name)
+    with open(meta_path, encoding="utf-8") as saved:
+        return meta_path.replace(".meta.json", ".json"), json.load(saved)
+
+
+def wait_for_revalidation(cache_dir, fetched_before, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(snapshot(cache_dir, level)[1]["fetched_at"] > fetched_before[level] for level in LEVELS):
+            return
+        time.sleep(0.1)
+    raise AssertionError("the stale snapshots were not revalidated")
+
+
+def test_fresh_fetch_stores_body_and_meta(stub, tmp_path):
+    api_url = stub()
+    at = run_app()
+    assert psgc_status(at).startswith("🌐 PSGC data cached")
+    for level in LEVELS:
+        body_path, meta = snapshot(tmp_path, level)
+        response = requests.get(f"{api_url}/{level}", timeout=10)
+        with open(body_path, "rb") as saved:
+            assert saved.read() == response.content
+        assert meta["etag"] == response.headers["ETag"]
+        assert meta["last_modified"] == response.headers["Last-Modified"]
+        assert meta["pages"] == 1
+
+
+def test_stale_snapshot_is_served_while_a_304_revalidates_it(stub, tmp_path, monkeypatch):
+    stub("--delay", "2")
+    run_app()
+    saved = {level: snapshot(tmp_path, level) for level in LEVELS}
+    body_mtimes = {level: os.path.getmtime(body_path) for level, (body_path, _) in saved.items()}
+
+    monkeypatch.setenv("PSGC_TTL_SECONDS", "0")
+    started = time.perf_counter()
+    at = run_app()
+    # Served from disk without waiting for the slow API
+    assert psgc_status(at).startswith("🔄 Showing the snapshot from")
+    assert time.perf_counter() - started < 2
+    assert len(at.dataframe) > 0
+
+    wait_for_revalidation(tmp_path, {level: meta["fetched_at"] for level, (_, meta) in saved.items()})
+    for level in LEVELS:
+        body_path, meta = snapshot(tmp_path, level)
+        assert meta["etag"] == saved[level][1]["etag"]
+        assert os.path.getmtime(body_path) == body_mtimes[level]  # 304: the body is not rewritten
+
+
+def test_outage_serves_last_snapshot_with_offline_status(stub, tmp_path, monkeypatch):
+    stub()
+    rows = len(run_app().dataframe[0].value)
+
+    stub("--fail")
+    monkeypatch.setenv("PSGC_TTL_SECONDS", "0")
+    at = run_app()
+    deadline = time.time() + 10
+    while psgc_status(at).startswith("🔄") and time.time() < deadline:  # the failed revalidation lands
+        time.sleep(0.2)
+        at.run()
+    assert psgc_status(at).startswith("📴 PSGC API unreachable, showing the snapshot from")
+    assert len(at.dataframe[0].value) == rows
@@ -0,0 +1,125 @@
+import os
+import time
+import sqlite3
+import datetime
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ACT5", "app5.py")
+BASE = datetime.datetime(2027, 1, 1)
+
+
+def stamp(seconds):
+    # Same text SQLAlchemy writes for a SQLite DATETIME, so comparisons in SQL line up
+    return (BASE + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    # A SQLite stand-in for the MySQL source, with the replica in its own file
+    path = tmp_path / "source.sqlite"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    monkeypatch.setenv("REPLICA_PATH", str(tmp_path / "replica.sqlite"))
+    monkeypatch.setenv("SCHEMA_CACHE_SECONDS", "0")
+    monkeypatch.setenv("REPLICA_OVERLAP_SECONDS", "60")
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+def open_replica_view(table_name):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    at.sidebar.text_input[0].input("admin")
+    at.sidebar.text_input[1].input("admin123")
+    at.run()
+    at.text_input[0].input(table_name).run()
+    at.toggle[0].set_value(True).run()
+    return at
+
+
+def refresh(at, label="🔄 Refresh"):
+    # -> the "Copied ..." caption of the finished refresh
+    at.button[[button.label for button in at.button].index(label)].click().run()
+    deadline = time.time() + 30
+    while any("Refreshing the replica" in info.value for info in at.info) and time.time() < deadline:
+        time.sleep(0.2)
+        at.run()
+    assert not at.exception and not at.warning
+    return next(caption.value for caption in at.caption if caption.value.startswith("Copied"))
+
+
+def replica_rows(tmp_path, query):
+    with sqlite3.connect(tmp_path / "replica.sqlite") as replica:
+        return replica.execute(query).fetchall()
+
+
+def test_first_copy_and_incremental_by_key(source, tmp_path):
+    source.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    source.executemany("INSERT INTO items (id, name) VALUES (?, ?)", [(i, f"item {i}") for i in range(1, 51)])
+    source.commit()
+    at = open_replica_view("items")
+
+    assert refresh(at).startswith("Copied 50 rows")
+    assert replica_rows(tmp_path, "SELECT COUNT(*) FROM items") == [(50,)]
+    assert replica_rows(tmp_path, "SELECT mode, row_count FROM _replica_status") == [("key", 50)]
+
+    source.executemany("INSERT INTO items (id, name) VALUES (?, ?)", [(i, f"item {i}") for i in range(51, 54)])
+    source.execute("UPDATE items SET name = 'renamed' WHERE id = 1")  # key mode only sees new keys
+    source.commit()
+    assert refresh(at).startswith("Copied 3 rows")
+    assert replica_rows(tmp_path, "SELECT COUNT(*) FROM items") == [(53,)]
+    assert replica_rows(tmp_path, "SELECT name FROM items WHERE id = 1") == [("item 1",)]
+
+
+def test_incremental_by_updated_at_uses_the_overlap_window(source, tmp_path):
+    source.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, kind TEXT, updated_at DATETIME)")
+    source.executemany("INSERT INTO events (id, kind, updated_at) VALUES (?, ?, ?)",
+                       [(i, "old", stamp(i * 600)) for i in range(1, 11)])  # latest at 6000 s
+    source.commit()
+    at = open_replica_view("events")
+    assert refresh(at).startswith("Copied 10 rows")
+
+    # A late commit stamped 30 s before the replica's latest value is inside the 60 s window;
+    # one stamped 10 minutes before is not
+    source.execute(f"UPDATE events SET kind = 'late', updated_at = '{stamp(5970)}' WHERE id = 9")
+    source.execute(f"UPDATE events SET kind = 'missed', updated_at = '{stamp(5400)}' WHERE id = 8")
+    source.execute(f"INSERT INTO events (id, kind, updated_at) VALUES (11, 'new', '{stamp(6600)}')")
+    source.commit()
+    caption = refresh(at)
+    assert caption.startswith("Copied 3 rows") and "(updated-at refresh)" in caption  # ids 9, 10, 11
+    assert replica_rows(tmp_path, "SELECT id, kind FROM events WHERE id IN (8, 9, 11) ORDER BY id") == [
+        (8, "old"), (9, "late"), (11, "new")]
+    assert replica_rows(tmp_path, "SELECT COUNT(*) FROM events") == [(11,)]
+
+
+def test_mode_change_forces_a_full_reload(source, tmp_path):
+    source.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL)")
+    source.executemany("INSERT INTO orders (id, total) VALUES (?, ?)", [(i, i * 1.5) for i in range(1, 21)])
+    source.commit()
+    at = open_replica_view("orders")
+    assert refresh(at).startswith("Copied 20 rows")
+
+    source.execute("ALTER TABLE orders ADD COLUMN updated_at DATETIME")
+    source.execute(f"UPDATE orders SET updated_at = '{stamp(0)}'")
+    source.commit()
+    at.run()  # reflects the new column
+    caption = refresh(at)
+    assert caption.startswith("Copied 20 rows") and "(updated-at refresh)" in caption
+    assert replica_rows(tmp_path, "SELECT mode, row_count FROM _replica_status") == [("updated_at", 20)]
+    assert replica_rows(tmp_path, "SELECT COUNT(*) FROM orders WHERE updated_at IS NOT NULL") == [(20,)]
+
+
+def test_refresh_bumps_only_the_replica_version(source):
+    source.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    source.execute("INSERT INTO items (id, name) VALUES (1, 'item 1')")
+    source.commit()
+    at = open_replica_view("items")
+    refresh(at)
+    versions = next(caption.value for caption in at.sidebar.caption if "table versions" in caption.value)
+    assert "items (replica.sqlite) v1" in versions
+    assert "source.sqlite" not in versions